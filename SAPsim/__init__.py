@@ -1,13 +1,16 @@
 """Simulation of SAP (Simple As Possible) computer programs from COMP311 (Computer Organization) @ UNC.
 
-Defines ``run()`` and ``create_template()``."""
+Defines ``run()``, ``run_and_return_state()``, ``iter_trace()``, ``run_batch()``, ``evaluate_all()``, and ``create_template()``.
+"""
 
 __author__ = "Jesse Wei <jesse@cs.unc.edu>"
 
-from typing import Union, Any
+from typing import Iterator, Union, Any
 from SAPsim.utils.helpers import is_documented_by
 from SAPsim.utils.global_vars import MAX_PC
 import SAPsim.utils.execute as execute
+import SAPsim.utils.batch as batch
+import SAPsim.utils.evaluate as evaluate
 
 
 # Weird glitch, passing in the function doesn't actually get its docstring? Just append then
@@ -24,6 +27,26 @@ def run_and_return_state(prog_path: str, **kwargs) -> dict[str, Any]:
     return execute.run_and_return_state(prog_path, **kwargs)
 
 
+# Weird glitch, passing in the function doesn't actually get its docstring? Just append then
+@is_documented_by(execute.iter_trace, 0, "", execute.iter_trace.__doc__)
+def iter_trace(prog_path: str, **kwargs) -> Iterator[execute.TraceRecord]:
+    return execute.iter_trace(prog_path, **kwargs)
+
+
+# Weird glitch, passing in the function doesn't actually get its docstring? Just append then
+@is_documented_by(batch.run_batch, 0, "", batch.run_batch.__doc__)
+def run_batch(prog_path: str, **kwargs) -> dict[str, Any]:
+    return batch.run_batch(prog_path, **kwargs)
+
+
+# Weird glitch, passing in the function doesn't actually get its docstring? Just append then
+@is_documented_by(evaluate.evaluate_all, 0, "", evaluate.evaluate_all.__doc__)
+def evaluate_all(
+    prog_path: str, inputs: dict[int, range], outputs: list[Union[int, str]], **kwargs
+) -> evaluate.TruthTable:
+    return evaluate.evaluate_all(prog_path, inputs, outputs, **kwargs)
+
+
 def create_template(path: str = "template.csv") -> None:
     r"""
     Create blank template file in SAPsim format in current directory.
@@ -0,0 +1,178 @@
+"""Run SAP programs from the command line.
+
+The ``sapsim`` console script runs one or many .csv programs (or ``.sapbin`` images) in a single process,
+so a pipeline that runs thousands of files doesn't start a Python interpreter per file. For example::
+
+    sapsim ex1.csv ex2.csv --change 15=7 --format json --jobs 4
+
+With ``--format json``, one JSON object per program is printed as soon as it finishes, like
+``{"program": "ex1.csv", "state": {"RAM": {...}, "PC": 8, ...}, "error": null, "message": null}``, where ``state`` is
+``run_and_return_state()``'s (``null`` if the program raised an exception). With ``--format table``, the output
+of ``run()`` is printed, and with ``--format none``, nothing is printed except errors (to stderr).
+The exit status is 1 if any program raised an exception.
+"""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Iterator, Optional
+from SAPsim.utils.execute import run
+
+FORMATS: tuple[str, ...] = ("table", "json", "none")
+"""Values of ``--format``"""
+
+
+def parse_change_spec(spec: str) -> tuple[int, int]:
+    """Parse an ``ADDR=VALUE`` change, e.g., ``15=7`` or ``15=0x7``. Ranges are checked by ``run()``.
+
+    :param spec: Change spec
+    :type spec: str
+    :raises ValueError: If ``spec`` is malformed
+    :return: ``(ADDR, VALUE)``
+    :rtype: tuple[int, int]"""
+    addr_str, sep, value_str = spec.partition("=")
+    if not sep:
+        raise ValueError(f"Change {spec} must be ADDR=VALUE, e.g., 15=7.")
+    return int(addr_str, 0), int(value_str, 0)
+
+
+def run_programs(
+    programs: list[str],
+    change: Optional[dict[int, int]] = None,
+    output_format: str = "json",
+    max_steps: Optional[int] = None,
+    jobs: int = 1,
+) -> Iterator[dict[str, Any]]:
+    """Run every program, yielding one result per program as soon as it finishes.
+
+    With ``jobs`` greater than 1, programs are run by a ``ProcessPoolExecutor``, so results can be out of order.
+
+    :param programs: Paths of .csv programs or ``.sapbin`` images
+    :type programs: list[str]
+    :param change: ``dict[address, byte]`` of values to change in RAM of every program (see ``run()``)
+    :type change: Optional[dict[int, int]]
+    :param output_format: One of ``FORMATS``
+    :type output_format: str
+    :param max_steps: Max number of instructions per program. Defaults to no limit.
+    :type max_steps: Optional[int]
+    :param jobs: Number of worker processes
+    :type jobs: int
+    :return: Iterator of ``dict`` with keys ``program``, ``state``, ``error``, ``message``, and ``output``
+        (the printed output of ``run()`` with ``--format table``, else ``""``)
+    :rtype: Iterator[dict[str, Any]]"""
+    work: list[tuple] = [
+        (program, change or {}, output_format, max_steps) for program in programs
+    ]
+    if jobs <= 1:
+        yield from map(_run_program, work)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for future in as_completed([executor.submit(_run_program, w) for w in work]):
+            yield future.result()
+
+
+def _run_program(work: tuple) -> dict[str, Any]:
+    """Run one program for ``run_programs()``, capturing what ``run()`` prints."""
+    program, change, output_format, max_steps = work
+    kwargs: dict[str, Any] = {"change": change}
+    if max_steps is not None:
+        kwargs["max_steps"] = max_steps
+    if output_format != "table":
+        kwargs.update(no_print=True, output="none", return_state=True)
+    result: dict[str, Any] = {
+        "program": program,
+        "state": None,
+        "error": None,
+        "message": None,
+    }
+    printed: io.StringIO = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(printed):
+            state: Optional[dict[str, Any]] = run(program, **kwargs)
+        if output_format == "json":
+            result["state"] = state
+    except Exception as e:
+        result["error"] = type(e).__name__
+        # SAPsim exceptions keep their message in .message
+        result["message"] = getattr(e, "message", str(e))
+    result["output"] = printed.getvalue()
+    return result
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Entry point of the ``sapsim`` console script.
+
+    :param argv: Command line arguments. Defaults to ``sys.argv[1:]``.
+    :type argv: Optional[list[str]]
+    :return: Exit status, 1 if any program raised an exception
+    :rtype: int"""
+    arg_parser = argparse.ArgumentParser(
+        prog="sapsim",
+        description="Run SAPsim .csv programs (or .sapbin images).",
+    )
+    arg_parser.add_argument(
+        "programs", nargs="+", help="Programs to run, .csv or .sapbin"
+    )
+    arg_parser.add_argument(
+        "--change",
+        action="append",
+        default=[],
+        type=parse_change_spec,
+        metavar="ADDR=VALUE",
+        help="Change the byte at ADDR before running, e.g., 15=7. Can be repeated.",
+    )
+    arg_parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="table",
+        help="table prints RAM and registers like run(), json prints one JSON line per program as it finishes, "
+        "none prints only errors (default: table)",
+    )
+    arg_parser.add_argument(
+        "--max-steps",
+        type=int,
+        help="Max number of instructions per program (default: no limit)",
+    )
+    arg_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes (default: 1)",
+    )
+    args = arg_parser.parse_args(argv)
+
+    status: int = 0
+    for result in run_programs(
+        args.programs,
+        change=dict(args.change),
+        output_format=args.format,
+        max_steps=args.max_steps,
+        jobs=args.jobs,
+    ):
+        if args.format == "json":
+            output: dict[str, Any] = dict(result)
+            del output["output"]
+            print(json.dumps(output), flush=True)
+        elif args.format == "table":
+            if len(args.programs) > 1:
+                print(f"==> {result['program']} <==")
+            print(result["output"], end="", flush=True)
+        if result["error"] is not None:
+            status = 1
+            if args.format != "json":
+                print(
+                    f"{result['program']}: {result['error']}: {result['message']}",
+                    file=sys.stderr,
+                    flush=True,
+                )
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+"""Autograde a directory of SAP programs on many inputs in parallel.
+
+Each submission is run on every combination of inputs at its RESERVED addresses, and its RETURN VALUE
+(a register or an address in RAM) is compared to a reference Python function, the same way
+``tests/test_example_progs.py`` grades the example programs. The (submission x input) matrix is split into
+chunks that are run by a ``ProcessPoolExecutor``, and the result of every test case is yielded (or printed by
+the ``sapsim-grade`` console script) as soon as its chunk is done.
+
+Example, grading every .csv in ``submissions/`` like ``test_ex2()``::
+
+    sapsim-grade submissions/ --input 15=0-255 --reference tests.test_example_progs:ex2_rv --return-value A
+
+To grade an archive of submissions (see ``utils/archive.py``) without parsing any .csv, pass the ``.sapar`` file
+instead of the directory.
+
+Every output line is a JSON object like
+``{"submission": "submissions/ex2.csv", "inputs": {"15": 31}, "expected": 28, "actual": 28, "passed": true, "error": null}``.
+"""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+import argparse
+import importlib
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional, Union
+import SAPsim.utils.archive as archive
+import SAPsim.utils.exceptions as exceptions
+import SAPsim.utils.global_vars as global_vars
+import SAPsim.utils.parser as parser
+from SAPsim.utils.execute import execute_full_speed
+from SAPsim.utils.machine import Machine
+
+DEFAULT_MAX_STEPS: int = 10_000
+"""Default ``max_steps`` per test case, so a submission that never halts fails instead of hanging the grader."""
+
+DEFAULT_CHUNKSIZE: int = 64
+"""Default number of inputs per work unit. A work unit parses its submission once."""
+
+REGISTERS: tuple[str, ...] = ("PC", "A", "B", "FLAG_C", "FLAG_Z")
+"""Return values that aren't RAM addresses."""
+
+
+def parse_input_spec(spec: str) -> tuple[int, range]:
+    """Parse an ``ADDR=LO-HI`` (or ``ADDR=VALUE``) RESERVED input spec, e.g., ``14=0-255``.
+
+    :param spec: Input spec
+    :type spec: str
+    :raises ValueError: If ``spec`` is malformed
+    :raises ChangeAddressNegative: If ``ADDR`` is negative
+    :raises ChangeAddressGreaterThan15: If ``ADDR`` is greater than 15
+    :raises ChangeValueInvalid: If an input isn't in [0, 255]
+    :return: ``(ADDR, range(LO, HI + 1))``
+    :rtype: tuple[int, range]"""
+    addr_str, sep, values = spec.partition("=")
+    if not sep:
+        raise ValueError(f"Input spec {spec} must be ADDR=LO-HI, e.g., 14=0-255.")
+    addr: int = int(addr_str)
+    low_str, _, high_str = values.partition("-")
+    low: int = int(low_str)
+    high: int = int(high_str) if high_str else low
+    if addr < 0:
+        raise exceptions.ChangeAddressNegative(addr)
+    if addr > global_vars.MAX_PC:
+        raise exceptions.ChangeAddressGreaterThan15(addr)
+    for value in (low, high):
+        if value < 0 or value > 255:
+            raise exceptions.ChangeValueInvalid(value)
+    return addr, range(low, high + 1)
+
+
+def load_reference(spec: str) -> Callable[..., Any]:
+    """Import the reference function named by ``module:function``, e.g., ``tests.test_example_progs:ex2_rv``.
+
+    :param spec: ``module:function``
+    :type spec: str
+    :raises ValueError: If ``spec`` is malformed
+    :return: Reference function
+    :rtype: Callable[..., Any]"""
+    module_name, sep, function_name = spec.partition(":")
+    if not sep:
+        raise ValueError(
+            f"Reference {spec} must be module:function, e.g., tests.test_example_progs:ex2_rv."
+        )
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def grade(
+    submissions: Union[str, list[str]],
+    inputs: dict[int, range],
+    reference: Callable[..., Any],
+    return_value: Union[str, int],
+    workers: Optional[int] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    max_steps: int = DEFAULT_MAX_STEPS,
+    bits: int = global_vars.NUM_BITS_IN_REGISTERS,
+) -> Iterator[dict[str, Any]]:
+    """Grade every submission on every combination of ``inputs``, yielding one result per test case.
+
+    Results are yielded in order (by submission, then input) as soon as their chunk is done.
+    A test case passes if ``reference(*input_values)`` equals the RETURN VALUE. A test case that raises
+    an exception (including ``StepLimitExceeded`` after ``max_steps``) fails with the exception's name in ``error``.
+    Submissions are parsed once by ``parser.parse_many()``. Every test case of a submission that doesn't parse fails with
+    the name of its first parse error. An archive (see ``archive.pack_directory()``) isn't parsed at all, and each
+    ``submission`` in the results is an ID in the archive instead of a path.
+
+    :param submissions: Directory of .csv submissions (graded in sorted order), list of .csv paths, or path of a ``.sapar`` archive
+    :type submissions: Union[str, list[str]]
+    :param inputs: ``dict[address, range]`` of inputs at RESERVED addresses, e.g., ``{14: range(256)}``.
+        The reference function is called with one value per address, in this order.
+    :type inputs: dict[int, range]
+    :param reference: Module-level function (so it can be pickled to the worker processes) that returns the expected RETURN VALUE
+    :type reference: Callable[..., Any]
+    :param return_value: Register name (``"A"``, ``"B"``, ``"PC"``, ``"FLAG_C"``, ``"FLAG_Z"``) or RAM address of the RETURN VALUE
+    :type return_value: Union[str, int]
+    :param workers: Number of worker processes. Defaults to the number of CPUs.
+    :type workers: Optional[int]
+    :param chunksize: Number of inputs per work unit
+    :type chunksize: int
+    :param max_steps: Max number of instructions per test case
+    :type max_steps: int
+    :param bits: Number of bits in registers
+    :type bits: int
+    :return: Iterator of ``dict`` with keys ``submission``, ``inputs``, ``expected``, ``actual``, ``passed``, ``error``
+    :rtype: Iterator[dict[str, Any]]"""
+    report: Optional[parser.ParseReport] = None
+    if isinstance(submissions, str) and submissions.endswith(archive.ARCHIVE_SUFFIX):
+        with archive.Archive(submissions) as packed:
+            report = parser.ParseReport({name: packed[name] for name in packed}, {})
+        submissions = list(report.images)
+    elif isinstance(submissions, str):
+        submissions = [str(path) for path in sorted(Path(submissions).glob("*.csv"))]
+    if isinstance(return_value, str) and return_value not in REGISTERS:
+        raise ValueError(
+            f"Return value {return_value} must be a RAM address or one of {', '.join(REGISTERS)}."
+        )
+    addrs: tuple[int, ...] = tuple(inputs)
+    cases: list[tuple[int, ...]] = list(itertools.product(*inputs.values()))
+    if report is None:
+        # Parse every submission once, up front, instead of once per chunk
+        report = parser.parse_many(submissions)
+    work: Iterator[tuple] = (
+        (
+            path,
+            report.images.get(path),
+            report.errors[path][0].error if path in report.errors else None,
+            addrs,
+            cases[i : i + chunksize],
+            reference,
+            return_value,
+            max_steps,
+            bits,
+        )
+        for path in map(str, submissions)
+        for i in range(0, len(cases), chunksize)
+    )
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for results in executor.map(_grade_chunk, work):
+            yield from results
+
+
+def _grade_chunk(work: tuple) -> list[dict[str, Any]]:
+    """Grade one submission on a chunk of inputs. Runs in a worker process. Nothing is printed (``OUT`` is collected in ``out_log``)."""
+    path, image, parse_error, addrs, cases, reference, return_value, max_steps, bits = (
+        work
+    )
+    results: list[dict[str, Any]] = []
+    RAM: Optional[dict[int, int]] = None if image is None else image.to_RAM()
+    for values in cases:
+        expected: Any = reference(*values)
+        actual: Any = None
+        error: Optional[str] = parse_error
+        if RAM is not None:
+            machine = Machine(RAM, bits=bits, no_print=True)
+            # Collect OUT instead of formatting a table per OUT
+            machine.out_log = []
+            for addr, value in zip(addrs, values):
+                machine.RAM[addr] = value
+            try:
+                execute_full_speed(machine, max_steps)
+                actual = (
+                    getattr(machine, return_value)
+                    if isinstance(return_value, str)
+                    else machine.RAM.get(return_value)
+                )
+            except Exception as e:
+                error = type(e).__name__
+        results.append(
+            {
+                "submission": path,
+                "inputs": {str(addr): value for addr, value in zip(addrs, values)},
+                "expected": expected,
+                "actual": actual,
+                "passed": error is None and actual == expected,
+                "error": error,
+            }
+        )
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Entry point of the ``sapsim-grade`` console script. Prints one JSON line per test case.
+
+    :param argv: Command line arguments. Defaults to ``sys.argv[1:]``.
+    :type argv: Optional[list[str]]
+    :return: Exit status
+    :rtype: int"""
+    arg_parser = argparse.ArgumentParser(
+        prog="sapsim-grade",
+        description="Autograde a directory of SAPsim .csv programs in parallel. Prints one JSON line per test case.",
+    )
+    arg_parser.add_argument(
+        "submissions", help="Directory of .csv submissions or .sapar archive"
+    )
+    arg_parser.add_argument(
+        "--input",
+        action="append",
+        required=True,
+        metavar="ADDR=LO-HI",
+        help="Inputs at a RESERVED address, e.g., 14=0-255. Can be repeated.",
+    )
+    arg_parser.add_argument(
+        "--reference",
+        required=True,
+        metavar="MODULE:FUNCTION",
+        help="Reference function that returns the expected RETURN VALUE, e.g., tests.test_example_progs:ex2_rv",
+    )
+    arg_parser.add_argument(
+        "--return-value",
+        required=True,
+        help=f"RAM address or register ({', '.join(REGISTERS)}) of the RETURN VALUE",
+    )
+    arg_parser.add_argument(
+        "-j", "--workers", type=int, help="Number of processes (default: CPU count)"
+    )
+    arg_parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    arg_parser.add_argument("--max-steps", type=int, default=DEFAULT_MAX_STEPS)
+    arg_parser.add_argument(
+        "--bits", type=int, default=global_vars.NUM_BITS_IN_REGISTERS
+    )
+    args = arg_parser.parse_args(argv)
+
+    # Like python -m, so the reference module can be imported from the current directory
+    if "" not in sys.path and os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    inputs: dict[int, range] = dict(parse_input_spec(spec) for spec in args.input)
+    return_value: Union[str, int] = (
+        int(args.return_value) if args.return_value.isdigit() else args.return_value
+    )
+    for result in grade(
+        args.submissions,
+        inputs,
+        load_reference(args.reference),
+        return_value,
+        workers=args.workers,
+        chunksize=args.chunksize,
+        max_steps=args.max_steps,
+        bits=args.bits,
+    ):
+        print(json.dumps(result), flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""Archives of many SAP programs (e.g., every submission of a semester) in one file, with random access by ID.
+
+An archive (``.sapar``) is a 16-byte header followed by one fixed-width 18-byte record per program::
+
+    RAM (16 bytes), mapped addresses (2 bytes, little-endian)
+
+(the same fields as a ``.sapbin`` image, see ``parser.save_image()``), then an index of the ID of each program
+(UTF-8, separated by NUL). Program ``i`` starts at byte ``16 + 18 * i``, so ``Archive`` memory-maps the file and
+reads any program with a slice, without parsing anything but the index. ``Archive.arrays()`` views every record at
+once as NumPy arrays (without copying), which ``batch.run_images()`` runs one lane per program.
+
+``pack_directory()`` converts a directory of ``.csv`` submissions into an archive once, so they can be graded
+(``sapsim-grade submissions.sapar ...``) or run many times without opening and parsing thousands of files.
+"""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+import mmap
+import struct
+from pathlib import Path
+from typing import Any, Iterator, Mapping, Optional, Union
+import SAPsim.utils.parser as parser
+from SAPsim.utils.parser import ProgramImage
+
+ARCHIVE_SUFFIX: str = ".sapar"
+MAGIC: bytes = b"SAPA"
+VERSION: int = 1
+
+HEADER: struct.Struct = struct.Struct("<4sB3xII")
+"""Magic, version, number of programs, offset of the index"""
+RECORD: struct.Struct = struct.Struct("<16sH")
+"""RAM, mapped addresses"""
+
+
+def write_archive(path: Union[Path, str], images: Mapping[str, ProgramImage]) -> int:
+    """Write ``images`` to an archive, keyed by ID.
+
+    :param path: Archive to write
+    :type path: Union[Path, str]
+    :param images: Image of each program, by ID (e.g., the name of the submission)
+    :type images: Mapping[str, ProgramImage]
+    :raises ValueError: If an ID contains a NUL character
+    :return: Number of programs written
+    :rtype: int"""
+    for name in images:
+        if "\0" in name:
+            raise ValueError(f"Archive ID {name!r} contains a NUL character.")
+    records: bytes = b"".join(
+        RECORD.pack(image.memory, image.mapped) for image in images.values()
+    )
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(images), HEADER.size + len(records)))
+        f.write(records)
+        f.write("\0".join(images).encode())
+    return len(images)
+
+
+def pack_directory(
+    directory: Union[Path, str],
+    path: Union[Path, str],
+    workers: Optional[int] = None,
+) -> parser.ParseReport:
+    """Parse every ``.csv`` file in ``directory`` (see ``parser.parse_directory()``) and archive the ones without errors.
+
+    The ID of each program is the name of its file without ``.csv``, e.g., ``"ex1"``.
+
+    :param directory: Directory of ``.csv`` files
+    :type directory: Union[Path, str]
+    :param path: Archive to write
+    :type path: Union[Path, str]
+    :param workers: Number of threads used to parse. Defaults to ``ThreadPoolExecutor``'s default.
+    :type workers: Optional[int]
+    :return: Report of ``parser.parse_directory()``, so files that weren't archived can be inspected
+    :rtype: parser.ParseReport"""
+    report: parser.ParseReport = parser.parse_directory(directory, workers)
+    write_archive(
+        path,
+        {Path(file_path).stem: image for file_path, image in report.images.items()},
+    )
+    return report
+
+
+class Archive:
+    """Read-only, memory-mapped view of an archive written by ``write_archive()``.
+
+    ``len(archive)`` is the number of programs, ``archive[name]`` is the ``ProgramImage`` of the program named ``name``,
+    and iterating yields the IDs in the order they were written. Use as a context manager, or call ``close()``,
+    to unmap the file (after deleting any views returned by ``record()`` or ``arrays()``).
+
+    :param path: Archive
+    :type path: Union[Path, str]
+    :raises ValueError: If ``path`` isn't an archive"""
+
+    def __init__(self, path: Union[Path, str]):
+        with open(path, "rb") as f:
+            self._mm: mmap.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < HEADER.size or self._mm[:4] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a SAPsim archive.")
+        _, version, count, index_offset = HEADER.unpack_from(self._mm)
+        if version != VERSION:
+            self._mm.close()
+            raise ValueError(f"{path} has unsupported archive version {version}.")
+        self.ids: list[str] = (
+            self._mm[index_offset:].decode().split("\0") if count else []
+        )
+        """ID of each program, in order"""
+        self._offsets: dict[str, int] = {
+            name: HEADER.size + i * RECORD.size for i, name in enumerate(self.ids)
+        }
+        """Offset of the record of each program, by ID"""
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._offsets
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.ids)
+
+    def __getitem__(self, name: str) -> ProgramImage:
+        memory, mapped = RECORD.unpack_from(self._mm, self._offsets[name])
+        return ProgramImage(memory, mapped)
+
+    def offset(self, name: str) -> int:
+        """Return the offset in the file of the record of the program named ``name``.
+
+        :param name: ID of a program
+        :type name: str
+        :raises KeyError: If no program is named ``name``
+        :return: Offset
+        :rtype: int"""
+        return self._offsets[name]
+
+    def record(self, name: str) -> memoryview:
+        """Return the 18-byte record (see ``RECORD``) of the program named ``name``, without copying it.
+
+        :param name: ID of a program
+        :type name: str
+        :raises KeyError: If no program is named ``name``
+        :return: Read-only view of the record
+        :rtype: memoryview"""
+        offset: int = self._offsets[name]
+        return memoryview(self._mm)[offset : offset + RECORD.size]
+
+    def arrays(self) -> tuple[Any, Any]:
+        """Return every record as NumPy arrays that view the file, without copying it.
+
+        :raises ImportError: If NumPy isn't installed
+        :return: Read-only arrays of shape (N, 16) (the RAM of each program) and (N,) (the mapped addresses of each program),
+            in the order of ``ids``, to pass to ``batch.run_images()``
+        :rtype: tuple[numpy.ndarray, numpy.ndarray]"""
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError(
+                "Archive.arrays() requires NumPy. Install it with: pip install SAPsim[batch]"
+            )
+
+        records = np.frombuffer(
+            self._mm,
+            dtype=np.dtype([("memory", np.uint8, (16,)), ("mapped", "<u2")]),
+            count=len(self),
+            offset=HEADER.size,
+        )
+        return records["memory"], records["mapped"]
+
+    def close(self) -> None:
+        """Unmap the file.
+
+        :return: None"""
+        self._mm.close()
+
+    def __enter__(self) -> "Archive":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
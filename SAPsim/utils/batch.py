@@ -0,0 +1,288 @@
+"""Run one SAP program on many inputs at once with NumPy.
+
+``run_batch()`` keeps N machines ("lanes") in NumPy arrays: ``RAM`` and ``mapped`` have shape (N, 16),
+and ``PC``, ``A``, ``B``, ``FLAG_C``, ``FLAG_Z`` have shape (N,). Every step executes the current instruction of all
+running lanes in lockstep, with one masked update per opcode. Lanes that halt or would raise an exception are retired
+with a per-lane status code instead of raising, so the other lanes keep running.
+
+``run_images()`` runs many different programs instead (e.g., every submission in an ``archive.Archive``), one lane each.
+
+NumPy is an optional dependency (``pip install SAPsim[batch]``) and is only imported when ``run_batch()`` or
+``run_images()`` is called.
+"""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+from typing import Any, Optional
+import SAPsim.utils.global_vars as global_vars
+import SAPsim.utils.exceptions as exceptions
+import SAPsim.utils.parser as parser
+
+RUNNING: int = 0
+"""Status of a lane that hasn't halted (only possible if ``max_steps`` was reached)."""
+HALTED: int = 1
+"""Status of a lane that executed ``HLT``."""
+DROPPED_OFF_BOTTOM: int = 2
+"""Status of a lane that would raise ``DroppedOffBottom``."""
+LOAD_FROM_UNMAPPED_ADDRESS: int = 3
+"""Status of a lane that would raise ``LoadFromUnmappedAddress``."""
+REGISTER_NOT_ENOUGH_BITS: int = 4
+"""Status of a lane that would raise ``ARegisterNotEnoughBits`` or ``BRegisterNotEnoughBits``."""
+INVALID_OPCODE: int = 5
+"""Status of a lane that would raise ``InvalidOpcode``."""
+
+STATUS_NAMES: tuple[str, ...] = (
+    "RUNNING",
+    "HALTED",
+    "DROPPED_OFF_BOTTOM",
+    "LOAD_FROM_UNMAPPED_ADDRESS",
+    "REGISTER_NOT_ENOUGH_BITS",
+    "INVALID_OPCODE",
+)
+"""``STATUS_NAMES[status]`` is the name of ``status``."""
+
+EXCEPTION_TO_STATUS: dict[type, int] = {
+    exceptions.StepLimitExceeded: RUNNING,
+    exceptions.DroppedOffBottom: DROPPED_OFF_BOTTOM,
+    exceptions.LoadFromUnmappedAddress: LOAD_FROM_UNMAPPED_ADDRESS,
+    exceptions.ARegisterNotEnoughBits: REGISTER_NOT_ENOUGH_BITS,
+    exceptions.BRegisterNotEnoughBits: REGISTER_NOT_ENOUGH_BITS,
+    exceptions.InvalidOpcode: INVALID_OPCODE,
+}
+"""Maps exceptions raised by a ``Machine`` during execution to the status of the same run."""
+
+
+def run_batch(
+    prog_path: str,
+    changes: Optional[list[dict[int, int]]] = None,
+    bits: int = global_vars.NUM_BITS_IN_REGISTERS,
+    max_steps: Optional[int] = None,
+) -> dict[str, Any]:
+    """Run the .csv program at ``prog_path`` once per ``dict`` in ``changes``, all at once.
+
+    ``run_batch(prog_path, changes=[{14: x} for x in range(256)])`` gives the same results as calling
+    ``run_and_return_state(prog_path, change={14: x})`` for every ``x``, but in one vectorized pass.
+    Unlike ``run()``, nothing is printed (including ``OUT``), and no exceptions are raised during execution;
+    see the ``status`` of each lane instead.
+
+    :param prog_path: .csv file in SAPsim format. Addresses must be at most ``MAX_PC``.
+    :type prog_path: str
+    :param changes: One ``dict[address, byte]`` of values to change in RAM per lane (see ``run()``). Defaults to a single unchanged lane.
+    :type changes: Optional[list[dict[int, int]]]
+    :param bits: Number of bits in registers
+    :type bits: int
+    :param max_steps: Stop after this many steps, leaving lanes that haven't finished as ``RUNNING``. Defaults to no limit.
+    :type max_steps: Optional[int]
+    :raises ImportError: If NumPy isn't installed
+    :return: ``dict`` of NumPy arrays with keys ``RAM``, ``mapped``, ``PC``, ``A``, ``B``, ``FLAG_C``, ``FLAG_Z``, ``steps``, ``status``.
+        Each has one row per lane. ``RAM`` of an unmapped address is 0.
+    :rtype: dict[str, numpy.ndarray]"""
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError(
+            "run_batch() requires NumPy. Install it with: pip install SAPsim[batch]"
+        )
+
+    if changes is None:
+        changes = [{}]
+    RAM: dict[int, int] = parser.load_RAM(prog_path)
+    for addr in RAM:
+        if addr > global_vars.MAX_PC:
+            raise exceptions.AddressGreaterThan15(addr)
+    for change in changes:
+        for addr, value in change.items():
+            if addr < 0:
+                raise exceptions.ChangeAddressNegative(addr)
+            if addr > global_vars.MAX_PC:
+                raise exceptions.ChangeAddressGreaterThan15(addr)
+            if value < 0 or value > 2**bits - 1:
+                raise exceptions.ChangeValueInvalid(value, bits)
+
+    n: int = len(changes)
+    num_addrs: int = global_vars.MAX_PC + 1
+    ram = np.zeros((n, num_addrs), dtype=np.int16)
+    mapped = np.zeros((n, num_addrs), dtype=bool)
+    for addr, byte in RAM.items():
+        ram[:, addr] = byte
+        mapped[:, addr] = True
+    for lane, change in enumerate(changes):
+        for addr, value in change.items():
+            ram[lane, addr] = value
+            mapped[lane, addr] = True
+    return _run_lanes(np, ram, mapped, bits, max_steps)
+
+
+def run_images(
+    memory: Any,
+    mapped: Any,
+    change: Optional[dict[int, int]] = None,
+    bits: int = global_vars.NUM_BITS_IN_REGISTERS,
+    max_steps: Optional[int] = None,
+) -> dict[str, Any]:
+    """Run many different programs at once, one lane per program, like ``run_batch()``.
+
+    The programs are given as arrays like ``archive.Archive.arrays()``, e.g., every submission in an archive::
+
+        with Archive("submissions.sapar") as submissions:
+            memory, mapped = submissions.arrays()
+            results = run_images(memory, mapped, change={15: 3})
+
+    :param memory: Array-like of shape (N, 16) of the byte at each address of each program (see ``Machine.memory``)
+    :type memory: numpy.ndarray
+    :param mapped: Array-like of shape (N,) of the mask of mapped addresses of each program (see ``Machine.mapped``)
+    :type mapped: numpy.ndarray
+    :param change: ``dict[address, byte]`` of values to change in the RAM of every lane (see ``run()``)
+    :type change: Optional[dict[int, int]]
+    :param bits: Number of bits in registers
+    :type bits: int
+    :param max_steps: Stop after this many steps, leaving lanes that haven't finished as ``RUNNING``. Defaults to no limit.
+    :type max_steps: Optional[int]
+    :raises ImportError: If NumPy isn't installed
+    :return: Same as ``run_batch()``, with one row per program
+    :rtype: dict[str, numpy.ndarray]"""
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError(
+            "run_images() requires NumPy. Install it with: pip install SAPsim[batch]"
+        )
+
+    if change is None:
+        change = {}
+    for addr, value in change.items():
+        if addr < 0:
+            raise exceptions.ChangeAddressNegative(addr)
+        if addr > global_vars.MAX_PC:
+            raise exceptions.ChangeAddressGreaterThan15(addr)
+        if value < 0 or value > 2**bits - 1:
+            raise exceptions.ChangeValueInvalid(value, bits)
+
+    # Copies, so the arrays (e.g., read-only views of an archive) aren't modified
+    ram = np.asarray(memory).astype(np.int16)
+    # Bit addr of each mask
+    masks = np.asarray(mapped).astype(np.int32)[:, None]
+    mapped_ = (masks >> np.arange(global_vars.MAX_PC + 1) & 1).astype(bool)
+    for addr, value in change.items():
+        ram[:, addr] = value
+        mapped_[:, addr] = True
+    return _run_lanes(np, ram, mapped_, bits, max_steps)
+
+
+def _run_lanes(
+    np: Any, ram: Any, mapped: Any, bits: int, max_steps: Optional[int]
+) -> dict[str, Any]:
+    """Execute every lane of ``ram`` and ``mapped`` (both of shape (N, 16), modified in place) until it stops."""
+    n: int = len(ram)
+    num_addrs: int = global_vars.MAX_PC + 1
+    # Max mapped address per lane, -1 if nothing is mapped
+    max_addr = np.where(
+        mapped.any(axis=1), num_addrs - 1 - np.argmax(mapped[:, ::-1], axis=1), -1
+    )
+    pc = np.zeros(n, dtype=np.int16)
+    a = np.zeros(n, dtype=np.int16)
+    b = np.zeros(n, dtype=np.int16)
+    flag_c = np.zeros(n, dtype=bool)
+    flag_z = np.zeros(n, dtype=bool)
+    steps = np.zeros(n, dtype=np.int64)
+    status = np.full(n, RUNNING, dtype=np.uint8)
+    mask: int = 2**bits - 1
+    op = global_vars.MNEMONIC_TO_OPCODE
+    # valid_opcode[opcode] is whether opcode is in the SAP instruction set
+    valid_opcode = np.zeros(16, dtype=bool)
+    valid_opcode[list(op.values())] = True
+
+    step: int = 0
+    running = np.arange(n)
+    while running.size and (max_steps is None or step < max_steps):
+        step += 1
+        active = running
+        lane_pc = pc[running]
+
+        dropped = lane_pc > max_addr[running]
+        status[running[dropped]] = DROPPED_OFF_BOTTOM
+        running, lane_pc = running[~dropped], lane_pc[~dropped]
+
+        # Unmapped addresses are skipped (PC += 1)
+        is_mapped = mapped[running, lane_pc]
+        pc[running[~is_mapped]] += 1
+        running, lane_pc = running[is_mapped], lane_pc[is_mapped]
+
+        byte = ram[running, lane_pc]
+        opcode = byte >> 4
+        arg = byte & 0xF
+
+        sel = opcode == op["NOP"]
+        pc[running[sel]] += 1
+
+        # LDA, ADD, SUB load Mem(arg)
+        for mnemonic in ("LDA", "ADD", "SUB"):
+            sel = opcode == op[mnemonic]
+            lanes, lane_arg = running[sel], arg[sel]
+            unmapped = ~mapped[lanes, lane_arg]
+            status[lanes[unmapped]] = LOAD_FROM_UNMAPPED_ADDRESS
+            lanes, lane_arg = lanes[~unmapped], lane_arg[~unmapped]
+            value = ram[lanes, lane_arg]
+            too_big = value > mask
+            if mnemonic == "LDA":
+                a[lanes] = value
+            else:
+                b[lanes] = value
+            status[lanes[too_big]] = REGISTER_NOT_ENOUGH_BITS
+            lanes, value = lanes[~too_big], value[~too_big]
+            if mnemonic == "ADD":
+                total = a[lanes] + value
+                flag_c[lanes] = total > mask
+                a[lanes] = total & mask
+                flag_z[lanes] = a[lanes] == 0
+            elif mnemonic == "SUB":
+                flag_c[lanes] = a[lanes] >= value
+                a[lanes] = (a[lanes] - value) & mask
+                flag_z[lanes] = a[lanes] == 0
+            pc[lanes] += 1
+
+        sel = opcode == op["STA"]
+        lanes, lane_arg = running[sel], arg[sel]
+        ram[lanes, lane_arg] = a[lanes]
+        mapped[lanes, lane_arg] = True
+        max_addr[lanes] = np.maximum(max_addr[lanes], lane_arg)
+        pc[lanes] += 1
+
+        sel = opcode == op["LDI"]
+        lanes, lane_arg = running[sel], arg[sel]
+        a[lanes] = lane_arg
+        too_big = lane_arg > mask
+        status[lanes[too_big]] = REGISTER_NOT_ENOUGH_BITS
+        pc[lanes[~too_big]] += 1
+
+        sel = opcode == op["JMP"]
+        pc[running[sel]] = arg[sel]
+        for mnemonic, flag in (("JC", flag_c), ("JZ", flag_z)):
+            sel = opcode == op[mnemonic]
+            lanes = running[sel]
+            pc[lanes] = np.where(flag[lanes], arg[sel], pc[lanes] + 1)
+
+        sel = opcode == op["OUT"]
+        pc[running[sel]] += 1
+
+        sel = opcode == op["HLT"]
+        status[running[sel]] = HALTED
+
+        status[running[~valid_opcode[opcode]]] = INVALID_OPCODE
+
+        # Lanes that raised an exception didn't complete a step
+        completed = active[(status[active] == RUNNING) | (status[active] == HALTED)]
+        steps[completed] += 1
+        running = active[status[active] == RUNNING]
+
+    return {
+        "RAM": ram.astype(np.uint8),
+        "mapped": mapped,
+        "PC": pc.astype(np.uint8),
+        "A": a.astype(np.uint8),
+        "B": b.astype(np.uint8),
+        "FLAG_C": flag_c,
+        "FLAG_Z": flag_z,
+        "steps": steps,
+        "status": status,
+    }
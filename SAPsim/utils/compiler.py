@@ -0,0 +1,296 @@
+"""Compile a SAP program into a specialized Python function.
+
+The instructions reachable from address 0 are translated into generated Python source with one
+straight-line block per basic block (starting at address 0 or a jump target). Jumps are state transitions
+that set ``pc`` and return to the dispatch loop. Registers and flags are local variables while the compiled
+function runs and are written back to the ``Machine`` when it halts.
+
+Anything unusual (loading from an unmapped address, a value that doesn't fit in the registers, an invalid opcode,
+dropping off the bottom of RAM) isn't compiled. Instead, the compiled function writes back the state *before*
+that instruction and returns, and the interpreter in ``execute.py`` executes the instruction (and raises the usual exception).
+
+Programs in which an ``STA`` targets an address that is also executed (self-modifying code) or an address past
+the max address in RAM aren't compiled at all; ``compile_program()`` returns ``None`` and the interpreter should be used.
+
+Compiled functions are cached by the bytes at the reachable addresses, so running the same program with different
+data (e.g., every input 0 to 255 at a RESERVED address) compiles it only once.
+
+``compile_block()`` compiles a single straight-line run of ``NOP``, ``LDA``, ``ADD``, ``SUB``, and ``LDI`` into a
+superinstruction for the interpreter (see ``execute.fuse_blocks()``)."""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+from functools import lru_cache
+from typing import Callable, Optional
+import SAPsim.utils.global_vars as global_vars
+import SAPsim.utils.instructions as instructions
+from SAPsim.utils.helpers import parse_arg, parse_opcode
+from SAPsim.utils.machine import Machine
+
+JUMP_OPCODES: frozenset[int] = frozenset(
+    global_vars.MNEMONIC_TO_OPCODE[mnemonic] for mnemonic in ("JMP", "JC", "JZ")
+)
+"""Opcodes that can set ``PC`` to their arg."""
+
+
+def reachable_addresses(RAM: dict[int, int]) -> list[int]:
+    """Return the sorted addresses that can be executed when running ``RAM`` from address 0.
+
+    Follows both branches of ``JC`` and ``JZ`` and stops at ``HLT``, invalid opcodes, and addresses past the max address in ``RAM``.
+    Unmapped addresses (executed as ``PC += 1``) are included.
+
+    :param RAM: ``dict[int, int]`` mapping ``PC``:``byte``
+    :type RAM: dict[int, int]
+    :return: Sorted list of reachable addresses
+    :rtype: list[int]"""
+    max_addr: int = max(RAM.keys(), default=-1)
+    reachable: set[int] = set()
+    to_visit: list[int] = [0]
+    while to_visit:
+        addr: int = to_visit.pop()
+        if addr in reachable or addr > max_addr:
+            continue
+        reachable.add(addr)
+        if addr not in RAM:
+            to_visit.append(addr + 1)
+            continue
+        opcode: int = parse_opcode(RAM[addr])
+        if opcode not in instructions.OPCODE_TO_INSTR_PROCEDURE or opcode == 0xF:
+            continue
+        if opcode in JUMP_OPCODES:
+            to_visit.append(parse_arg(RAM[addr]))
+        if opcode != global_vars.MNEMONIC_TO_OPCODE["JMP"]:
+            to_visit.append(addr + 1)
+    return sorted(reachable)
+
+
+def compile_program(
+    RAM: dict[int, int], bits: int = global_vars.NUM_BITS_IN_REGISTERS
+) -> Optional[Callable[[Machine, int], None]]:
+    """Compile the program in ``RAM`` into a function that executes it on a ``Machine`` starting at ``PC`` 0.
+
+    The compiled function is called as ``program(machine, limit)``, where ``limit`` is the max value of ``machine.steps``.
+    It reads and writes ``machine.memory`` and ``machine.mapped``, so it can be reused for every ``Machine`` whose
+    reachable instructions match ``RAM`` (only data differs). When it returns, either ``machine.EXECUTING`` is ``False``,
+    or ``machine.PC`` is an instruction the interpreter must execute. See ``execute.execute_compiled()``.
+
+    :param RAM: ``dict[int, int]`` mapping ``PC``:``byte``
+    :type RAM: dict[int, int]
+    :param bits: Number of bits in registers
+    :type bits: int
+    :return: Compiled function, or ``None`` if the program modifies its own instructions or stores past the max address
+    :rtype: Optional[Callable[[Machine, int], None]]"""
+    max_addr: int = max(RAM.keys(), default=-1)
+    reachable: list[int] = reachable_addresses(RAM)
+    sta: int = global_vars.MNEMONIC_TO_OPCODE["STA"]
+    for addr in reachable:
+        if addr in RAM and parse_opcode(RAM[addr]) == sta:
+            target: int = parse_arg(RAM[addr])
+            if target in reachable or target > max_addr:
+                return None
+    code: tuple[tuple[int, Optional[int]], ...] = tuple(
+        (addr, RAM.get(addr)) for addr in reachable
+    )
+    return _compile(bits, max_addr, code)
+
+
+@lru_cache(maxsize=1024)
+def _compile(
+    bits: int, max_addr: int, code: tuple[tuple[int, Optional[int]], ...]
+) -> Callable[[Machine, int], None]:
+    """Generate, ``exec``, and cache the function for ``code``, the ``(addr, byte)`` pairs of the reachable addresses."""
+    namespace: dict = {"_out": instructions.out}
+    exec(generate_source(bits, max_addr, dict(code)), namespace)
+    return namespace["_sap_program"]
+
+
+def generate_source(bits: int, max_addr: int, code: dict[int, Optional[int]]) -> str:
+    """Return the Python source of ``_sap_program(m, limit)`` for the reachable addresses in ``code``.
+
+    ``limit`` is the max value of ``m.steps``. Before a block that could exceed it, the compiled function
+    returns and leaves the rest to the interpreter, which raises ``StepLimitExceeded`` at the exact step.
+
+    :param bits: Number of bits in registers
+    :type bits: int
+    :param max_addr: Max address in RAM, executing past it drops off the bottom
+    :type max_addr: int
+    :param code: ``dict[int, Optional[int]]`` mapping each reachable address to its byte (``None`` if unmapped)
+    :type code: dict[int, Optional[int]]
+    :return: Python source
+    :rtype: str"""
+    mask: int = 2**bits - 1
+    leaders: set[int] = {0}
+    for addr, byte in code.items():
+        if byte is not None and parse_opcode(byte) in JUMP_OPCODES:
+            leaders.add(parse_arg(byte))
+
+    lines: list[str] = [
+        "def _sap_program(m, limit):",
+        "    mem, mapped = m.memory, m.mapped",
+        "    pc, a, b, fc, fz, steps = m.PC, m.A, m.B, m.FLAG_C, m.FLAG_Z, m.steps",
+        "    while True:",
+    ]
+    for i, leader in enumerate(sorted(leaders)):
+        lines.append(f"        {'if' if i == 0 else 'elif'} pc == {leader}:")
+        block, length = _block(leader, leaders, code, max_addr, mask)
+        if length:
+            block = (
+                [f"if steps > limit - {length}:"]
+                + [f"    {line}" for line in _exit(leader, 0)]
+                + block
+            )
+        lines.extend(f"            {line}" for line in block)
+    return "\n".join(lines) + "\n"
+
+
+def _exit(addr: int, count: int, halt: bool = False) -> list[str]:
+    """Lines that write the local registers back to the machine at ``addr`` and return.
+    ``count`` is the number of instructions executed in the block so far."""
+    lines: list[str] = [
+        f"m.PC, m.A, m.B, m.FLAG_C, m.FLAG_Z = {addr}, a, b, fc, fz",
+        f"m.steps = steps + {count}",
+        "m.mapped = mapped",
+    ]
+    if halt:
+        lines.append("m.EXECUTING = False")
+    lines.append("return")
+    return lines
+
+
+def _load(addr: int, arg: int, mask: int, count: int) -> list[str]:
+    """Lines that load ``Mem(arg)`` into ``v``, leaving to the interpreter if it's unmapped or doesn't fit in the registers."""
+    lines: list[str] = [f"if not mapped >> {arg} & 1:"] + [
+        f"    {line}" for line in _exit(addr, count)
+    ]
+    lines.append(f"v = mem[{arg}]")
+    if mask != 0xFF:
+        lines += [f"if v > {mask}:"] + [f"    {line}" for line in _exit(addr, count)]
+    return lines
+
+
+def _alu(opcode: int, mask: int) -> list[str]:
+    """Lines that execute ``ADD`` or ``SUB`` after ``Mem(arg)`` was loaded into ``v``."""
+    if opcode == global_vars.MNEMONIC_TO_OPCODE["ADD"]:
+        return [
+            "b = v",
+            "a += v",
+            f"if a > {mask}:",
+            f"    a -= {mask + 1}",
+            "    fc = 1",
+            "else:",
+            "    fc = 0",
+            "fz = a == 0",
+        ]
+    return ["b = v", "fc = a >= v", f"a = (a - v) & {mask}", "fz = a == 0"]
+
+
+def _jump(target: int, count: int) -> list[str]:
+    """Lines that transition to the block at ``target`` after ``count`` instructions in this block."""
+    return [f"steps += {count}", f"pc = {target}", "continue"]
+
+
+def _block(
+    leader: int,
+    leaders: set[int],
+    code: dict[int, Optional[int]],
+    max_addr: int,
+    mask: int,
+) -> tuple[list[str], int]:
+    """Lines of the straight-line block starting at ``leader``, and the max number of instructions it executes.
+
+    The block ends at a ``JMP``, ``HLT``, anything left to the interpreter, or the next leader.
+    """
+    opcodes: dict[str, int] = global_vars.MNEMONIC_TO_OPCODE
+    lines: list[str] = []
+    addr: int = leader
+    # Instructions executed in this block before addr
+    count: int = 0
+    while True:
+        if addr > max_addr:
+            # Let the interpreter raise DroppedOffBottom
+            return lines + _exit(addr, count), count
+        byte: Optional[int] = code[addr]
+        if byte is not None:
+            opcode: int = parse_opcode(byte)
+            arg: int = parse_arg(byte)
+            if opcode == opcodes["NOP"]:
+                pass
+            elif opcode == opcodes["LDA"]:
+                lines += _load(addr, arg, mask, count) + ["a = v"]
+            elif opcode in (opcodes["ADD"], opcodes["SUB"]):
+                lines += _load(addr, arg, mask, count) + _alu(opcode, mask)
+            elif opcode == opcodes["STA"]:
+                lines += [f"mem[{arg}] = a", f"mapped |= {1 << arg}"]
+            elif opcode == opcodes["LDI"]:
+                if arg > mask:
+                    return lines + _exit(addr, count), count
+                lines.append(f"a = {arg}")
+            elif opcode == opcodes["JMP"]:
+                return lines + _jump(arg, count + 1), count + 1
+            elif opcode == opcodes["JC"]:
+                lines += ["if fc:"] + [f"    {line}" for line in _jump(arg, count + 1)]
+            elif opcode == opcodes["JZ"]:
+                lines += ["if fz:"] + [f"    {line}" for line in _jump(arg, count + 1)]
+            elif opcode == opcodes["OUT"]:
+                lines += [f"m.PC, m.A = {addr}, a", "_out(m)"]
+            elif opcode == opcodes["HLT"]:
+                return lines + _exit(addr, count + 1, halt=True), count + 1
+            else:
+                # Invalid opcode
+                return lines + _exit(addr, count), count
+        addr += 1
+        count += 1
+        if addr in leaders:
+            return lines + _jump(addr, count), count
+
+
+@lru_cache(maxsize=1024)
+def compile_block(
+    bits: int, start: int, ops: tuple[tuple[int, int], ...]
+) -> Callable[[Machine], bool]:
+    """Compile the instructions ``ops`` at addresses ``start`` to ``start + len(ops) - 1`` into one superinstruction.
+
+    ``ops`` are ``(opcode, arg)`` pairs of ``NOP``, ``LDA``, ``ADD``, ``SUB``, and ``LDI`` (an unmapped address is ``(0, 0)``),
+    where every loaded address is mapped and every ``LDI`` arg fits in the registers. Such a block can't jump, store, or raise
+    an exception, except if a loaded value doesn't fit in the registers. The superinstruction checks that first, and
+    if any doesn't fit, it returns ``False`` without executing anything. Otherwise, it applies the effect of the whole block
+    on ``A``, ``B``, and the flags, sets ``PC`` to the address after the block, and returns ``True``.
+
+    :param bits: Number of bits in registers
+    :type bits: int
+    :param start: Address of the first instruction
+    :type start: int
+    :param ops: ``(opcode, arg)`` of each instruction
+    :type ops: tuple[tuple[int, int], ...]
+    :return: Superinstruction, called as ``block(machine)``
+    :rtype: Callable[[Machine], bool]"""
+    opcodes: dict[str, int] = global_vars.MNEMONIC_TO_OPCODE
+    mask: int = 2**bits - 1
+    loads: list[int] = sorted(
+        {
+            arg
+            for opcode, arg in ops
+            if opcode in (opcodes["LDA"], opcodes["ADD"], opcodes["SUB"])
+        }
+    )
+    lines: list[str] = ["def _sap_block(m):", "    mem = m.memory"]
+    if mask != 0xFF and loads:
+        check: str = " or ".join(f"mem[{arg}] > {mask}" for arg in loads)
+        lines += [f"    if {check}:", "        return False"]
+    lines.append("    a, b, fc, fz = m.A, m.B, m.FLAG_C, m.FLAG_Z")
+    for opcode, arg in ops:
+        if opcode == opcodes["LDA"]:
+            lines.append(f"    a = mem[{arg}]")
+        elif opcode in (opcodes["ADD"], opcodes["SUB"]):
+            lines += [
+                f"    {line}" for line in [f"v = mem[{arg}]"] + _alu(opcode, mask)
+            ]
+        elif opcode == opcodes["LDI"]:
+            lines.append(f"    a = {arg}")
+    lines += [
+        f"    m.PC, m.A, m.B, m.FLAG_C, m.FLAG_Z = {start + len(ops)}, a, b, fc, fz",
+        "    return True",
+    ]
+    namespace: dict = {}
+    exec("\n".join(lines) + "\n", namespace)
+    return namespace["_sap_block"]
@@ -0,0 +1,268 @@
+"""Time-travel debugging for ``run(..., debug=True)``.
+
+``History`` records every step of a run as a full copy of the ``Machine`` every ``interval`` steps (a checkpoint)
+plus a 6-byte delta per step (``PC``, ``A``, ``B``, flags, and the address and byte written by ``STA``, if any).
+Restoring step ``n`` copies the nearest checkpoint at or before ``n`` and applies at most ``interval - 1`` deltas,
+so stepping back is just as fast after millions of steps as after ten.
+
+``debug_loop()`` is the interactive loop of debug mode. Enter executes the next instruction, and the other commands
+are listed in ``COMMANDS``.
+"""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+import bisect
+import struct
+from typing import Callable, Optional
+import SAPsim.utils.exceptions as exceptions
+import SAPsim.utils.execute as execute
+import SAPsim.utils.global_vars as global_vars
+import SAPsim.utils.helpers as helpers
+from SAPsim.utils.machine import Machine
+from SAPsim.utils.output import OutputSink
+from SAPsim.utils.render import TableRenderer
+
+DEFAULT_CHECKPOINT_INTERVAL: int = 1024
+"""Default number of steps between checkpoints"""
+
+DELTA: struct.Struct = struct.Struct("<6B")
+"""``PC``, ``A``, ``B``, flags, written address, written byte"""
+
+_FLAG_C: int = 1
+_FLAG_Z: int = 2
+_EXECUTING: int = 4
+_WRITTEN: int = 8
+
+COMMANDS: str = """Commands:
+  (Enter)    Execute next instruction
+  b [N]      Step back N instructions (default 1)
+  j N        Jump to step N (the state after N instructions)
+  c ADDR     Continue until PC is ADDR (a breakpoint) or the program halts
+  h          Show this help"""
+"""Help text of ``debug_loop()``"""
+
+
+class History:
+    """Every state of a ``Machine`` since it was created, stored as checkpoints and per-step deltas.
+
+    :param machine: Machine at step 0 (``machine.steps == 0``)
+    :type machine: Machine
+    :param interval: Number of steps between checkpoints
+    :type interval: int"""
+
+    __slots__ = ("interval", "checkpoints", "deltas", "outs")
+
+    def __init__(
+        self, machine: Machine, interval: int = DEFAULT_CHECKPOINT_INTERVAL
+    ) -> None:
+        assert interval > 0
+        self.interval: int = interval
+        self.checkpoints: list[Machine] = [machine.copy()]
+        """``checkpoints[k]`` is a copy of the machine at step ``k * interval``"""
+        self.deltas: bytearray = bytearray()
+        """``DELTA`` of each step, packed"""
+        self.outs: list[int] = []
+        """Steps that executed ``OUT``, so ``machine.out_log`` can be truncated when restoring an earlier step"""
+
+    def __len__(self) -> int:
+        """Return the number of recorded steps."""
+        return len(self.deltas) // DELTA.size
+
+    def record(
+        self, machine: Machine, written: Optional[int] = None, out: bool = False
+    ) -> None:
+        """Record the state of ``machine`` after its latest step. ``machine.steps`` must be ``len(self) + 1``.
+
+        :param machine: Machine after executing a step
+        :type machine: Machine
+        :param written: Address written to by the step (``STA``), if any
+        :type written: Optional[int]
+        :param out: Whether the step executed ``OUT``
+        :type out: bool
+        :return: None"""
+        flags: int = (
+            machine.FLAG_C * _FLAG_C
+            | machine.FLAG_Z * _FLAG_Z
+            | machine.EXECUTING * _EXECUTING
+        )
+        value: int = 0
+        if written is not None:
+            flags |= _WRITTEN
+            value = machine.memory[written]
+        self.deltas += DELTA.pack(
+            machine.PC, machine.A, machine.B, flags, written or 0, value
+        )
+        if out:
+            self.outs.append(machine.steps - 1)
+        if machine.steps % self.interval == 0:
+            self.checkpoints.append(machine.copy())
+
+    def restore(self, machine: Machine, step: int) -> None:
+        """Load the state at step ``step`` into ``machine``. ``machine.out_log``, if any, keeps only the output of ``OUT`` before ``step``.
+
+        :param machine: Machine to modify
+        :type machine: Machine
+        :param step: Step, 0 to ``len(self)``
+        :type step: int
+        :raises IndexError: If ``step`` isn't recorded
+        :return: None"""
+        if not 0 <= step <= len(self):
+            raise IndexError(step)
+        checkpoint: Machine = self.checkpoints[step // self.interval]
+        machine.memory[:] = checkpoint.memory
+        machine.mapped = checkpoint.mapped
+        machine.PC, machine.A, machine.B = checkpoint.PC, checkpoint.A, checkpoint.B
+        machine.FLAG_C, machine.FLAG_Z = checkpoint.FLAG_C, checkpoint.FLAG_Z
+        machine.EXECUTING = checkpoint.EXECUTING
+        for _, _, _, flags, addr, value in DELTA.iter_unpack(
+            self.deltas[checkpoint.steps * DELTA.size : step * DELTA.size]
+        ):
+            if flags & _WRITTEN:
+                machine.memory[addr] = value
+                machine.mapped |= 1 << addr
+        if step > checkpoint.steps:
+            PC, A, B, flags, _, _ = DELTA.unpack_from(
+                self.deltas, (step - 1) * DELTA.size
+            )
+            machine.PC, machine.A, machine.B = PC, A, B
+            machine.FLAG_C = bool(flags & _FLAG_C)
+            machine.FLAG_Z = bool(flags & _FLAG_Z)
+            machine.EXECUTING = bool(flags & _EXECUTING)
+        machine.steps = step
+        if machine.out_log is not None:
+            del machine.out_log[bisect.bisect_left(self.outs, step) :]
+        machine.decoded = None
+        machine.blocks = None
+        machine.fused = 0
+
+    def truncate(self, step: int) -> None:
+        """Forget every step after ``step``, e.g., before executing again from an earlier step.
+
+        :param step: Last step to keep
+        :type step: int
+        :return: None"""
+        del self.deltas[step * DELTA.size :]
+        del self.checkpoints[step // self.interval + 1 :]
+        del self.outs[bisect.bisect_left(self.outs, step) :]
+
+
+def step(machine: Machine, history: History, max_steps: Optional[int] = None) -> None:
+    """Execute the next instruction of ``machine`` and record it in ``history``, forgetting any later recorded steps.
+
+    :param machine: Machine to execute
+    :type machine: Machine
+    :param history: History of ``machine``
+    :type history: History
+    :param max_steps: Max value of ``machine.steps``. Defaults to no limit.
+    :type max_steps: Optional[int]
+    :raises StepLimitExceeded: If ``machine.steps`` is already ``max_steps``
+    :return: None"""
+    if max_steps is not None and machine.steps >= max_steps:
+        raise exceptions.StepLimitExceeded(machine, machine.steps)
+    written: Optional[int] = None
+    out: bool = False
+    if machine.mapped >> machine.PC & 1:
+        byte: int = machine.memory[machine.PC]
+        opcode: int = helpers.parse_opcode(byte)
+        if opcode == global_vars.MNEMONIC_TO_OPCODE["STA"]:
+            written = helpers.parse_arg(byte)
+        out = opcode == global_vars.MNEMONIC_TO_OPCODE["OUT"]
+    if len(history) > machine.steps:
+        history.truncate(machine.steps)
+    execute.execute_next(machine)
+    history.record(machine, written, out)
+
+
+def debug_loop(
+    machine: Machine,
+    non_blocking: bool = False,
+    no_print: bool = False,
+    max_steps: Optional[int] = None,
+    interval: int = DEFAULT_CHECKPOINT_INTERVAL,
+    read_command: Callable[[], str] = input,
+    sink: Optional[OutputSink] = None,
+) -> History:
+    """Interactive loop of debug mode. Reads a command (see ``COMMANDS``) before each move and prints the new state.
+    The tables are printed by a ``TableRenderer`` each, so only rows that changed are formatted.
+
+    Returns when the program halts. With ``non_blocking``, no commands are read and every instruction is executed.
+
+    :param machine: Machine to debug
+    :type machine: Machine
+    :param non_blocking: Whether to execute every instruction without reading commands
+    :type non_blocking: bool
+    :param no_print: Whether to skip printing the state after each move
+    :type no_print: bool
+    :param max_steps: Max value of ``machine.steps``. Defaults to no limit.
+    :type max_steps: Optional[int]
+    :param interval: Number of steps between checkpoints
+    :type interval: int
+    :param read_command: Function that reads a command
+    :type read_command: Callable[[], str]
+    :param sink: Where to write the output of ``OUT`` collected in ``machine.out_log`` after each command, if any
+    :type sink: Optional[OutputSink]
+    :raises StepLimitExceeded: If the program would execute more than ``max_steps`` instructions
+    :return: History of the session
+    :rtype: History"""
+    history: History = History(machine, interval)
+    printed: int = 0
+    RAM_renderer: TableRenderer = TableRenderer(
+        helpers.RAM_HEADERS, machine.table_format
+    )
+    info_renderer: TableRenderer = TableRenderer((), machine.table_format)
+    while machine.EXECUTING:
+        command: list[str] = [] if non_blocking else read_command().split()
+        try:
+            if command == ["h"] or not _execute_command(
+                machine, history, command, max_steps
+            ):
+                print(COMMANDS)
+                continue
+        finally:
+            if sink is not None and machine.out_log is not None:
+                # Stepping back forgets later OUTs, so only write the OUTs executed by this command
+                printed = min(printed, len(machine.out_log))
+                sink.write(machine.out_log[printed:])
+                printed = len(machine.out_log)
+        if machine.EXECUTING and not no_print:
+            helpers.print_RAM(machine, RAM_renderer)
+            helpers.print_info(machine, info_renderer)
+    return history
+
+
+def _execute_command(
+    machine: Machine, history: History, command: list[str], max_steps: Optional[int]
+) -> bool:
+    """Execute a command of ``debug_loop()``, split into words. Returns ``False`` (and does nothing) if ``command`` is invalid."""
+    args: list[Optional[int]] = [_parse_int(word) for word in command[1:]]
+    if None in args:
+        return False
+    if not command:
+        step(machine, history, max_steps)
+    elif command[0] == "b" and len(args) <= 1:
+        back: int = args[0] if args else 1
+        history.restore(machine, max(machine.steps - back, 0))
+    elif command[0] == "j" and len(args) == 1:
+        target: int = max(args[0], 0)
+        if target <= len(history):
+            history.restore(machine, target)
+        else:
+            history.restore(machine, len(history))
+            while machine.EXECUTING and machine.steps < target:
+                step(machine, history, max_steps)
+    elif command[0] == "c" and len(args) == 1:
+        breakpoint_addr: int = args[0]
+        step(machine, history, max_steps)
+        while machine.EXECUTING and machine.PC != breakpoint_addr:
+            step(machine, history, max_steps)
+    else:
+        return False
+    return True
+
+
+def _parse_int(word: str) -> Optional[int]:
+    """Return ``word`` as an ``int``, or ``None`` if it isn't one."""
+    try:
+        return int(word)
+    except ValueError:
+        return None
@@ -0,0 +1,162 @@
+"""Evaluate a SAP program on every combination of inputs, building a truth table.
+
+``evaluate_all()`` parses the program once, then runs a copy of the same ``Machine`` per input tuple and
+records only the requested outputs and a termination status (the status codes of ``batch.py``), without building
+a ``get_state()`` dict per run. The results are stored in ``array('B')``, so checking that two programs are
+equivalent on every input is a single comparison (``table == reference_table``).
+"""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+import itertools
+from array import array
+from typing import Callable, Union
+import SAPsim.utils.exceptions as exceptions
+import SAPsim.utils.global_vars as global_vars
+import SAPsim.utils.parser as parser
+from SAPsim.utils.batch import EXCEPTION_TO_STATUS, HALTED
+from SAPsim.utils.execute import execute_compiled, execute_full_speed
+from SAPsim.utils.machine import Machine
+
+DEFAULT_MAX_STEPS: int = 10_000
+"""Default ``max_steps`` per input tuple. Input tuples that don't halt within it have status ``RUNNING``."""
+
+REGISTERS: tuple[str, ...] = ("PC", "A", "B", "FLAG_C", "FLAG_Z")
+"""Outputs that aren't RAM addresses."""
+
+
+class TruthTable:
+    """Outputs and termination status of a program for every input tuple, returned by ``evaluate_all()``.
+
+    Input tuples are in the order of ``itertools.product(*inputs.values())``.
+    Row ``i`` of the outputs is ``values[i * len(outputs) : (i + 1) * len(outputs)]``, and its status is ``status[i]``.
+    ``FLAG_C`` and ``FLAG_Z`` are stored as 0 or 1, and unmapped RAM addresses as 0.
+
+    :param inputs: ``dict[address, range]`` of inputs
+    :type inputs: dict[int, range]
+    :param outputs: RAM addresses and register names
+    :type outputs: list[Union[int, str]]"""
+
+    __slots__ = ("inputs", "outputs", "values", "status")
+
+    def __init__(self, inputs: dict[int, range], outputs: list[Union[int, str]]):
+        self.inputs: dict[int, range] = inputs
+        self.outputs: list[Union[int, str]] = outputs
+        self.values: array = array("B")
+        """Outputs of every input tuple, row-major"""
+        self.status: array = array("B")
+        """Status of every input tuple, see ``batch.STATUS_NAMES``"""
+
+    def __len__(self) -> int:
+        return len(self.status)
+
+    def __getitem__(self, values: tuple[int, ...]) -> tuple[tuple[int, ...], int]:
+        """Return ``(outputs, status)`` of the input tuple ``values`` (one value per input address)."""
+        index: int = 0
+        for value, inputs in zip(values, self.inputs.values()):
+            index = index * len(inputs) + inputs.index(value)
+        width: int = len(self.outputs)
+        return (
+            tuple(self.values[index * width : (index + 1) * width]),
+            self.status[index],
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TruthTable):
+            return NotImplemented
+        return (
+            self.inputs == other.inputs
+            and self.outputs == other.outputs
+            and self.status == other.status
+            and self.values == other.values
+        )
+
+    def mismatches(self, other: "TruthTable") -> list[tuple[int, ...]]:
+        """Return the input tuples whose outputs or status differ between ``self`` and ``other``.
+
+        :param other: Truth table with the same ``inputs`` and ``outputs``
+        :type other: TruthTable
+        :return: List of input tuples
+        :rtype: list[tuple[int, ...]]"""
+        width: int = len(self.outputs)
+        return [
+            values
+            for i, values in enumerate(itertools.product(*self.inputs.values()))
+            if self.status[i] != other.status[i]
+            or self.values[i * width : (i + 1) * width]
+            != other.values[i * width : (i + 1) * width]
+        ]
+
+
+def evaluate_all(
+    prog_path: str,
+    inputs: dict[int, range],
+    outputs: list[Union[int, str]],
+    bits: int = global_vars.NUM_BITS_IN_REGISTERS,
+    max_steps: int = DEFAULT_MAX_STEPS,
+    compiled: bool = False,
+) -> TruthTable:
+    """Run the .csv program at ``prog_path`` on every combination of ``inputs`` and return its truth table.
+
+    ``evaluate_all("ex1.csv", {14: range(256)}, [15, "A"])`` records ``RAM[15]`` and register ``A``
+    after running ``ex1.csv`` with each value 0 to 255 at address 14. Nothing is printed (including ``OUT``),
+    and no exceptions are raised during execution; see the ``status`` of each input tuple instead.
+
+    :param prog_path: .csv file in SAPsim format
+    :type prog_path: str
+    :param inputs: ``dict[address, range]`` of values to write to each RESERVED address, e.g., ``{14: range(256)}``
+    :type inputs: dict[int, range]
+    :param outputs: RAM addresses and register names (``"A"``, ``"B"``, ``"PC"``, ``"FLAG_C"``, ``"FLAG_Z"``) to record
+    :type outputs: list[Union[int, str]]
+    :param bits: Number of bits in registers
+    :type bits: int
+    :param max_steps: Max number of instructions per input tuple
+    :type max_steps: int
+    :param compiled: Whether to execute with ``execute_compiled()`` instead of ``execute_full_speed()``
+    :type compiled: bool
+    :return: Truth table
+    :rtype: TruthTable"""
+    template = Machine(parser.load_RAM(prog_path), bits=bits, no_print=True)
+    for addr, values in inputs.items():
+        if addr < 0:
+            raise exceptions.ChangeAddressNegative(addr)
+        if addr > global_vars.MAX_PC:
+            raise exceptions.ChangeAddressGreaterThan15(addr)
+        for value in values:
+            if value < 0 or value > 2**bits - 1:
+                raise exceptions.ChangeValueInvalid(value, bits)
+    getters: list[Callable[[Machine], int]] = []
+    for output in outputs:
+        if isinstance(output, str):
+            if output not in REGISTERS:
+                raise ValueError(
+                    f"Output {output} must be a RAM address or one of {', '.join(REGISTERS)}."
+                )
+            getters.append(lambda m, name=output: int(getattr(m, name)))
+        else:
+            if output < 0 or output > global_vars.MAX_PC:
+                raise ValueError(
+                    f"Output {output} must be a RAM address (0 to {global_vars.MAX_PC}) or one of {', '.join(REGISTERS)}."
+                )
+            getters.append(lambda m, addr=output: m.memory[addr])
+
+    table = TruthTable(dict(inputs), list(outputs))
+    execute: Callable = execute_compiled if compiled else execute_full_speed
+    addrs: tuple[int, ...] = tuple(inputs)
+    input_bits: int = sum(1 << addr for addr in addrs)
+    handled: tuple[type, ...] = tuple(EXCEPTION_TO_STATUS)
+    for values in itertools.product(*inputs.values()):
+        machine: Machine = template.copy()
+        # Collect OUT instead of formatting a table per OUT
+        machine.out_log = []
+        for addr, value in zip(addrs, values):
+            machine.memory[addr] = value
+        machine.mapped |= input_bits
+        try:
+            execute(machine, max_steps)
+            status: int = HALTED
+        except handled as e:
+            status = EXCEPTION_TO_STATUS[type(e)]
+        table.values.extend(get(machine) for get in getters)
+        table.status.append(status)
+    return table
@@ -5,55 +5,60 @@ __author__ = "Jesse Wei <jesse@cs.unc.edu>"
 from pathlib import Path
 import SAPsim.utils.helpers as helpers
 import SAPsim.utils.global_vars as global_vars
+from SAPsim.utils.machine import Machine
 
 
-def print_debug_info() -> None:
-    """When most Exceptions (not DroppedOffBottom) occur, this function is called to print the instruction that caused the Exception and program state (RAM and registers and flags)"""
-    curr_instruction = global_vars.RAM[global_vars.PC]
+def print_debug_info(machine: Machine) -> None:
+    """When most Exceptions (not DroppedOffBottom) occur, this function is called to print the instruction that caused the Exception and program state (RAM and registers and flags) of ``machine``.
+
+    Nothing is printed if ``machine.no_print``."""
+    if machine.no_print:
+        return
+    curr_instruction = machine.RAM[machine.PC]
     print(
-        f"Exception raised during execution of {global_vars.MNEMONIC_TO_OPCODE.inverse[helpers.parse_opcode(curr_instruction)]} {helpers.parse_arg(curr_instruction)} at address {global_vars.PC}"
+        f"Exception raised during execution of {global_vars.OPCODE_TO_MNEMONIC[helpers.parse_opcode(curr_instruction)]} {helpers.parse_arg(curr_instruction)} at address {machine.PC}"
     )
-    helpers.print_RAM()
-    helpers.print_info()
+    helpers.print_RAM(machine)
+    helpers.print_info(machine)
 
 
 class ARegisterNotEnoughBits(Exception):
     """The unsigned value in register A can't be stored in NUM_BITS_IN_REGISTERS bits."""
 
-    def __init__(self):
-        self.message = f"The unsigned value in register A can't be stored in {global_vars.NUM_BITS_IN_REGISTERS} bits."
-        print_debug_info()
+    def __init__(self, machine: Machine):
+        self.message = f"The unsigned value in register A can't be stored in {machine.NUM_BITS_IN_REGISTERS} bits."
+        print_debug_info(machine)
         super().__init__(self.message)
 
 
 class BRegisterNotEnoughBits(Exception):
     """The unsigned value in register B can't be stored in NUM_BITS_IN_REGISTERS bits."""
 
-    def __init__(self):
-        self.message = f"The unsigned value in register B can't be stored in {global_vars.NUM_BITS_IN_REGISTERS} bits."
-        print_debug_info()
+    def __init__(self, machine: Machine):
+        self.message = f"The unsigned value in register B can't be stored in {machine.NUM_BITS_IN_REGISTERS} bits."
+        print_debug_info(machine)
         super().__init__(self.message)
 
 
 class ARegisterNegativeInt(Exception):
     """There's somehow a negative number in unsigned register A."""
 
-    def __init__(self):
+    def __init__(self, machine: Machine):
         self.message = (
-            f"There's somehow a negative number {global_vars.A} in unsigned register A."
+            f"There's somehow a negative number {machine.A} in unsigned register A."
         )
-        print_debug_info()
+        print_debug_info(machine)
         super().__init__(self.message)
 
 
 class BRegisterNegativeInt(Exception):
     """There's somehow a negative number in unsigned register B."""
 
-    def __init__(self):
+    def __init__(self, machine: Machine):
         self.message = (
-            f"There's somehow a negative number {global_vars.B} in unsigned register B."
+            f"There's somehow a negative number {machine.B} in unsigned register B."
         )
-        print_debug_info()
+        print_debug_info(machine)
         super().__init__(self.message)
 
 
@@ -62,27 +67,76 @@ class DroppedOffBottom(Exception):
 
     def __init__(
         self,
+        machine: Machine,
         message=f"PC is greater than max address in RAM. Your program does not always HLT.",
     ):
         self.message = message
-        helpers.print_RAM()
-        helpers.print_info()
+        if not machine.no_print:
+            helpers.print_RAM(machine)
+            helpers.print_info(machine)
+        super().__init__(self.message)
+
+
+class InfiniteLoop(Exception):
+    """Raised if the program returns to a state (RAM, registers, and flags) it was in before, so it never halts."""
+
+    def __init__(self, machine: Machine, entry_pc: int, length: int):
+        self.entry_pc: int = entry_pc
+        """``PC`` of the first state in the cycle"""
+        self.length: int = length
+        """Number of instructions executed per iteration of the cycle"""
+        self.message = f"Your program never halts. Starting at address {entry_pc}, it repeats the same state every {length} instruction(s)."
+        if not machine.no_print:
+            helpers.print_RAM(machine)
+            helpers.print_info(machine)
+        super().__init__(self.message)
+
+
+class StepLimitExceeded(Exception):
+    """Raised if the program executed ``max_steps`` instructions without halting."""
+
+    def __init__(self, machine: Machine, steps: int):
+        self.steps: int = steps
+        """Number of instructions executed"""
+        self.last_pc: int = machine.PC
+        """``PC`` of the next instruction that would have been executed"""
+        self.message = f"Your program executed {steps} instruction(s) without halting, the max allowed. The next instruction was at address {machine.PC}."
+        if not machine.no_print:
+            helpers.print_RAM(machine)
+            helpers.print_info(machine)
         super().__init__(self.message)
 
 
 class LoadFromUnmappedAddress(Exception):
     """Raised if attempting to Mem(addr), but Addr is not mapped."""
 
-    def __init__(self):
-        self.message = f"Attempted to load from unmapped address {global_vars.PC}."
-        print_debug_info()
+    def __init__(self, machine: Machine):
+        self.message = f"Attempted to load from unmapped address {machine.PC}."
+        print_debug_info(machine)
+        super().__init__(self.message)
+
+
+class InvalidOpcode(Exception):
+    """Raised if attempting to execute a byte whose opcode isn't an instruction in the SAP instruction set."""
+
+    def __init__(self, machine: Machine, opcode: int):
+        self.opcode: int = opcode
+        """Opcode of the byte at ``PC``"""
+        self.message = (
+            f"Attempted to execute invalid opcode {opcode} at address {machine.PC}."
+        )
+        if not machine.no_print:
+            helpers.print_RAM(machine)
+            helpers.print_info(machine)
         super().__init__(self.message)
 
 
 class JumpToNegativeAddress(Exception):
-    def __init__(self, message=f"Attempted to jump to a negative address."):
+    def __init__(
+        self, machine: Machine, message=f"Attempted to jump to a negative address."
+    ):
         self.message = message
-        print_debug_info()
+        print_debug_info(machine)
         super().__init__(self.message)
 
 
@@ -90,7 +144,7 @@ class FileNotCSV(Exception):
     def __init__(
         self,
         path: Path,
-        message=f"Invalid filepath provided. Extension must be .csv",
+        message=f"Invalid filepath provided. Extension must be .csv (or .sapbin)",
     ):
         self.message = message
         self.message += f"\nYou provided the filepath: {path}"
@@ -184,8 +238,9 @@ class ChangeAddressGreaterThan15(Exception):
 
 
 class ChangeValueInvalid(Exception):
-    def __init__(self, value: int):
-        self.message = f"Changed value must fit in NUM_BITS_IN_REGISTERS (0 to {2**global_vars.NUM_BITS_IN_REGISTERS-1}). You provided {value}."
+    def __init__(self, value: int, bits: int = global_vars.NUM_BITS_IN_REGISTERS):
+        self.message = f"Changed value must fit in NUM_BITS_IN_REGISTERS (0 to {2**bits-1}). You provided {value}."
+        super().__init__(self.message)
 
 
 class InvalidFirstHexit(Exception):
@@ -201,8 +256,14 @@ class InvalidSecondHexit(Exception):
 
 
 class MoreThan16MappedAddresses(Exception):
-    def __init__(self):
-        self.message = f"A SAP program can have at most 16 addresses! In this simulation, a skipped address doesn't count toward that count. Excluding skipped addresses, you have {len(global_vars.RAM)} mapped addresses."
+    def __init__(self, num_mapped: int):
+        self.message = f"A SAP program can have at most 16 addresses! In this simulation, a skipped address doesn't count toward that count. Excluding skipped addresses, you have {num_mapped} mapped addresses."
+        super().__init__(self.message)
+
+
+class AddressGreaterThan15(Exception):
+    def __init__(self, address: int):
+        self.message = f"Address {address} of your program can't be greater than {global_vars.MAX_PC}."
         super().__init__(self.message)
 
 
@@ -3,113 +3,376 @@
 __author__ = "Jesse Wei <jesse@cs.unc.edu>"
 
 import sys
-from pathlib import Path
-from typing import Any, Union
+from typing import Any, Iterator, NamedTuple, Optional, TextIO, Union
 import SAPsim.utils.global_vars as global_vars
 import SAPsim.utils.instructions as instructions
 import SAPsim.utils.helpers as helpers
 from SAPsim.utils.helpers import is_documented_by
 import SAPsim.utils.exceptions as exceptions
 import SAPsim.utils.parser as parser
+import SAPsim.utils.compiler as compiler
+import SAPsim.utils.memo as memo
+import SAPsim.utils.output as output
+import SAPsim.utils.profiler as profiler
+from SAPsim.utils.machine import Machine
 
 
-def execute_full_speed() -> None:
-    """Execute instructions in ``RAM`` at full speed until ``EXECUTING`` is ``False`` or ``PC > max addr``.
+def execute_full_speed(machine: Machine, max_steps: Optional[int] = None) -> None:
+    """Execute instructions in ``machine.RAM`` at full speed until ``EXECUTING`` is ``False`` or ``PC > max addr``.
 
+    Each address is decoded once into ``machine.decoded`` (see ``instructions.decode_table()``),
+    so each step is a single indexed call. ``sta()`` invalidates the entry of the address it writes to.
+    Straight-line runs of instructions are executed as one superinstruction (see ``fuse_blocks()``)
+    unless that would exceed ``max_steps``.
+
+    :param machine: Machine to execute
+    :type machine: Machine
+    :param max_steps: Max value of ``machine.steps``. Defaults to no limit.
+    :type max_steps: Optional[int]
+    :raises StepLimitExceeded: If the program would execute more than ``max_steps`` instructions.
+        The machine is left as it was before the next instruction, so it can be resumed.
     :return: None"""
-    max_addr: int = 0
-    if global_vars.RAM.keys():
-        max_addr = max(global_vars.RAM.keys())
-    while global_vars.EXECUTING:
-        # Check that RAM is non-empty.
-        if global_vars.RAM.keys() and global_vars.PC > max_addr:
-            global_vars.EXECUTING = False
-            raise exceptions.DroppedOffBottom
-
-        # If we're executing an empty address but it's not a DroppedOffBottom, just skip and don't execute
-        if global_vars.PC not in global_vars.RAM:
-            global_vars.PC += 1
+    if machine.decoded is None:
+        machine.decoded = instructions.decode_table(machine)
+    if machine.blocks is None:
+        machine.blocks = fuse_blocks(machine)
+    decoded: list = machine.decoded
+    blocks: list = machine.blocks
+    limit: int = sys.maxsize if max_steps is None else max_steps
+    # Count in a local and write back once, even if an exception is raised
+    steps: int = machine.steps
+    try:
+        while machine.EXECUTING:
+            block = blocks[machine.PC]
+            if block is not None and steps + block[1] <= limit and block[0](machine):
+                steps += block[1]
+                continue
+            if steps >= limit:
+                raise exceptions.StepLimitExceeded(machine, steps)
+            procedure, arg = decoded[machine.PC]
+            procedure(machine, arg)
+            steps += 1
+    finally:
+        machine.steps = steps
+
+
+def fuse_blocks(machine: Machine) -> list:
+    """Find the straight-line runs of instructions in ``machine.RAM`` and compile each into a superinstruction.
+
+    A run is 2 or more consecutive ``NOP``, ``LDA``, ``ADD``, ``SUB``, ``LDI`` instructions (or unmapped addresses, executed as ``NOP``)
+    that can't raise an exception (see ``compiler.compile_block()``). So a run never contains a jump, ``STA``, ``OUT``, ``HLT``,
+    a load from an unmapped address, or the address past the max address (dropping off the bottom).
+    Every address in a run starts its own block to the end of the run, so jumping into the middle of a run is fused too.
+
+    If ``sta()`` later writes into a block, the block is removed and its instructions are executed one at a time.
+    Also sets ``machine.fused``.
+
+    :param machine: Machine to analyze
+    :type machine: Machine
+    :return: ``(block, length)`` or ``None`` for each address ``PC`` can be (``MAX_PC + 2`` entries)
+    :rtype: list"""
+    opcodes: dict[str, int] = global_vars.MNEMONIC_TO_OPCODE
+    mask: int = 2**machine.NUM_BITS_IN_REGISTERS - 1
+    loads: tuple[int, ...] = (opcodes["LDA"], opcodes["ADD"], opcodes["SUB"])
+    ops: list[Optional[tuple[int, int]]] = []
+    for addr in range(global_vars.MAX_PC + 1):
+        op: Optional[tuple[int, int]] = None
+        if addr > machine.max_addr():
+            pass
+        elif not machine.mapped >> addr & 1:
+            op = (opcodes["NOP"], 0)
+        else:
+            opcode: int = helpers.parse_opcode(machine.memory[addr])
+            arg: int = helpers.parse_arg(machine.memory[addr])
+            if (
+                opcode == opcodes["NOP"]
+                or (opcode in loads and machine.mapped >> arg & 1)
+                or (opcode == opcodes["LDI"] and arg <= mask)
+            ):
+                op = (opcode, arg)
+        ops.append(op)
+
+    blocks: list = [None] * (global_vars.MAX_PC + 2)
+    machine.fused = 0
+    run_end: int = 0
+    for addr in range(global_vars.MAX_PC, -1, -1):
+        if ops[addr] is None:
             continue
+        if addr + 1 > global_vars.MAX_PC or ops[addr + 1] is None:
+            run_end = addr + 1
+        if run_end - addr >= 2:
+            blocks[addr] = (
+                compiler.compile_block(
+                    machine.NUM_BITS_IN_REGISTERS, addr, tuple(ops[addr:run_end])
+                ),
+                run_end - addr,
+            )
+            machine.fused |= ((1 << (run_end - addr)) - 1) << addr
+    return blocks
+
+
+def execute_compiled(machine: Machine, max_steps: Optional[int] = None) -> None:
+    """Same as ``execute_full_speed()``, but executes the program compiled by ``compiler.compile_program()``.
+
+    Falls back to ``execute_full_speed()`` if the program can't be compiled (e.g., it modifies its own instructions),
+    if ``PC`` isn't 0, and to execute (and raise the exception of) any instruction the compiled function leaves to the interpreter.
+
+    :param machine: Machine to execute
+    :type machine: Machine
+    :param max_steps: Max value of ``machine.steps``. Defaults to no limit.
+    :type max_steps: Optional[int]
+    :return: None"""
+    if machine.EXECUTING and machine.PC == 0:
+        program = compiler.compile_program(
+            dict(machine.RAM), machine.NUM_BITS_IN_REGISTERS
+        )
+        if program is not None:
+            program(machine, sys.maxsize if max_steps is None else max_steps)
+    execute_full_speed(machine, max_steps)
+
 
-        instructions.OPCODE_TO_INSTR_PROCEDURE[
-            helpers.parse_opcode(global_vars.RAM[global_vars.PC])
-        ](helpers.parse_arg(global_vars.RAM[global_vars.PC]))
+def execute_detect_loops(machine: Machine, max_steps: Optional[int] = None) -> None:
+    """Same as ``execute_full_speed()``, but raises ``InfiniteLoop`` if the program never halts.
 
+    A SAP machine has finitely many states, so a program that never halts must eventually repeat a state.
+    Uses Brent's cycle detection, so only one saved state is kept no matter how long the program runs.
+    Once a repeat is found, the program is replayed from the initial state (without ``OUT`` output) to find where the cycle starts.
 
-def execute_next() -> None:
+    :param machine: Machine to execute
+    :type machine: Machine
+    :param max_steps: Max value of ``machine.steps``. Defaults to no limit.
+    :type max_steps: Optional[int]
+    :raises InfiniteLoop: If a state repeats
+    :raises StepLimitExceeded: If the program would execute more than ``max_steps`` instructions
+    :return: None"""
+    if not machine.EXECUTING:
+        return
+    initial: Machine = machine.copy()
+    if machine.decoded is None:
+        machine.decoded = instructions.decode_table(machine)
+    decoded: list = machine.decoded
+    power: int = 1
+    length: int = 1
+    saved: Machine = machine.copy()
+    limit: int = sys.maxsize if max_steps is None else max_steps
+    while True:
+        if machine.steps >= limit:
+            raise exceptions.StepLimitExceeded(machine, machine.steps)
+        procedure, arg = decoded[machine.PC]
+        procedure(machine, arg)
+        machine.steps += 1
+        if not machine.EXECUTING:
+            return
+        if _same_state(machine, saved):
+            break
+        if length == power:
+            saved = machine.copy()
+            power *= 2
+            length = 0
+        length += 1
+
+    # A state repeated every length steps. Find the first state in the cycle.
+    tortoise: Machine = initial.copy()
+    hare: Machine = initial.copy()
+    for _ in range(length):
+        _execute_next_without_output(hare)
+    while not _same_state(tortoise, hare):
+        _execute_next_without_output(tortoise)
+        _execute_next_without_output(hare)
+    machine.EXECUTING = False
+    raise exceptions.InfiniteLoop(machine, tortoise.PC, length)
+
+
+def _same_state(machine: Machine, other: Machine) -> bool:
+    """Whether ``machine`` and ``other`` have the same RAM, registers, and flags. Registers are compared first since they're cheap."""
+    return (
+        machine.PC == other.PC
+        and machine.A == other.A
+        and machine.B == other.B
+        and machine.FLAG_C == other.FLAG_C
+        and machine.FLAG_Z == other.FLAG_Z
+        and machine.mapped == other.mapped
+        and machine.memory == other.memory
+    )
+
+
+def _execute_next_without_output(machine: Machine) -> None:
+    """``execute_next()``, except ``OUT`` only does ``PC += 1``. Used to replay a program without printing."""
+    if (
+        machine.PC in machine.RAM
+        and helpers.parse_opcode(machine.RAM[machine.PC])
+        == global_vars.MNEMONIC_TO_OPCODE["OUT"]
+    ):
+        machine.PC += 1
+    else:
+        execute_next(machine)
+
+
+def execute_next(machine: Machine) -> None:
     """Execute a single instruction at the current ``PC`` value if ``EXECUTING``.
     If attempting to execute an empty address, ``PC += 1`` (i.e., doesn't skip to next filled address).
 
+    :param machine: Machine to execute
+    :type machine: Machine
     :return: None"""
-    if global_vars.EXECUTING:
-        if global_vars.RAM.keys() and global_vars.PC > max(global_vars.RAM.keys()):
-            global_vars.EXECUTING = False
-            raise exceptions.DroppedOffBottom
+    if machine.EXECUTING:
+        if not machine.mapped >> machine.PC:
+            machine.EXECUTING = False
+            raise exceptions.DroppedOffBottom(machine)
 
         # If executing an empty address, just skip and don't execute
-        if global_vars.PC not in global_vars.RAM:
-            global_vars.PC += 1
+        if not machine.mapped >> machine.PC & 1:
+            machine.PC += 1
         else:
-            instructions.OPCODE_TO_INSTR_PROCEDURE[
-                helpers.parse_opcode(global_vars.RAM[global_vars.PC])
-            ](helpers.parse_arg(global_vars.RAM[global_vars.PC]))
+            byte: int = machine.memory[machine.PC]
+            opcode: int = helpers.parse_opcode(byte)
+            if opcode not in instructions.OPCODE_TO_INSTR_PROCEDURE:
+                machine.EXECUTING = False
+                raise exceptions.InvalidOpcode(machine, opcode)
+            instructions.OPCODE_TO_INSTR_PROCEDURE[opcode](
+                machine, helpers.parse_arg(byte)
+            )
+        machine.steps += 1
 
 
-def run(prog_path: str, **kwargs) -> Union[None, dict[str, Any]]:
-    r"""Run given .csv program in SAPsim format.
+class TraceRecord(NamedTuple):
+    """State after one executed instruction, yielded by ``iter_trace()``."""
 
-    :param prog_path:
-        .csv file in SAPsim format.
-    :type prog_path: ``str``
-    :param \**kwargs:
-        See below
+    step: int
+    """Index of the instruction (0 for the first executed)"""
+    PC: int
+    """Address of the instruction"""
+    opcode: Optional[int]
+    """Opcode of the instruction, or ``None`` if ``PC`` was unmapped (skipped)"""
+    arg: Optional[int]
+    """Arg of the instruction, or ``None`` if ``PC`` was unmapped (skipped)"""
+    A: int
+    B: int
+    FLAG_C: bool
+    FLAG_Z: bool
+    written: Optional[int]
+    """Address written to by ``STA``, otherwise ``None``"""
 
-    :Keyword Arguments:
-        * *debug* (``bool``) --
-            * Whether to run in debug mode (True) or at full speed (False)
-            * Default is full speed
-        * *change* (``dict[int, int]``) --
-            * dict[address, byte] of values to change in RAM
-            * The value at each address (0 to 15) will be overwritten to that byte
-            * Useful for debugging programs (edit a value without changing the CSV)
-            * Useful for autograding programs (overwrite a reserved instruction/data value)
-        * *table_format* (``str``) --
-            * Printed table format
-            * Options: https://github.com/astanin/python-tabulate#table-format
-            * Default value in ``global_vars`` is ``"simple_outline"``
-        * The rest of the parameters are pretty much exclusively for unit testing, and you should not use these
-            * *return_state* (``bool``) --
-                * If ``True``, then program state will be returned
-                * See ``utils.helpers.get_state()``
-                * Will probably cause type warnings since the return type is ``Union[None, dict[str, Any]]``
-                * To avoid type warnings, use ``run_and_return_state``
-            * *non_blocking* (``bool``) --
-                * This is used to unit test debug mode of ``run()``, you likely don't have a need for this
-                * If ``True``, then ``run()`` won't block on input
-                * ``input()`` won't be called in debug mode (i.e., don't have to press enter to continue execution)
-                * If this is ``True``, then debug mode will be on even if ``debug`` isn't in kwargs
-            * *no_print* (``bool``) --
-                * This is used to save computation time during unit testing
-                * If ``True``, then ``print_RAM()`` and ``print_info()`` won't be called
-                * In debug mode, "Program halted." will still be printed
-            * *bits* (``int``) --
-                * You should not modify this
-                * Number of bits in registers
-                * Default value in ``global_vars`` is 8
-                * 8 is also the maximum value since everything in RAM should fit in a byte
 
-    :return: ``None`` or program state if ``return_state``
-    :rtype: ``Union[None, dict[str, Any]]``
+def iter_trace(prog_path: str, **kwargs) -> Iterator[TraceRecord]:
+    r"""Run given .csv program in SAPsim format, yielding a ``TraceRecord`` after each executed instruction.
+
+    This is a generator, so nothing is kept after a record is yielded, and the caller can stop early
+    (e.g., ``itertools.islice(iter_trace("ex2.csv"), 100)``). RAM, registers, and ``OUT`` aren't printed.
+    Exceptions raised during execution (including ``StepLimitExceeded``) propagate to the caller after the last record.
+
+    :param prog_path: Path to .csv program in SAPsim format
+    :type prog_path: str
+    :param \**kwargs: ``change``, ``max_steps``, ``bits``, ``table_format``, and ``no_print`` behave as in ``run()``. Other keyword arguments of ``run()`` are ignored.
+    :return: Iterator of ``TraceRecord``
+    :rtype: Iterator[TraceRecord]
     """
+    _check_kwargs(prog_path, kwargs)
+    machine: Machine = _load_machine(prog_path, kwargs)
+    yield from trace_machine(machine, kwargs.get("max_steps"))
+
+
+def trace_machine(
+    machine: Machine, max_steps: Optional[int] = None
+) -> Iterator[TraceRecord]:
+    """Execute ``machine`` one instruction at a time, yielding a ``TraceRecord`` after each. Used by ``iter_trace()``.
+
+    If ``machine.out_log`` is ``None``, ``OUT`` prints nothing. The value output by each ``OUT`` is ``A`` of its record.
+
+    :param machine: Machine to execute
+    :type machine: Machine
+    :param max_steps: Max value of ``machine.steps``. Defaults to no limit.
+    :type max_steps: Optional[int]
+    :raises StepLimitExceeded: If the program would execute more than ``max_steps`` instructions
+    :return: Iterator of ``TraceRecord``
+    :rtype: Iterator[TraceRecord]"""
+    sta: int = global_vars.MNEMONIC_TO_OPCODE["STA"]
+    # Collect OUT instead of formatting a table per OUT, and forget it after each step (it's in the records)
+    discard_out: bool = machine.out_log is None
+    if discard_out:
+        machine.out_log = []
+    while machine.EXECUTING:
+        if max_steps is not None and machine.steps >= max_steps:
+            raise exceptions.StepLimitExceeded(machine, machine.steps)
+        PC: int = machine.PC
+        opcode: Optional[int] = None
+        arg: Optional[int] = None
+        if machine.mapped >> PC & 1:
+            byte: int = machine.memory[PC]
+            opcode, arg = helpers.parse_opcode(byte), helpers.parse_arg(byte)
+        execute_next(machine)
+        if discard_out:
+            machine.out_log.clear()
+        yield TraceRecord(
+            machine.steps - 1,
+            PC,
+            opcode,
+            arg,
+            machine.A,
+            machine.B,
+            machine.FLAG_C,
+            machine.FLAG_Z,
+            arg if opcode == sta else None,
+        )
+
+
+def execute_profiled(machine: Machine, max_steps: Optional[int] = None) -> None:
+    """Same as ``execute_full_speed()``, but one instruction at a time, counting into ``machine.profile`` (see ``profiler.py``).
+
+    Creates ``machine.profile`` if it's ``None``.
+
+    :param machine: Machine to execute
+    :type machine: Machine
+    :param max_steps: Max value of ``machine.steps``. Defaults to no limit.
+    :type max_steps: Optional[int]
+    :raises StepLimitExceeded: If the program would execute more than ``max_steps`` instructions
+    :return: None"""
+    if machine.profile is None:
+        machine.profile = profiler.Profile()
+    profile: profiler.Profile = machine.profile
+    opcodes: dict[str, int] = global_vars.MNEMONIC_TO_OPCODE
+    reads: tuple[int, ...] = (opcodes["LDA"], opcodes["ADD"], opcodes["SUB"])
+    STA: int = opcodes["STA"]
+    JC: int = opcodes["JC"]
+    JZ: int = opcodes["JZ"]
+    procedures: dict = instructions.OPCODE_TO_INSTR_PROCEDURE
+    limit: int = sys.maxsize if max_steps is None else max_steps
+    while machine.EXECUTING:
+        if machine.steps >= limit:
+            raise exceptions.StepLimitExceeded(machine, machine.steps)
+        PC: int = machine.PC
+        if not machine.mapped >> PC & 1:
+            # Skip an unmapped address, or raise DroppedOffBottom
+            execute_next(machine)
+            profile.addresses[PC] += 1
+            continue
+        byte: int = machine.memory[PC]
+        opcode: int = byte >> 4
+        arg: int = byte & 0xF
+        if opcode not in procedures:
+            machine.EXECUTING = False
+            raise exceptions.InvalidOpcode(machine, opcode)
+        profile.opcodes[opcode] += 1
+        profile.addresses[PC] += 1
+        if opcode in reads:
+            profile.reads[arg] += 1
+        elif opcode == STA:
+            profile.writes[arg] += 1
+        elif opcode == JC or opcode == JZ:
+            if machine.FLAG_C if opcode == JC else machine.FLAG_Z:
+                profile.taken[PC] += 1
+            else:
+                profile.not_taken[PC] += 1
+        procedures[opcode](machine, arg)
+        machine.steps += 1
+
+
+def _check_kwargs(prog_path: str, kwargs: dict[str, Any]) -> None:
+    """Raise ``TypeError`` if ``prog_path`` or any keyword argument of ``run()`` has the wrong type."""
     if not isinstance(prog_path, str):
         raise TypeError("Required parameter prog_path must be a str.")
-    debug: bool = False
-    if "debug" in kwargs:
-        if not isinstance(kwargs["debug"], bool):
-            raise TypeError("Keyword argument debug must be a bool.")
-        debug = kwargs["debug"]
-    # Not initializing it causes some syntax warnings but better than initializing it
-    change: dict[int, int]
+    if "debug" in kwargs and not isinstance(kwargs["debug"], bool):
+        raise TypeError("Keyword argument debug must be a bool.")
     if "change" in kwargs:
         change = kwargs["change"]
         if not isinstance(change, dict):
@@ -118,81 +381,225 @@ def run(prog_path: str, **kwargs) -> Union[None, dict[str, Any]]:
             isinstance(value, int) for value in change.values()
         ):
             raise TypeError("Keyword argument change must be a dict[int, int].")
+    if "compiled" in kwargs and not isinstance(kwargs["compiled"], bool):
+        raise TypeError("Keyword argument compiled must be a bool.")
+    if "detect_loops" in kwargs and not isinstance(kwargs["detect_loops"], bool):
+        raise TypeError("Keyword argument detect_loops must be a bool.")
+    if "memoize" in kwargs and not isinstance(kwargs["memoize"], bool):
+        raise TypeError("Keyword argument memoize must be a bool.")
+    if "profile" in kwargs and not isinstance(kwargs["profile"], bool):
+        raise TypeError("Keyword argument profile must be a bool.")
+    if "max_steps" in kwargs:
+        max_steps = kwargs["max_steps"]
+        if not isinstance(max_steps, int) or max_steps < 0:
+            raise TypeError("Keyword argument max_steps must be a non-negative int.")
+    if "output" in kwargs and kwargs["output"] not in output.OUTPUT_FORMATS:
+        raise TypeError(
+            f"Keyword argument output must be one of {', '.join(output.OUTPUT_FORMATS)}."
+        )
+    if "output_file" in kwargs and not isinstance(kwargs["output_file"], str):
+        raise TypeError("Keyword argument output_file must be a str.")
     if "table_format" in kwargs and not isinstance(kwargs["table_format"], str):
         raise TypeError("Keyword argument table_format must be a str.")
     if "return_state" in kwargs and not isinstance(kwargs["return_state"], bool):
         raise TypeError("Keyword argument return_state must be a bool.")
-    if "non_blocking" in kwargs:
-        if not isinstance(kwargs["non_blocking"], bool):
-            raise TypeError("Keyword argument non_blocking must be a bool.")
-        debug = True
+    if "non_blocking" in kwargs and not isinstance(kwargs["non_blocking"], bool):
+        raise TypeError("Keyword argument non_blocking must be a bool.")
     if "no_print" in kwargs and not isinstance(kwargs["no_print"], bool):
         raise TypeError("Keyword argument no_print must be a bool.")
     if "bits" in kwargs and not isinstance(kwargs["bits"], int):
         raise TypeError("Keyword argument bits must be an int.")
 
-    path: Path = Path(prog_path)
-    if not path.suffix == ".csv":
-        raise exceptions.FileNotCSV(path)
-    parser.parse_csv(path)
+
+def _load_machine(prog_path: str, kwargs: dict[str, Any]) -> Machine:
+    """Parse ``prog_path`` into a new ``Machine`` and apply ``change``, using the keyword arguments of ``run()``."""
+    bits: int = global_vars.NUM_BITS_IN_REGISTERS
     if "bits" in kwargs:
         assert kwargs["bits"] > 1 and kwargs["bits"] < 8
-        global_vars.NUM_BITS_IN_REGISTERS = kwargs["bits"]
-        # Don't need to call setup.
-        # All it does is change NUM_BITS_IN_REGISTERS and reset globals, which was already done by parse_csv.
+        bits = kwargs["bits"]
+    machine: Machine = Machine(
+        parser.load_RAM(prog_path),
+        bits=bits,
+        table_format=kwargs.get("table_format", global_vars.table_format),
+        no_print=kwargs.get("no_print", False),
+    )
     unmapped_addrs_changed: list[int] = []
     if "change" in kwargs:
+        change: dict[int, int] = kwargs["change"]
         for addr in change:
-            if addr not in global_vars.RAM:
+            if addr not in machine.RAM:
                 unmapped_addrs_changed.append(int(addr))
             if addr < 0:
                 raise exceptions.ChangeAddressNegative(addr)
             if addr > global_vars.MAX_PC:
                 raise exceptions.ChangeAddressGreaterThan15(addr)
-            if (
-                change[addr] < 0
-                or change[addr] > 2**global_vars.NUM_BITS_IN_REGISTERS - 1
-            ):
-                raise exceptions.ChangeValueInvalid(change[addr])
-            global_vars.RAM[addr] = change[addr]
+            if change[addr] < 0 or change[addr] > 2**bits - 1:
+                raise exceptions.ChangeValueInvalid(change[addr], bits)
+            machine.RAM[addr] = change[addr]
         if unmapped_addrs_changed:
             print(
                 f"WARNING: You attempted to change the following address(es) not mapped in the CSV: {', '.join(list(map(str, unmapped_addrs_changed)))}.\nThis is likely unintentional, but they are now mapped, and the program will continue.",
                 file=sys.stderr,
             )
-    if "table_format" in kwargs:
-        global_vars.table_format = kwargs["table_format"]
+    return machine
+
+
+def _run_machine(
+    machine: Machine,
+    prog_path: str,
+    kwargs: dict[str, Any],
+    debug: bool,
+    max_steps: Optional[int],
+    sink: "output.OutputSink",
+) -> None:
+    """Run ``machine`` in the mode chosen by the keyword arguments of ``run()``, writing ``OUT`` output to ``sink``."""
     if debug:
         if not kwargs.get("no_print"):
             print(f"Initial state of simulation of {prog_path}")
-            helpers.print_RAM()
-            helpers.print_info()
+            helpers.print_RAM(machine)
+            helpers.print_info(machine)
             print("Debug mode: press Enter to execute next instruction ( > ).")
-        if not kwargs.get("non_blocking"):
-            input()
-        while global_vars.EXECUTING:
-            # Special case so that you don't have to press Enter twice to halt on a HLT instruction
-            if (
-                global_vars.PC in global_vars.RAM
-                and helpers.parse_opcode(global_vars.RAM[global_vars.PC]) == 0xF
-            ):
-                execute_next()
-                break
-            execute_next()
-            if not kwargs.get("no_print"):
-                helpers.print_RAM()
-                helpers.print_info()
             if not kwargs.get("non_blocking"):
-                input()
+                print(
+                    "Type h for commands to step back, jump to a step, or continue to a breakpoint."
+                )
+        # Imported on first use, debug mode is only used interactively
+        import SAPsim.utils.debugger as debugger
+
+        debugger.debug_loop(
+            machine,
+            non_blocking=kwargs.get("non_blocking", False),
+            no_print=kwargs.get("no_print", False),
+            max_steps=max_steps,
+            sink=sink,
+        )
         print("Program halted.")
     else:
-        execute_full_speed()
+        executor = execute_compiled if kwargs.get("compiled") else execute_full_speed
+        try:
+            if kwargs.get("profile"):
+                execute_profiled(machine, max_steps)
+            elif kwargs.get("detect_loops"):
+                execute_detect_loops(machine, max_steps)
+            elif kwargs.get("memoize"):
+                memo.transition_cache.execute(machine, executor, max_steps)
+            else:
+                executor(machine, max_steps)
+        finally:
+            sink.write(machine.out_log)
         if not kwargs.get("no_print"):
-            helpers.print_RAM()
-            helpers.print_info()
+            helpers.print_RAM(machine)
+            helpers.print_info(machine)
+
+
+def run(prog_path: str, **kwargs) -> Union[None, dict[str, Any]]:
+    r"""Run given .csv program in SAPsim format.
+
+    Each call simulates its own ``Machine``, so ``run()`` can be called from several threads at once.
+    Parsed programs are cached until the file changes (see ``parser.parse_csv_cached()``), so running the same file many times only parses it once.
+
+    :param prog_path:
+        .csv file in SAPsim format, or a ``.sapbin`` image of one (see ``parser.convert_csv()``).
+    :type prog_path: ``str``
+    :param \**kwargs:
+        See below
+
+    :Keyword Arguments:
+        * *debug* (``bool``) --
+            * Whether to run in debug mode (True) or at full speed (False)
+            * Default is full speed
+        * *change* (``dict[int, int]``) --
+            * dict[address, byte] of values to change in RAM
+            * The value at each address (0 to 15) will be overwritten to that byte
+            * Useful for debugging programs (edit a value without changing the CSV)
+            * Useful for autograding programs (overwrite a reserved instruction/data value)
+        * *compiled* (``bool``) --
+            * Whether to compile the program to a Python function before running it at full speed (see ``compiler.py``)
+            * Much faster for long-running programs and for running the same program many times (e.g., autograding)
+            * Programs that modify their own instructions are interpreted as usual
+            * Ignored in debug mode
+            * Default is ``False``
+        * *detect_loops* (``bool``) --
+            * Whether to raise ``InfiniteLoop`` (with the address and length of the loop) if the program never halts
+            * Otherwise, such a program runs forever
+            * Ignored in debug mode. If ``True``, ``compiled`` is ignored.
+            * Default is ``False``
+        * *memoize* (``bool``) --
+            * Whether to cache the result of running the program from its initial state (see ``memo.py``)
+            * Running an identical program (with the same ``change``) again restores the cached result instead of executing, and ``OUT`` is output again
+            * Hits and misses are reported by ``memo.transition_cache.cache_info()``
+            * Ignored in debug mode and if ``detect_loops``
+            * Default is ``False``
+        * *profile* (``bool``) --
+            * Whether to count instructions per opcode and per address, RAM reads and writes per address, and taken and not-taken ``JC``/``JZ`` branches (see ``profiler.py``)
+            * The counts are ``"profile"`` in the returned state (``None`` if ``False``)
+            * Executes one instruction at a time, so it's slower, but runs without it aren't slowed down at all
+            * Ignored in debug mode. If ``True``, ``compiled``, ``detect_loops``, and ``memoize`` are ignored.
+            * Default is ``False``
+        * *max_steps* (``int``) --
+            * Max number of instructions to execute (including ``HLT``)
+            * ``StepLimitExceeded`` (with the number of steps and the last ``PC``) is raised if the program doesn't halt within ``max_steps`` instructions
+            * Useful for autograding programs that might never halt
+            * The number of instructions executed is ``"steps"`` in the returned state
+            * Default is no limit
+        * *output* (``str``) --
+            * How to print the values output by ``OUT`` (see ``output.py``)
+            * ``"table"`` prints a | PC | A (dec) | A (hex) | table, ``"raw"`` prints one value per line, and ``"none"`` prints nothing
+            * They're collected during execution and printed all at once when the program stops (in debug mode, after each command)
+            * The values are ``"OUT"`` in the returned state, whatever the format
+            * Default is ``"table"``
+        * *output_file* (``str``) --
+            * Path of a file to write the output of ``OUT`` to (overwritten), instead of printing it
+            * Default is to print
+        * *table_format* (``str``) --
+            * Printed table format
+            * Options: https://github.com/astanin/python-tabulate#table-format
+            * Default value is ``global_vars.table_format`` (``"simple_outline"``)
+        * The rest of the parameters are pretty much exclusively for unit testing, and you should not use these
+            * *return_state* (``bool``) --
+                * If ``True``, then program state will be returned
+                * See ``utils.helpers.get_state()``
+                * Will probably cause type warnings since the return type is ``Union[None, dict[str, Any]]``
+                * To avoid type warnings, use ``run_and_return_state``
+            * *non_blocking* (``bool``) --
+                * This is used to unit test debug mode of ``run()``, you likely don't have a need for this
+                * If ``True``, then ``run()`` won't block on input
+                * ``input()`` won't be called in debug mode (i.e., don't have to press enter to continue execution)
+                * If this is ``True``, then debug mode will be on even if ``debug`` isn't in kwargs
+            * *no_print* (``bool``) --
+                * This is used to save computation time during unit testing
+                * If ``True``, then ``print_RAM()`` and ``print_info()`` won't be called
+                * This includes the RAM and registers printed when an exception is raised
+                * In debug mode, "Program halted." will still be printed
+            * *bits* (``int``) --
+                * You should not modify this
+                * Number of bits in registers
+                * Default value is ``global_vars.NUM_BITS_IN_REGISTERS`` (8)
+                * 8 is also the maximum value since everything in RAM should fit in a byte
+
+    :return: ``None`` or program state if ``return_state``
+    :rtype: ``Union[None, dict[str, Any]]``
+    """
+    _check_kwargs(prog_path, kwargs)
+    # non_blocking turns on debug mode even if debug isn't in kwargs
+    debug: bool = kwargs.get("debug", False) or "non_blocking" in kwargs
+    max_steps: Optional[int] = kwargs.get("max_steps")
+    machine: Machine = _load_machine(prog_path, kwargs)
+    machine.out_log = []
+    output_file: Optional[TextIO] = (
+        open(kwargs["output_file"], "w") if "output_file" in kwargs else None
+    )
+    sink: output.OutputSink = output.OutputSink(
+        kwargs.get("output", "table"), machine.table_format, output_file
+    )
+    try:
+        _run_machine(machine, prog_path, kwargs, debug, max_steps, sink)
+    finally:
+        if output_file is not None:
+            output_file.close()
 
     if kwargs.get("return_state"):
-        return helpers.get_state()
+        return helpers.get_state(machine)
 
 
 @is_documented_by(
@@ -215,5 +622,5 @@ def run_and_return_state(prog_path: str, **kwargs: Any) -> dict[str, Any]:
             file=sys.stderr,
         )
         exit(1)
-    run(prog_path, **kwargs)
-    return helpers.get_state()
+    kwargs["return_state"] = True
+    return run(prog_path, **kwargs)
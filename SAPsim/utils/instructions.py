@@ -11,38 +11,42 @@ This DOES NOT exist in actual SAP but for implementation purposes, instructions
 arg (i.e. NOP, OUT, HLT) get a default parameter so that they can still be called with an argument.
 In actual SAP, all instructions (byte) have a required Arg, not a default or optional arg.
 
-``OPCODE_TO_INSTR_PROCEDURE`` dict that maps opcodes to procedures is defined at the bottom."""
+Every procedure takes the ``Machine`` it operates on as its first parameter.
+
+``OPCODE_TO_INSTR_PROCEDURE`` dict that maps opcodes to procedures is defined at the bottom.
+"""
 
 __author__ = "Jesse Wei <jesse@cs.unc.edu>"
 
-from tabulate import tabulate
 import SAPsim.utils.global_vars as global_vars
 import SAPsim.utils.exceptions as exceptions
 import SAPsim.utils.helpers as helpers
+import SAPsim.utils.output as output
+from SAPsim.utils.machine import Machine
 
 
-def nop(arg: int = 0) -> None:
+def nop(m: Machine, arg: int = 0) -> None:
     """Nop
 
     Opcode 0"""
-    global_vars.PC += 1
+    m.PC += 1
 
 
-def lda(arg: int) -> None:
+def lda(m: Machine, arg: int) -> None:
     """``A = Mem(arg)``
 
     Opcode 1"""
-    if arg not in global_vars.RAM:
-        raise exceptions.LoadFromUnmappedAddress
-    global_vars.A = global_vars.RAM[arg]
-    if global_vars.A > (2**global_vars.NUM_BITS_IN_REGISTERS - 1):
-        raise exceptions.ARegisterNotEnoughBits
-    if global_vars.A < 0:
-        raise exceptions.ARegisterNegativeInt
-    global_vars.PC += 1
+    if not m.mapped >> arg & 1:
+        raise exceptions.LoadFromUnmappedAddress(m)
+    m.A = m.memory[arg]
+    if m.A > (2**m.NUM_BITS_IN_REGISTERS - 1):
+        raise exceptions.ARegisterNotEnoughBits(m)
+    if m.A < 0:
+        raise exceptions.ARegisterNegativeInt(m)
+    m.PC += 1
 
 
-def add(arg: int, **kwargs) -> None:
+def add(m: Machine, arg: int, **kwargs) -> None:
     """``A = A + Mem(arg)``. Accounts for ``NUM_BITS_IN_REGISTERS`` to set ``FLAG_C`` and ``FLAG_Z``. Handles overflow.
 
     Opcode 2
@@ -57,30 +61,30 @@ def add(arg: int, **kwargs) -> None:
 
             This behavior does not exist in actual SAP."""
     if "direct_add" in kwargs and kwargs["direct_add"]:
-        global_vars.B = arg
+        m.B = arg
     else:
-        if arg not in global_vars.RAM:
-            raise exceptions.LoadFromUnmappedAddress
-        global_vars.B = global_vars.RAM[arg]
+        if not m.mapped >> arg & 1:
+            raise exceptions.LoadFromUnmappedAddress(m)
+        m.B = m.memory[arg]
 
-    if global_vars.B > (2**global_vars.NUM_BITS_IN_REGISTERS - 1):
-        raise exceptions.BRegisterNotEnoughBits
-    if global_vars.B < 0:
-        raise exceptions.BRegisterNegativeInt
+    if m.B > (2**m.NUM_BITS_IN_REGISTERS - 1):
+        raise exceptions.BRegisterNotEnoughBits(m)
+    if m.B < 0:
+        raise exceptions.BRegisterNegativeInt(m)
 
-    global_vars.A += global_vars.B
+    m.A += m.B
 
-    if global_vars.A > (2**global_vars.NUM_BITS_IN_REGISTERS - 1):
-        global_vars.FLAG_C = 1
-        global_vars.A -= 2**global_vars.NUM_BITS_IN_REGISTERS
+    if m.A > (2**m.NUM_BITS_IN_REGISTERS - 1):
+        m.FLAG_C = 1
+        m.A -= 2**m.NUM_BITS_IN_REGISTERS
     else:
-        global_vars.FLAG_C = 0
-    global_vars.FLAG_Z = global_vars.A == 0
+        m.FLAG_C = 0
+    m.FLAG_Z = m.A == 0
 
-    global_vars.PC += 1
+    m.PC += 1
 
 
-def sub(arg: int, **kwargs) -> None:
+def sub(m: Machine, arg: int, **kwargs) -> None:
     """``A = A - Mem(arg)``. Accounts for ``NUM_BITS_IN_REGISTERS`` to set ``FLAG_C`` and ``FLAG_Z``. Calls ``add()`` twice to perform 2's complement subtraction.
 
     Opcode 3
@@ -95,109 +99,120 @@ def sub(arg: int, **kwargs) -> None:
 
             This behavior does not exist in actual SAP."""
     if "direct_sub" in kwargs and kwargs["direct_sub"]:
-        global_vars.B = arg
+        m.B = arg
     else:
-        if arg not in global_vars.RAM:
-            raise exceptions.LoadFromUnmappedAddress
-        global_vars.B = global_vars.RAM[arg]
+        if not m.mapped >> arg & 1:
+            raise exceptions.LoadFromUnmappedAddress(m)
+        m.B = m.memory[arg]
 
-    if global_vars.B > (2**global_vars.NUM_BITS_IN_REGISTERS - 1):
-        raise exceptions.BRegisterNotEnoughBits
-    if global_vars.B < 0:
-        raise exceptions.BRegisterNegativeInt
+    if m.B > (2**m.NUM_BITS_IN_REGISTERS - 1):
+        raise exceptions.BRegisterNotEnoughBits(m)
+    if m.B < 0:
+        raise exceptions.BRegisterNegativeInt(m)
 
     # Clone A and B for use later in setting FlagC.
-    A_clone = global_vars.A
-    B_clone = global_vars.B
+    A_clone = m.A
+    B_clone = m.B
 
-    inverse_B = B_clone ^ (2**global_vars.NUM_BITS_IN_REGISTERS - 1)
+    inverse_B = B_clone ^ (2**m.NUM_BITS_IN_REGISTERS - 1)
 
-    add(inverse_B, direct_add=True)
-    add(1, direct_add=True)
+    add(m, inverse_B, direct_add=True)
+    add(m, 1, direct_add=True)
 
     # add() modified globs.B, reset it
-    global_vars.B = B_clone
+    m.B = B_clone
 
     # FLAG_Z is correct at this point.
     # FLAG_C is not correct so is explicitly handled.
     # This uses the unsigned comparison table FlagC = A >= B (compare their values before A changed)
-    global_vars.FLAG_C = A_clone >= B_clone
+    m.FLAG_C = A_clone >= B_clone
 
     # Subtract 1 from PC since there were 2 adds that each did PC += 1
     # Net effect is globs.PC += 1
-    global_vars.PC -= 1
+    m.PC -= 1
 
 
-def sta(arg: int) -> None:
+def sta(m: Machine, arg: int) -> None:
     """``Mem(Arg) = A``. CAN store to unmapped addr, which will simply map the addr in RAM.
 
     Opcode 4"""
-    global_vars.RAM[arg] = global_vars.A
-    global_vars.PC += 1
+    m.memory[arg] = m.A
+    m.mapped |= 1 << arg
+    # Self-modifying code: the byte at arg must be decoded again if executed
+    if m.decoded is not None:
+        m.decoded[arg] = (decode_and_execute, arg)
+    if m.fused >> arg & 1:
+        invalidate_blocks(m, arg)
+    m.PC += 1
 
 
-def ldi(arg: int) -> None:
+def ldi(m: Machine, arg: int) -> None:
     """``A = arg``
 
     Opcode 5"""
-    global_vars.A = arg
-    if arg > (2**global_vars.NUM_BITS_IN_REGISTERS - 1):
-        raise exceptions.ARegisterNotEnoughBits
+    m.A = arg
+    if arg > (2**m.NUM_BITS_IN_REGISTERS - 1):
+        raise exceptions.ARegisterNotEnoughBits(m)
     if arg < 0:
-        raise exceptions.ARegisterNegativeInt
-    global_vars.PC += 1
+        raise exceptions.ARegisterNegativeInt(m)
+    m.PC += 1
 
 
-def jmp(arg: int) -> None:
+def jmp(m: Machine, arg: int) -> None:
     """``PC = arg``
 
     Opcode 6"""
     if arg < 0:
-        raise exceptions.JumpToNegativeAddress
-    global_vars.PC = arg
+        raise exceptions.JumpToNegativeAddress(m)
+    m.PC = arg
 
 
-def jc(arg: int) -> None:
+def jc(m: Machine, arg: int) -> None:
     """If ``FC=1`` then ``PC=arg``; else go on
 
     Opcode 7"""
-    if global_vars.FLAG_C:
+    if m.FLAG_C:
         if arg < 0:
-            raise exceptions.JumpToNegativeAddress
-        global_vars.PC = arg
+            raise exceptions.JumpToNegativeAddress(m)
+        m.PC = arg
     else:
-        global_vars.PC += 1
+        m.PC += 1
 
 
-def jz(arg: int) -> None:
+def jz(m: Machine, arg: int) -> None:
     """If ``FZ=1`` then ``PC=arg``; else go on
 
     Opcode 8"""
-    if global_vars.FLAG_Z:
+    if m.FLAG_Z:
         if arg < 0:
-            raise exceptions.JumpToNegativeAddress
-        global_vars.PC = arg
+            raise exceptions.JumpToNegativeAddress(m)
+        m.PC = arg
     else:
-        global_vars.PC += 1
+        m.PC += 1
 
 
-def out(arg: int = 0) -> None:
-    """``Display = OUT = A``. Prints | PC | A (dec) | A (hex) |
+def out(m: Machine, arg: int = 0) -> None:
+    """``Display = OUT = A``. Prints | PC | A (dec) | A (hex) |, or appends ``(PC, A)`` to ``m.out_log`` if it isn't ``None``
+    (see ``output.py``).
 
     Opcode 14"""
-    arg = helpers.parse_arg(global_vars.RAM[global_vars.PC])
-    table = [[global_vars.PC, global_vars.A, helpers.pad_hex(hex(global_vars.A), 2)]]
-    print(
-        tabulate(table, headers=["PC", "Dec", "Hex"], tablefmt=global_vars.table_format)
-    )
-    global_vars.PC += 1
+    if m.out_log is not None:
+        m.out_log.append((m.PC, m.A))
+    else:
+        print_out(m.PC, m.A, m.table_format)
+    m.PC += 1
+
 
+def print_out(PC: int, A: int, table_format: str) -> None:
+    """Print the | PC | A (dec) | A (hex) | table of an ``OUT`` at address ``PC``."""
+    print(output.format_table([(PC, A)], table_format))
 
-def hlt(arg: int = 0) -> None:
+
+def hlt(m: Machine, arg: int = 0) -> None:
     """Halt
 
     Opcode 15"""
-    global_vars.EXECUTING = False
+    m.EXECUTING = False
 
 
 OPCODE_TO_INSTR_PROCEDURE = {
@@ -215,4 +230,52 @@ OPCODE_TO_INSTR_PROCEDURE = {
 }
 """This ``dict`` maps opcodes to the procedures defined in this file.
 
-The syntax ``OPCODE_TO_INSTR_PROCEDURE[opcode](arg)`` will execute the correct instruction with ``arg`` passed as argument! Very cool."""
+The syntax ``OPCODE_TO_INSTR_PROCEDURE[opcode](machine, arg)`` will execute the correct instruction with ``arg`` passed as argument! Very cool."""
+
+
+def decode_and_execute(m: Machine, addr: int) -> None:
+    """Decode the byte at ``addr`` into a ``(procedure, arg)`` entry, cache it in ``m.decoded``, and execute it.
+
+    This is the placeholder entry for every address that hasn't been decoded yet (or was overwritten by ``sta()``).
+    An unmapped address decodes to ``nop`` (i.e., ``PC += 1``).
+    ``DroppedOffBottom`` is raised if ``addr`` is greater than the max address in ``RAM``,
+    and ``InvalidOpcode`` if the byte at ``addr`` isn't an instruction.
+    """
+    if not m.mapped >> addr:
+        m.EXECUTING = False
+        raise exceptions.DroppedOffBottom(m)
+    if m.mapped >> addr & 1:
+        byte: int = m.memory[addr]
+        opcode: int = helpers.parse_opcode(byte)
+        if opcode not in OPCODE_TO_INSTR_PROCEDURE:
+            m.EXECUTING = False
+            raise exceptions.InvalidOpcode(m, opcode)
+        entry = (OPCODE_TO_INSTR_PROCEDURE[opcode], helpers.parse_arg(byte))
+    else:
+        entry = (nop, 0)
+    m.decoded[addr] = entry
+    entry[0](m, entry[1])
+
+
+def decode_table(m: Machine) -> list:
+    """Return a new decode table for ``m``, where every address maps to ``(decode_and_execute, addr)``.
+
+    Indexed by address, it has an entry for every address a jump or falling through can reach.
+    ``decoded[PC]`` is the ``(procedure, arg)`` to execute at ``PC``, so executing an instruction is a single indexed call.
+    """
+    # PC can be at most MAX_PC + 1, which drops off the bottom
+    return [(decode_and_execute, addr) for addr in range(global_vars.MAX_PC + 2)]
+
+
+def invalidate_blocks(m: Machine, addr: int) -> None:
+    """Remove every superinstruction in ``m.blocks`` that contains ``addr``, so those addresses are executed one at a time.
+
+    Called by ``sta()`` when it writes into a block (self-modifying code)."""
+    m.fused = 0
+    for start, block in enumerate(m.blocks):
+        if block is None:
+            continue
+        if start <= addr < start + block[1]:
+            m.blocks[start] = None
+        else:
+            m.fused |= ((1 << block[1]) - 1) << start
@@ -0,0 +1,205 @@
+"""State of a SAP machine.
+
+All state that used to live in ``global_vars`` (``RAM``, ``PC``, registers, flags, ``EXECUTING``)
+is stored on a ``Machine`` instance instead. Every call to ``execute.run()`` creates its own ``Machine``,
+so several programs can be simulated at the same time (e.g., across threads) without interfering.
+
+RAM is stored as a 16-byte ``bytearray`` (``memory``) plus a 16-bit mask of mapped addresses (``mapped``),
+where bit ``addr`` is set if ``addr`` is mapped. So ``addr`` is mapped if ``mapped >> addr & 1``,
+the max address is ``mapped.bit_length() - 1``, and copying RAM is a single slice.
+``Machine.RAM`` is a ``dict``-like view of the mapped addresses for backwards compatibility.
+"""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+from collections.abc import MutableMapping
+from typing import TYPE_CHECKING, Iterator, Optional
+import SAPsim.utils.global_vars as global_vars
+
+if TYPE_CHECKING:
+    from SAPsim.utils.profiler import Profile
+
+
+class RAMView(MutableMapping):
+    """``dict[int, int]``-like view of the mapped addresses of a ``Machine``, mapping ``PC``:``byte``.
+
+    Reads and writes go to ``machine.memory`` and ``machine.mapped``. Iterates in order of address.
+    Compares equal to a ``dict`` with the same mapped addresses and bytes.
+
+    :param machine: Machine to view
+    :type machine: Machine"""
+
+    __slots__ = ("_machine",)
+
+    def __init__(self, machine: "Machine"):
+        self._machine: Machine = machine
+
+    def __getitem__(self, addr: int) -> int:
+        if addr not in self:
+            raise KeyError(addr)
+        return self._machine.memory[addr]
+
+    def __setitem__(self, addr: int, byte: int) -> None:
+        self._machine.store(addr, byte)
+
+    def __delitem__(self, addr: int) -> None:
+        if addr not in self:
+            raise KeyError(addr)
+        self._machine.mapped &= ~(1 << addr)
+        self._machine.memory[addr] = 0
+
+    def __contains__(self, addr: object) -> bool:
+        return (
+            isinstance(addr, int)
+            and 0 <= addr <= global_vars.MAX_PC
+            and bool(self._machine.mapped >> addr & 1)
+        )
+
+    def __iter__(self) -> Iterator[int]:
+        mapped: int = self._machine.mapped
+        return (addr for addr in range(mapped.bit_length()) if mapped >> addr & 1)
+
+    def __len__(self) -> int:
+        return bin(self._machine.mapped).count("1")
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class Machine:
+    """A single SAP machine. Instruction procedures in ``instructions.py`` take a ``Machine`` as their first argument.
+
+    :param RAM: ``dict[int, int]`` mapping ``PC``:``byte`` to load into RAM. The ``dict`` is copied.
+    :type RAM: ``Optional[dict[int, int]]``
+    :raises AddressGreaterThan15: If an address in ``RAM`` is greater than 15
+    :param bits: Number of bits in registers, see ``global_vars.NUM_BITS_IN_REGISTERS``
+    :type bits: ``int``
+    :param table_format: Tabulate ``tablefmt`` used when printing this machine
+    :type table_format: ``str``
+    :param no_print: If ``True``, exceptions raised during execution don't print RAM and registers
+    :type no_print: ``bool``"""
+
+    __slots__ = (
+        "memory",
+        "mapped",
+        "PC",
+        "A",
+        "B",
+        "FLAG_C",
+        "FLAG_Z",
+        "EXECUTING",
+        "steps",
+        "NUM_BITS_IN_REGISTERS",
+        "table_format",
+        "no_print",
+        "decoded",
+        "blocks",
+        "fused",
+        "out_log",
+        "profile",
+    )
+
+    def __init__(
+        self,
+        RAM: Optional[dict[int, int]] = None,
+        bits: int = global_vars.NUM_BITS_IN_REGISTERS,
+        table_format: str = global_vars.table_format,
+        no_print: bool = False,
+    ):
+        assert bits > 1
+        self.memory: bytearray = bytearray(global_vars.MAX_PC + 1)
+        """Byte at each address, where ``byte`` can be instruction or data (indistinguishable, mostly). 0 if unmapped."""
+        self.mapped: int = 0
+        """Bit ``addr`` is set if ``addr`` is mapped"""
+        if RAM:
+            for addr, byte in RAM.items():
+                self.store(addr, byte)
+        self.PC: int = 0
+        """Program counter that indexes into ``RAM``, default value 0"""
+        self.A: int = 0
+        """Register A, default value 0"""
+        self.B: int = 0
+        """Register B, default value 0"""
+        self.FLAG_C: bool = False
+        """Carry-out bit, modified by ``add()`` and ``sub()``. Default value False (0)."""
+        self.FLAG_Z: bool = False
+        """Zero flag = NOR(Sum bits), modified by ``add()`` and ``sub()``. Default value False (0).
+
+        Lab 3's ALU has default value True (1) for FlagZ because the results register is initially 0.
+        However, it makes more sense in the simulation to set it to False by default."""
+        self.EXECUTING: bool = True
+        """Is the program executing? Set to ``False`` by ``hlt()``"""
+        self.steps: int = 0
+        """Number of instructions executed (including ``HLT`` and skipped unmapped addresses)"""
+        self.NUM_BITS_IN_REGISTERS: int = bits
+        self.table_format: str = table_format
+        self.no_print: bool = no_print
+        self.decoded: Optional[list] = None
+        """Decode table of ``(procedure, arg)`` entries indexed by address, built by ``instructions.decode_table()``.
+        Set it back to ``None`` after modifying ``RAM`` directly (``sta()`` keeps it up to date)."""
+        self.blocks: Optional[list] = None
+        """Superinstruction (``(block, length)`` or ``None``) starting at each address, built by ``execute.fuse_blocks()``.
+        Set it back to ``None`` after modifying ``RAM`` directly (``sta()`` invalidates the blocks it writes into)."""
+        self.fused: int = 0
+        """Bit ``addr`` is set if ``addr`` is in a block in ``blocks``"""
+        self.out_log: Optional[list[tuple[int, int]]] = None
+        """If not ``None``, ``out()`` appends ``(PC, A)`` to it instead of printing (see ``output.py``)."""
+        self.profile: Optional["Profile"] = None
+        """Counters of ``execute.execute_profiled()``, or ``None`` if not profiled (see ``profiler.py``)"""
+
+    @property
+    def RAM(self) -> RAMView:
+        """``dict``-like view of the mapped addresses, mapping ``PC``:``byte``. Use ``dict(machine.RAM)`` for a snapshot."""
+        return RAMView(self)
+
+    def store(self, addr: int, byte: int) -> None:
+        """Write ``byte`` to ``addr`` and map ``addr``.
+
+        :param addr: Address, 0 to 15
+        :type addr: int
+        :param byte: Byte, 0 to 255
+        :type byte: int
+        :raises AddressGreaterThan15: If ``addr`` is greater than 15
+        :raises ValueError: If ``addr`` is negative or ``byte`` isn't in [0, 255]
+        :return: None"""
+        if addr < 0:
+            raise ValueError(f"Address {addr} is negative.")
+        if addr > global_vars.MAX_PC:
+            # machine.py is imported by exceptions.py, so import here
+            import SAPsim.utils.exceptions as exceptions
+
+            raise exceptions.AddressGreaterThan15(addr)
+        self.memory[addr] = byte
+        self.mapped |= 1 << addr
+
+    def max_addr(self) -> int:
+        """Return the max mapped address, or -1 if no address is mapped.
+
+        :return: Max mapped address
+        :rtype: int"""
+        return self.mapped.bit_length() - 1
+
+    def copy(self) -> "Machine":
+        """Return a copy of this machine with its own ``memory``. The decode table and blocks aren't copied.
+
+        :return: Copy of this machine
+        :rtype: Machine"""
+        clone: Machine = Machine.__new__(Machine)
+        clone.memory = self.memory[:]
+        clone.mapped = self.mapped
+        clone.NUM_BITS_IN_REGISTERS = self.NUM_BITS_IN_REGISTERS
+        clone.table_format = self.table_format
+        clone.no_print = self.no_print
+        clone.decoded = None
+        clone.blocks = None
+        clone.fused = 0
+        clone.out_log = None
+        clone.profile = None
+        clone.PC = self.PC
+        clone.A = self.A
+        clone.B = self.B
+        clone.FLAG_C = self.FLAG_C
+        clone.FLAG_Z = self.FLAG_Z
+        clone.EXECUTING = self.EXECUTING
+        clone.steps = self.steps
+        return clone
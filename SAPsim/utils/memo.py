@@ -0,0 +1,233 @@
+"""Memoize running a ``Machine`` to completion.
+
+A SAP machine is deterministic, so the result of running from a state (RAM, ``PC``, registers, flags) is a pure function
+of that state (and of the number of bits in registers and the remaining ``max_steps``). ``TransitionCache`` maps the packed
+initial state to the final state, the ``(PC, A)`` of every ``OUT`` (output again on a hit), and the exception raised, if any.
+So running an identical submission again (e.g., rerunning the autograder) skips execution entirely.
+
+The cache is a bounded LRU. ``cache_info()`` reports hits and misses for tuning ``maxsize``.
+``save()`` and ``load()`` persist it to disk with ``pickle``.
+
+Runs that raise an exception are only cached if ``machine.no_print`` (otherwise the exception prints RAM and registers,
+which isn't replayed), and they aren't saved to disk.
+"""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Callable, NamedTuple, Optional, Union
+import SAPsim.utils.instructions as instructions
+from SAPsim.utils.machine import Machine
+
+
+class CacheInfo(NamedTuple):
+    """Statistics of a ``TransitionCache``, like ``functools.lru_cache``'s ``cache_info()``."""
+
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+def pack_state(machine: Machine, max_steps: Optional[int]) -> bytes:
+    """Pack everything that determines the result of running ``machine`` into a key.
+
+    :param machine: Machine about to run
+    :type machine: Machine
+    :param max_steps: Max value of ``machine.steps``, or ``None`` for no limit
+    :type max_steps: Optional[int]
+    :return: Key
+    :rtype: bytes"""
+    remaining: int = -1 if max_steps is None else max(max_steps - machine.steps, 0)
+    return (
+        bytes(machine.memory)
+        + machine.mapped.to_bytes(2, "little")
+        + bytes(
+            (
+                machine.PC,
+                machine.A,
+                machine.B,
+                bool(machine.FLAG_C),
+                bool(machine.FLAG_Z),
+                machine.NUM_BITS_IN_REGISTERS,
+            )
+        )
+        + remaining.to_bytes(8, "little", signed=True)
+    )
+
+
+def _rebuild_error(error: tuple) -> Exception:
+    """Return a new exception from a cached ``(type, args, attributes)``, without calling ``__init__()`` (which prints)."""
+    error_type, args, attributes = error
+    e: Exception = error_type.__new__(error_type, *args)
+    e.args = args
+    e.__dict__.update(attributes)
+    return e
+
+
+def _emit(machine: Machine, out_log: tuple[tuple[int, int], ...]) -> None:
+    """Output each ``OUT`` in ``out_log`` like ``instructions.out()`` would have."""
+    if machine.out_log is not None:
+        machine.out_log.extend(out_log)
+    else:
+        for PC, A in out_log:
+            instructions.print_out(PC, A, machine.table_format)
+
+
+class TransitionCache:
+    """Bounded LRU cache from packed initial state to the result of running to completion.
+
+    :param maxsize: Max number of cached results, evicting the least recently used
+    :type maxsize: int"""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize: int = maxsize
+        self.hits: int = 0
+        self.misses: int = 0
+        self._entries: OrderedDict = OrderedDict()
+        # run() can be called from several threads at once
+        self._lock: Lock = Lock()
+
+    def execute(
+        self,
+        machine: Machine,
+        executor: Callable[[Machine, Optional[int]], None],
+        max_steps: Optional[int] = None,
+    ) -> None:
+        """Run ``machine`` to completion with ``executor`` (e.g., ``execute.execute_full_speed``), or restore the cached result.
+
+        On a hit, ``OUT`` is output again (see ``instructions.out()``) and the cached exception, if any, is raised again.
+
+        :param machine: Machine to execute
+        :type machine: Machine
+        :param executor: Function that runs a machine to completion, called as ``executor(machine, max_steps)``
+        :type executor: Callable[[Machine, Optional[int]], None]
+        :param max_steps: Max value of ``machine.steps``. Defaults to no limit.
+        :type max_steps: Optional[int]
+        :return: None"""
+        if not machine.EXECUTING:
+            return
+        key: bytes = pack_state(machine, max_steps)
+        with self._lock:
+            entry: Optional[tuple] = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if entry is not None:
+            self._restore(machine, entry)
+            return
+
+        start_steps: int = machine.steps
+        outer_log: Optional[list[tuple[int, int]]] = machine.out_log
+        machine.out_log = []
+        error: Optional[Exception] = None
+        try:
+            executor(machine, max_steps)
+        except Exception as e:
+            error = e
+        out_log: list[tuple[int, int]] = machine.out_log
+        machine.out_log = outer_log
+        _emit(machine, out_log)
+        if error is None or machine.no_print:
+            self._store(
+                key,
+                (
+                    bytes(machine.memory),
+                    machine.mapped,
+                    machine.PC,
+                    machine.A,
+                    machine.B,
+                    machine.FLAG_C,
+                    machine.FLAG_Z,
+                    machine.EXECUTING,
+                    machine.steps - start_steps,
+                    tuple(out_log),
+                    (
+                        None
+                        if error is None
+                        else (type(error), error.args, dict(vars(error)))
+                    ),
+                ),
+            )
+        if error is not None:
+            raise error
+
+    def _restore(self, machine: Machine, entry: tuple) -> None:
+        """Load the final state in ``entry`` into ``machine``, replay ``OUT``, and raise the cached exception, if any."""
+        memory, mapped, PC, A, B, FLAG_C, FLAG_Z, EXECUTING, steps, out_log, error = (
+            entry
+        )
+        _emit(machine, out_log)
+        machine.memory[:] = memory
+        machine.mapped = mapped
+        machine.PC, machine.A, machine.B = PC, A, B
+        machine.FLAG_C, machine.FLAG_Z = FLAG_C, FLAG_Z
+        machine.EXECUTING = EXECUTING
+        machine.steps += steps
+        machine.decoded = None
+        machine.blocks = None
+        machine.fused = 0
+        if error is not None:
+            raise _rebuild_error(error)
+
+    def _store(self, key: bytes, entry: tuple) -> None:
+        with self._lock:
+            if self.maxsize <= 0:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def cache_info(self) -> CacheInfo:
+        """Return the number of hits and misses, ``maxsize``, and the current number of cached results.
+
+        :return: Cache statistics
+        :rtype: CacheInfo"""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self) -> None:
+        """Remove every cached result and reset the hit and miss counters.
+
+        :return: None"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def save(self, path: Union[Path, str]) -> None:
+        """Save the cached results that didn't raise an exception to ``path``.
+
+        :param path: File to write
+        :type path: Union[Path, str]
+        :return: None"""
+        with self._lock:
+            entries: dict = {
+                key: entry for key, entry in self._entries.items() if entry[-1] is None
+            }
+        import pickle
+
+        with open(path, "wb") as f:
+            pickle.dump(entries, f)
+
+    def load(self, path: Union[Path, str]) -> None:
+        """Add the results saved by ``save()`` at ``path`` to this cache. Only load files you trust (see ``pickle``).
+
+        :param path: File to read
+        :type path: Union[Path, str]
+        :return: None"""
+        import pickle
+
+        with open(path, "rb") as f:
+            entries: dict = pickle.load(f)
+        for key, entry in entries.items():
+            self._store(key, entry)
+
+
+transition_cache: TransitionCache = TransitionCache()
+"""Cache used by ``run(..., memoize=True)``."""
@@ -0,0 +1,75 @@
+"""Output of the ``OUT`` instruction.
+
+While ``machine.out_log`` is a ``list``, ``OUT`` only appends ``(PC, A)`` to it, so a program with ``OUT`` in a loop
+doesn't format a table per ``OUT``. ``run()`` collects every ``OUT`` this way and renders them all at once with an
+``OutputSink`` when execution stops (in debug mode, after each command), in the format chosen by ``run(..., output=)``.
+"""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+import sys
+from typing import Optional, TextIO
+import SAPsim.utils.global_vars as global_vars
+import SAPsim.utils.helpers as helpers
+
+OUTPUT_FORMATS: tuple[str, ...] = ("table", "raw", "none")
+"""``"table"`` prints a | PC | A (dec) | A (hex) | table, ``"raw"`` prints the value of ``A`` of each ``OUT`` on its own line,
+and ``"none"`` prints nothing."""
+
+
+class OutputSink:
+    """Renders ``OUT`` output in bulk.
+
+    :param output_format: One of ``OUTPUT_FORMATS``
+    :type output_format: str
+    :param table_format: Tabulate ``tablefmt`` of ``"table"``
+    :type table_format: str
+    :param file: Text stream to write to. Defaults to ``sys.stdout`` at the time of writing.
+    :type file: Optional[TextIO]
+    :raises ValueError: If ``output_format`` isn't one of ``OUTPUT_FORMATS``"""
+
+    __slots__ = ("output_format", "table_format", "file")
+
+    def __init__(
+        self,
+        output_format: str = "table",
+        table_format: str = global_vars.table_format,
+        file: Optional[TextIO] = None,
+    ):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(
+                f"Output format {output_format} must be one of {', '.join(OUTPUT_FORMATS)}."
+            )
+        self.output_format: str = output_format
+        self.table_format: str = table_format
+        self.file: Optional[TextIO] = file
+
+    def write(self, out_log: list[tuple[int, int]]) -> None:
+        """Render the ``(PC, A)`` of every ``OUT`` in ``out_log`` with a single write.
+
+        :param out_log: ``(PC, A)`` of each ``OUT``, in order
+        :type out_log: list[tuple[int, int]]
+        :return: None"""
+        if not out_log or self.output_format == "none":
+            return
+        file: TextIO = sys.stdout if self.file is None else self.file
+        if self.output_format == "raw":
+            file.write("".join(f"{A}\n" for _, A in out_log))
+        else:
+            file.write(format_table(out_log, self.table_format) + "\n")
+
+
+def format_table(out_log: list[tuple[int, int]], table_format: str) -> str:
+    """Return the | PC | A (dec) | A (hex) | table of ``out_log``, one row per ``OUT``.
+
+    :param out_log: ``(PC, A)`` of each ``OUT``, in order
+    :type out_log: list[tuple[int, int]]
+    :param table_format: Tabulate ``tablefmt``
+    :type table_format: str
+    :return: Table
+    :rtype: str"""
+    # Imported on first use, see helpers.print_RAM()
+    from tabulate import tabulate
+
+    table = [[PC, A, helpers.pad_hex(hex(A), 2)] for PC, A in out_log]
+    return tabulate(table, headers=["PC", "Dec", "Hex"], tablefmt=table_format)
@@ -1,19 +1,62 @@
-"""Parses a SAP program in the CSV format given in ``template.csv`` into ``global_vars.RAM``."""
+"""Parses a SAP program in the CSV format given in ``template.csv`` into a ``RAM`` dict.
+
+``parse_csv_cached()`` keeps an LRU cache of parsed programs keyed by (path, mtime, size), so running the
+same file many times (e.g., on every input 0 to 255) only parses it once. Editing the file changes its
+mtime, so it's parsed again. ``clear_cache()`` invalidates explicitly, and ``set_cache_size()`` resizes the cache.
+
+``parse_many()`` and ``parse_directory()`` parse many files at once (e.g., every submission at the start of grading)
+into immutable program images (``ProgramImage``), with a report of every bad row of every file instead of raising on the first.
+
+Fields are looked up in ``HEXIT_TOKENS`` and ``FIRST_HEXIT_TOKENS``, which hold every field a program normally has.
+Only other fields (e.g., ``" 7"``, ``"+5"``, ``"-1"``, or ``"16"``) are parsed by calling ``int()`` and catching
+``ValueError``, which is much slower, and give the same value or exception as before.
+
+``convert_csv()`` (or ``save_image()``) saves a program as a 24-byte ``.sapbin`` image::
+
+    b"SAPB", version, reserved, mapped addresses (2 bytes, little-endian), RAM (16 bytes)
+
+optionally followed by the Comments of addresses 0 to 15 (UTF-8, separated by NUL). ``load_image()`` is a single read
+and a slice with no parsing or validation, so convert each program once and load the image whenever it's run.
+``run()``, ``run_batch()``, and ``evaluate_all()`` accept a ``.sapbin`` wherever they accept a ``.csv``.
+"""
 
 __author__ = "Jesse Wei <jesse@cs.unc.edu>"
 
+import os
+import struct
+from collections import OrderedDict
 from csv import DictReader
 from pathlib import Path
-from typing import Union
+from threading import Lock
+from typing import Iterable, NamedTuple, Optional, Union
 import SAPsim.utils.exceptions as exceptions
 import SAPsim.utils.global_vars as global_vars
-from SAPsim.utils.helpers import setup_state
 
+_cache: "OrderedDict[str, tuple[tuple[int, int], dict[int, int]]]" = OrderedDict()
+"""Maps absolute path to ``((mtime_ns, size), RAM)``, least recently used first."""
+_cache_size: int = 128
+"""Max number of programs in ``_cache``."""
+_cache_lock: Lock = Lock()
+"""``run()`` can be called from several threads at once."""
+
+HEXIT_TOKENS: dict[str, int] = {
+    **{str(value): value for value in range(16)},
+    **{hexit: int(hexit, 16) for hexit in "ABCDEFabcdef"},
+}
+"""Value of each common Address and Second Hexit (``"0"`` to ``"15"`` and ``"A"`` to ``"F"`` in upper or lower case)"""
+FIRST_HEXIT_TOKENS: dict[str, int] = {
+    **HEXIT_TOKENS,
+    **global_vars.MNEMONIC_TO_OPCODE,
+    **{
+        mnemonic.lower(): opcode
+        for mnemonic, opcode in global_vars.MNEMONIC_TO_OPCODE.items()
+    },
+}
+"""Value of each common First Hexit (``HEXIT_TOKENS`` and mnemonics in upper or lower case)"""
 
-def parse_csv(file_path: Union[Path, str]) -> None:
-    """Takes a ``.csv`` file path in SAPsim ``template.csv`` format and parses it into ``RAM``.
 
-    Calls ``setup_state()`` if ``file_path`` is valid.
+def parse_csv(file_path: Union[Path, str]) -> dict[int, int]:
+    """Takes a ``.csv`` file path in SAPsim ``template.csv`` format and parses it into ``RAM``.
 
     If an address is skipped (not in the ``.csv`` file), it is not mapped in ``RAM``.
     If an address is mapped but First Hexit and Second Hexit are blank, a ``NOP 0`` (0x00) is inserted.
@@ -36,91 +79,440 @@ def parse_csv(file_path: Union[Path, str]) -> None:
     :raises InvalidFirstHexit: If a row has an invalid First Hexit.
     :raises InvalidSecondHexit: If a row has an invalid Second Hexit.
     :raises MoreThan16MappedAddresses: If there are more than 16 mapped addresses.
+    :return: ``dict[int, int]`` mapping ``PC``:``byte``, to be loaded into a ``Machine``
+    :rtype: dict[int, int]"""
+    with open(file_path, "r") as f:
+        return _parse_rows(DictReader(f))
+
+
+def parse_csv_cached(file_path: Union[Path, str]) -> dict[int, int]:
+    """Same as ``parse_csv()``, but returns a copy of the cached ``RAM`` if the file hasn't changed since it was last parsed.
+
+    Files that raise an exception while parsing aren't cached.
+
+    :param file_path: The path to the ``.csv`` file to parse.
+    :type file_path: Union[Path, str]
+    :return: ``dict[int, int]`` mapping ``PC``:``byte``, to be loaded into a ``Machine``
+    :rtype: dict[int, int]"""
+    path: str = os.path.abspath(file_path)
+    stat: os.stat_result = os.stat(path)
+    key: tuple[int, int] = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        entry: Optional[tuple[tuple[int, int], dict[int, int]]] = _cache.get(path)
+        if entry is not None and entry[0] == key:
+            _cache.move_to_end(path)
+            return dict(entry[1])
+    RAM: dict[int, int] = parse_csv(path)
+    with _cache_lock:
+        if _cache_size > 0:
+            _cache[path] = (key, dict(RAM))
+            _cache.move_to_end(path)
+            while len(_cache) > _cache_size:
+                _cache.popitem(last=False)
+    return RAM
+
+
+def clear_cache(file_path: Union[Path, str, None] = None) -> None:
+    """Remove ``file_path`` (or every file, by default) from the cache of ``parse_csv_cached()``.
+
+    :param file_path: The path to the ``.csv`` file to forget. Defaults to ``None``, which clears the whole cache.
+    :type file_path: Union[Path, str, None]
     :return: None"""
-    prog = DictReader(open(file_path, "r"))
-    setup_state()
+    with _cache_lock:
+        if file_path is None:
+            _cache.clear()
+        else:
+            _cache.pop(os.path.abspath(file_path), None)
+
+
+def set_cache_size(size: int) -> None:
+    """Set the max number of programs cached by ``parse_csv_cached()``, evicting the least recently used. 0 disables the cache.
+
+    :param size: Max number of cached programs
+    :type size: int
+    :return: None"""
+    global _cache_size
+    if size < 0:
+        raise ValueError("Cache size must be non-negative.")
+    with _cache_lock:
+        _cache_size = size
+        while len(_cache) > _cache_size:
+            _cache.popitem(last=False)
+
+
+class ProgramImage(NamedTuple):
+    """Parsed program that can't be modified, like ``Machine.memory`` and ``Machine.mapped`` before execution."""
+
+    memory: bytes
+    """Byte at each address 0 to 15, 0 if unmapped"""
+    mapped: int
+    """Bit ``addr`` is set if ``addr`` is mapped"""
+
+    @classmethod
+    def from_RAM(cls, RAM: dict[int, int]) -> "ProgramImage":
+        """Convert a ``RAM`` dict returned by ``parse_csv()`` into an image.
+
+        :param RAM: ``dict[int, int]`` mapping ``PC``:``byte``
+        :type RAM: dict[int, int]
+        :raises AddressGreaterThan15: If an address in ``RAM`` is greater than 15
+        :return: Image
+        :rtype: ProgramImage"""
+        memory: bytearray = bytearray(global_vars.MAX_PC + 1)
+        mapped: int = 0
+        for addr, byte in RAM.items():
+            if addr > global_vars.MAX_PC:
+                raise exceptions.AddressGreaterThan15(addr)
+            memory[addr] = byte
+            mapped |= 1 << addr
+        return cls(bytes(memory), mapped)
+
+    def to_RAM(self) -> dict[int, int]:
+        """Return a new ``RAM`` dict of this image, like ``parse_csv()``'s, to be loaded into a ``Machine``.
+
+        :return: ``dict[int, int]`` mapping ``PC``:``byte``
+        :rtype: dict[int, int]"""
+        return {
+            addr: self.memory[addr]
+            for addr in range(self.mapped.bit_length())
+            if self.mapped >> addr & 1
+        }
+
+
+IMAGE_SUFFIX: str = ".sapbin"
+IMAGE_MAGIC: bytes = b"SAPB"
+IMAGE_VERSION: int = 1
+IMAGE_HEADER: struct.Struct = struct.Struct("<4sBxH16s")
+"""Magic, version, mapped addresses, RAM"""
+
+
+def save_image(
+    image: ProgramImage,
+    path: Union[Path, str],
+    comments: Optional[dict[int, str]] = None,
+) -> None:
+    """Save ``image`` as a ``.sapbin`` file, which ``load_image()`` loads without parsing.
+
+    :param image: Image to save
+    :type image: ProgramImage
+    :param path: File to write
+    :type path: Union[Path, str]
+    :param comments: Comment of each address to keep in the file, if any
+    :type comments: Optional[dict[int, str]]
+    :return: None"""
+    data: bytes = IMAGE_HEADER.pack(
+        IMAGE_MAGIC, IMAGE_VERSION, image.mapped, image.memory
+    )
+    if comments:
+        data += "\0".join(
+            comments.get(addr, "") for addr in range(global_vars.MAX_PC + 1)
+        ).encode()
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def load_image(path: Union[Path, str]) -> ProgramImage:
+    """Load a ``.sapbin`` file saved by ``save_image()``.
+
+    :param path: File to read
+    :type path: Union[Path, str]
+    :raises ValueError: If ``path`` isn't a program image
+    :return: Image
+    :rtype: ProgramImage"""
+    _, _, mapped, memory = IMAGE_HEADER.unpack_from(_read_image(path))
+    return ProgramImage(memory, mapped)
+
+
+def load_comments(path: Union[Path, str]) -> dict[int, str]:
+    """Return the comments saved in a ``.sapbin`` file, by address. Addresses without comments are omitted.
+
+    :param path: File to read
+    :type path: Union[Path, str]
+    :raises ValueError: If ``path`` isn't a program image
+    :return: Comment of each address
+    :rtype: dict[int, str]"""
+    data: bytes = _read_image(path)[IMAGE_HEADER.size :]
+    return {
+        addr: comment
+        for addr, comment in enumerate(data.decode().split("\0"))
+        if comment
+    }
+
+
+def _read_image(path: Union[Path, str]) -> bytes:
+    """Return the contents of the ``.sapbin`` file at ``path``, checking its magic and version."""
+    with open(path, "rb") as f:
+        data: bytes = f.read()
+    if len(data) < IMAGE_HEADER.size or data[:4] != IMAGE_MAGIC:
+        raise ValueError(f"{path} is not a SAPsim program image.")
+    if data[4] != IMAGE_VERSION:
+        raise ValueError(f"{path} has unsupported program image version {data[4]}.")
+    return data
+
+
+def convert_csv(
+    csv_path: Union[Path, str],
+    image_path: Union[Path, str, None] = None,
+    comments: bool = True,
+) -> Path:
+    """Parse a ``.csv`` program (see ``parse_csv()``) and save it as a ``.sapbin`` image.
+
+    :param csv_path: The path to the ``.csv`` file to convert
+    :type csv_path: Union[Path, str]
+    :param image_path: File to write. Defaults to ``csv_path`` with the extension ``.sapbin``.
+    :type image_path: Union[Path, str, None]
+    :param comments: Whether to keep the Comments column
+    :type comments: bool
+    :raises FileNotCSV: If ``csv_path`` isn't a ``.csv`` file
+    :raises AddressGreaterThan15: If an address is greater than 15
+    :return: Path of the image
+    :rtype: Path"""
+    path: Path = Path(csv_path)
+    if path.suffix != ".csv":
+        raise exceptions.FileNotCSV(path)
+    image: ProgramImage = ProgramImage.from_RAM(parse_csv(path))
+    row_comments: dict[int, str] = {}
+    if comments:
+        with open(path, "r") as f:
+            for num_rows, row in enumerate(DictReader(f), 1):
+                if row["Address"] and row.get("Comments"):
+                    row_comments[_parse_address(row, num_rows)] = row["Comments"]
+    result: Path = (
+        path.with_suffix(IMAGE_SUFFIX) if image_path is None else Path(image_path)
+    )
+    save_image(image, result, row_comments)
+    return result
+
+
+def load_RAM(file_path: Union[Path, str]) -> dict[int, int]:
+    """Return the ``RAM`` of a ``.csv`` program (with ``parse_csv_cached()``) or ``.sapbin`` image (with ``load_image()``).
+
+    :param file_path: The path to the ``.csv`` or ``.sapbin`` file
+    :type file_path: Union[Path, str]
+    :raises FileNotCSV: If ``file_path`` is neither
+    :return: ``dict[int, int]`` mapping ``PC``:``byte``, to be loaded into a ``Machine``
+    :rtype: dict[int, int]"""
+    path: Path = Path(file_path)
+    if path.suffix == IMAGE_SUFFIX:
+        return load_image(path).to_RAM()
+    if path.suffix != ".csv":
+        raise exceptions.FileNotCSV(path)
+    return parse_csv_cached(path)
+
+
+class ParseError(NamedTuple):
+    """An error found by ``parse_many()`` in a file."""
+
+    error: str
+    """Name of the exception that ``parse_csv()`` would raise, e.g., ``"DuplicateAddress"``"""
+    message: str
+    """Message of the exception"""
+
+
+class ParseReport(NamedTuple):
+    """Result of ``parse_many()``. Every path is in exactly one of ``images`` and ``errors``."""
+
+    images: dict[str, ProgramImage]
+    """Image of each file that parsed without errors, by path"""
+    errors: dict[str, list[ParseError]]
+    """Every error in each file that didn't parse, by path"""
+
+
+def parse_many(
+    paths: Iterable[Union[Path, str]], workers: Optional[int] = None
+) -> ParseReport:
+    """Parse many ``.csv`` files at once, reporting every bad row of every file instead of raising.
+
+    Files are read by a thread pool. A file that can't be read, isn't a ``.csv``, or has an address greater than 15
+    has a single error. Otherwise, every bad row has an error (the exception ``parse_csv()`` raises for the first).
+
+    :param paths: Paths of the ``.csv`` files to parse
+    :type paths: Iterable[Union[Path, str]]
+    :param workers: Number of threads. Defaults to ``ThreadPoolExecutor``'s default.
+    :type workers: Optional[int]
+    :return: Images and errors by path (as ``str``), in the order of ``paths``
+    :rtype: ParseReport"""
+    # Imported on first use, concurrent.futures imports logging and slows down import SAPsim
+    from concurrent.futures import ThreadPoolExecutor
+
+    report: ParseReport = ParseReport({}, {})
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for path, image, errors in executor.map(_parse_file, map(str, paths)):
+            if errors:
+                report.errors[path] = errors
+            else:
+                report.images[path] = image
+    return report
+
+
+def parse_directory(
+    directory: Union[Path, str], workers: Optional[int] = None
+) -> ParseReport:
+    """``parse_many()`` every ``.csv`` file in ``directory``, in sorted order.
+
+    :param directory: Directory of ``.csv`` files
+    :type directory: Union[Path, str]
+    :param workers: Number of threads. Defaults to ``ThreadPoolExecutor``'s default.
+    :type workers: Optional[int]
+    :return: Images and errors by path
+    :rtype: ParseReport"""
+    return parse_many(sorted(Path(directory).glob("*.csv")), workers)
+
+
+def _parse_file(
+    path: str,
+) -> tuple[str, Optional[ProgramImage], list[ParseError]]:
+    """Parse the file at ``path`` for ``parse_many()``, returning ``(path, image, errors)``."""
+    errors: list[Exception] = []
+    image: Optional[ProgramImage] = None
+    try:
+        if Path(path).suffix != ".csv":
+            raise exceptions.FileNotCSV(Path(path))
+        with open(path, "r") as f:
+            RAM: dict[int, int] = _parse_rows(DictReader(f), errors)
+        if not errors:
+            image = ProgramImage.from_RAM(RAM)
+    except Exception as e:
+        errors.append(e)
+    return path, image, [ParseError(type(e).__name__, str(e)) for e in errors]
+
+
+def _parse_rows(
+    prog: DictReader, errors: Optional[list[Exception]] = None
+) -> dict[int, int]:
+    """Parse the rows of ``prog`` into a ``RAM`` dict. See ``parse_csv()``.
+
+    If ``errors`` is a list, the exception of each bad row is appended to it and parsing continues with the next row
+    (a bad row isn't mapped). Otherwise, the first exception is raised."""
+    RAM: dict[int, int] = {}
     num_rows = 1
     addresses = set()
 
     for row in prog:
-        if not row["Address"]:
-            raise exceptions.RowWithNoAddress(num_rows)
-        address = 0
         try:
-            address = int(row["Address"])
-        except ValueError:
-            # Must be hex string here
-            try:
-                address = int(row["Address"], 16)
-            except ValueError:
-                raise exceptions.InvalidAddress(num_rows)
-        if address < 0:
-            raise exceptions.NegativeAddress(num_rows)
+            address: int = _parse_address(row, num_rows)
+        except Exception as e:
+            if errors is None:
+                raise
+            errors.append(e)
+            continue
         num_rows += 1
+        try:
+            if address in addresses:
+                raise exceptions.DuplicateAddress(address)
+            addresses.add(address)
+            RAM[address] = _parse_byte(row, address)
+        except Exception as e:
+            if errors is None:
+                raise
+            errors.append(e)
 
-        if address in addresses:
-            raise exceptions.DuplicateAddress(address)
-        addresses.add(address)
+    if len(RAM) > 16:
+        e = exceptions.MoreThan16MappedAddresses(len(RAM))
+        if errors is None:
+            raise e
+        errors.append(e)
+    return RAM
+
+
+def _parse_address(row: dict[str, str], num_rows: int) -> int:
+    """Parse the Address of ``row``, the ``num_rows``-th row with an address."""
+    address: Optional[int] = HEXIT_TOKENS.get(row["Address"])
+    if address is None:
+        address = _classify_address(row["Address"], num_rows)
+    return address
 
-        # If there's an Address and no First Hexit and no Second Hexit in a row
-        # insert a NOP 0 at that address and continue parsing
-        if not row["First Hexit"] and not row["Second Hexit"]:
-            global_vars.RAM[address] = 0x00
-            continue
-        # But if there's an Address and either only an First Hexit or only an Second Hexit, exception
-        elif row["First Hexit"] and not row["Second Hexit"]:
-            raise exceptions.NoSecondHexit(address)
-        elif not row["First Hexit"] and row["Second Hexit"]:
-            raise exceptions.NoFirstHexit(address)
-
-        first_hexit = 0
-        # Need to determine if the field is a base-10 int or one-letter hexit str or First Hexit str.
-        # int() will cause a ValueError if it's a one-letter hexit str or First Hexit str.
-        try:
-            # int() strips the str
-            first_hexit = int(row["First Hexit"])
-            # Must be a valid base-10 integer here
-            if first_hexit < 0:
-                raise exceptions.FirstHexitNegative(address)
-            elif first_hexit > 0xF:
-                raise exceptions.FirstHexitGreaterThan15(address)
-        except ValueError:
-            # Must be a string, First Hexit or hexit
-            # Use strip() and upper() for some safety
-            first_hexit = row["First Hexit"].strip().upper()
-            # Must be a hex value if length is 1
-            if len(first_hexit) == 1:
-                try:
-                    first_hexit = int(first_hexit, 16)
-                except ValueError:
-                    raise exceptions.InvalidFirstHexit(address)
-            # Otherwise must be First Hexit
-            else:
-                if first_hexit not in global_vars.MNEMONIC_TO_OPCODE:
-                    raise exceptions.InvalidFirstHexit(address)
-                first_hexit = global_vars.MNEMONIC_TO_OPCODE[first_hexit]
 
-        second_hexit = 0
+def _classify_address(field: str, num_rows: int) -> int:
+    """Parse an Address that isn't in ``HEXIT_TOKENS`` or raise its exception."""
+    if not field:
+        raise exceptions.RowWithNoAddress(num_rows)
+    address = 0
+    try:
+        address = int(field)
+    except ValueError:
+        # Must be hex string here
         try:
-            second_hexit = int(row["Second Hexit"])
-            # Must be a base-10 integer here
-            if second_hexit < 0:
-                raise exceptions.SecondHexitNegative(address)
-            elif second_hexit > 0xF:
-                raise exceptions.SecondHexitGreaterThan15(address)
+            address = int(field, 16)
         except ValueError:
-            # Must be a str here
-            # Use strip() and upper() for some safety for a string field
-            arg = row["Second Hexit"].strip().upper()
-            if len(arg) != 1:
-                raise exceptions.InvalidSecondHexit(address)
+            raise exceptions.InvalidAddress(num_rows)
+    if address < 0:
+        raise exceptions.NegativeAddress(num_rows)
+    return address
+
+
+def _parse_byte(row: dict[str, str], address: int) -> int:
+    """Parse the First Hexit and Second Hexit of ``row``, at ``address``, into a byte."""
+    first_hexit: Optional[int] = FIRST_HEXIT_TOKENS.get(row["First Hexit"])
+    second_hexit: Optional[int] = HEXIT_TOKENS.get(row["Second Hexit"])
+    if first_hexit is not None and second_hexit is not None:
+        return first_hexit << 4 | second_hexit
+
+    # If there's an Address and no First Hexit and no Second Hexit in a row
+    # insert a NOP 0 at that address
+    if not row["First Hexit"] and not row["Second Hexit"]:
+        return 0x00
+    # But if there's an Address and either only an First Hexit or only an Second Hexit, exception
+    elif row["First Hexit"] and not row["Second Hexit"]:
+        raise exceptions.NoSecondHexit(address)
+    elif not row["First Hexit"] and row["Second Hexit"]:
+        raise exceptions.NoFirstHexit(address)
+
+    if first_hexit is None:
+        first_hexit = _classify_first_hexit(row["First Hexit"], address)
+    if second_hexit is None:
+        second_hexit = _classify_second_hexit(row["Second Hexit"], address)
+    return first_hexit << 4 | second_hexit
+
+
+def _classify_first_hexit(field: str, address: int) -> int:
+    """Parse a First Hexit that isn't in ``FIRST_HEXIT_TOKENS``, e.g., ``" 7"`` or ``"+5"``, or raise its exception."""
+    first_hexit = 0
+    # Need to determine if the field is a base-10 int or one-letter hexit str or First Hexit str.
+    # int() will cause a ValueError if it's a one-letter hexit str or First Hexit str.
+    try:
+        # int() strips the str
+        first_hexit = int(field)
+        # Must be a valid base-10 integer here
+        if first_hexit < 0:
+            raise exceptions.FirstHexitNegative(address)
+        elif first_hexit > 0xF:
+            raise exceptions.FirstHexitGreaterThan15(address)
+    except ValueError:
+        # Must be a string, First Hexit or hexit
+        # Use strip() and upper() for some safety
+        first_hexit = field.strip().upper()
+        # Must be a hex value if length is 1
+        if len(first_hexit) == 1:
             try:
-                second_hexit = int(arg, 16)
+                first_hexit = int(first_hexit, 16)
             except ValueError:
-                raise exceptions.InvalidSecondHexit(address)
+                raise exceptions.InvalidFirstHexit(address)
+        # Otherwise must be First Hexit
+        else:
+            if first_hexit not in global_vars.MNEMONIC_TO_OPCODE:
+                raise exceptions.InvalidFirstHexit(address)
+            first_hexit = global_vars.MNEMONIC_TO_OPCODE[first_hexit]
+    return first_hexit
 
-        byte = first_hexit << 4 | second_hexit
-        global_vars.RAM[address] = byte
 
-    if len(global_vars.RAM) > 16:
-        raise exceptions.MoreThan16MappedAddresses
+def _classify_second_hexit(field: str, address: int) -> int:
+    """Parse a Second Hexit that isn't in ``HEXIT_TOKENS`` or raise its exception."""
+    second_hexit = 0
+    try:
+        second_hexit = int(field)
+        # Must be a base-10 integer here
+        if second_hexit < 0:
+            raise exceptions.SecondHexitNegative(address)
+        elif second_hexit > 0xF:
+            raise exceptions.SecondHexitGreaterThan15(address)
+    except ValueError:
+        # Must be a str here
+        # Use strip() and upper() for some safety for a string field
+        arg = field.strip().upper()
+        if len(arg) != 1:
+            raise exceptions.InvalidSecondHexit(address)
+        try:
+            second_hexit = int(arg, 16)
+        except ValueError:
+            raise exceptions.InvalidSecondHexit(address)
+    return second_hexit
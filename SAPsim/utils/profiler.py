@@ -0,0 +1,61 @@
+"""Count what a SAP program does while it runs: instructions per opcode and per address, RAM reads and writes
+per address, and taken and not-taken ``JC``/``JZ`` branches per address.
+
+Profiling is opt-in (``run(..., profile=True)``) and done by its own loop, ``execute.execute_profiled()``,
+so the other executors don't check whether to count anything. The counts are ``"profile"`` in the returned state
+(see ``Profile.as_dict()``), e.g., to rank submissions by number of instructions or to find hot loops.
+"""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+from typing import Any
+import SAPsim.utils.global_vars as global_vars
+
+
+class Profile:
+    """Counters filled in by ``execute.execute_profiled()``. Each list is indexed by opcode or address."""
+
+    __slots__ = ("opcodes", "addresses", "reads", "writes", "taken", "not_taken")
+
+    def __init__(self) -> None:
+        self.opcodes: list[int] = [0] * 16
+        """Number of instructions executed per opcode"""
+        self.addresses: list[int] = [0] * (global_vars.MAX_PC + 1)
+        """Number of steps per address (including skipped unmapped addresses)"""
+        self.reads: list[int] = [0] * (global_vars.MAX_PC + 1)
+        """Number of reads of each address by ``LDA``, ``ADD``, and ``SUB`` (not counting instruction fetches)"""
+        self.writes: list[int] = [0] * (global_vars.MAX_PC + 1)
+        """Number of writes to each address by ``STA``"""
+        self.taken: list[int] = [0] * (global_vars.MAX_PC + 1)
+        """Number of taken ``JC``/``JZ`` branches at each address"""
+        self.not_taken: list[int] = [0] * (global_vars.MAX_PC + 1)
+        """Number of not-taken ``JC``/``JZ`` branches at each address"""
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the nonzero counts, keyed by mnemonic or address.
+
+        ``"instructions"`` is the total number of instructions executed, and ``"branches"`` maps the address of each
+        executed ``JC``/``JZ`` to ``{"taken": count, "not_taken": count}``.
+
+        :return: Counts
+        :rtype: dict[str, Any]"""
+        return {
+            "instructions": sum(self.opcodes),
+            "opcodes": {
+                global_vars.OPCODE_TO_MNEMONIC.get(opcode, opcode): count
+                for opcode, count in enumerate(self.opcodes)
+                if count
+            },
+            "addresses": _nonzero(self.addresses),
+            "reads": _nonzero(self.reads),
+            "writes": _nonzero(self.writes),
+            "branches": {
+                addr: {"taken": self.taken[addr], "not_taken": self.not_taken[addr]}
+                for addr in range(global_vars.MAX_PC + 1)
+                if self.taken[addr] or self.not_taken[addr]
+            },
+        }
+
+
+def _nonzero(counts: list[int]) -> dict[int, int]:
+    return {addr: count for addr, count in enumerate(counts) if count}
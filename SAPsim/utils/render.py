@@ -0,0 +1,105 @@
+"""Render the tables of debug mode without re-tabulating every row after every step.
+
+Debug mode prints the RAM table (``helpers.print_RAM()``) and the register table (``helpers.print_info()``) after every
+step, but usually only the row of the old ``PC``, the row of the new ``PC``, and the row written by ``STA`` change.
+``TableRenderer`` keeps the lines of the last table it rendered. As long as no column gets wider or narrower
+(and the number of rows is the same), the other lines can't change, so only rows that changed are formatted, and
+rows seen before (e.g., the ``PC`` marker moving around a loop) are looked up in a cache. The output is exactly what
+``tabulate()`` would print.
+"""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+from typing import Any, Optional
+
+_SENTINEL: str = "@sapsim@"
+
+_ROW_LINES: dict[tuple[tuple[str, ...], str], tuple[int, int]] = {}
+"""Maps ``(headers, table_format)`` to ``(line of the first row, lines per row)``"""
+
+
+def _row_lines(headers: tuple[str, ...], table_format: str) -> tuple[int, int]:
+    """Return the index of the line of the first row of a table, and the number of lines between rows."""
+    key: tuple[tuple[str, ...], str] = (headers, table_format)
+    if key not in _ROW_LINES:
+        # Imported on first use, see helpers.print_RAM()
+        from tabulate import tabulate
+
+        lines: list[str] = tabulate(
+            [[_SENTINEL] * max(len(headers), 1)] * 2,
+            headers=headers,
+            tablefmt=table_format,
+        ).split("\n")
+        first, second = [i for i, line in enumerate(lines) if _SENTINEL in line]
+        _ROW_LINES[key] = (first, second - first)
+    return _ROW_LINES[key]
+
+
+class TableRenderer:
+    """Renders a table like ``tabulate(rows, headers=headers, tablefmt=table_format)``, reusing unchanged lines.
+
+    Each column must hold values of one type (plus empty strings), and each cell must render on one line.
+
+    :param headers: Column headers, or an empty tuple for none
+    :type headers: tuple[str, ...]
+    :param table_format: Tabulate ``tablefmt``
+    :type table_format: str"""
+
+    __slots__ = ("headers", "table_format", "_layout", "_lines", "_rows", "_cache")
+
+    def __init__(self, headers: tuple[str, ...], table_format: str):
+        self.headers: tuple[str, ...] = headers
+        self.table_format: str = table_format
+        self._layout: Optional[tuple[int, ...]] = None
+        """Number of rows and width of each column of the last table"""
+        self._lines: list[str] = []
+        """Lines of the last table"""
+        self._rows: list[tuple] = []
+        """Rows of the last table"""
+        self._cache: dict[tuple, str] = {}
+        """Line of each row rendered with the current layout"""
+
+    def render(self, rows: list[list[Any]]) -> str:
+        """Return the table of ``rows``.
+
+        :param rows: Rows of cells
+        :type rows: list[list[Any]]
+        :return: Table, identical to ``tabulate()``'s
+        :rtype: str"""
+        # Imported on first use, see helpers.print_RAM()
+        from tabulate import tabulate
+
+        rows_: list[tuple] = [tuple(row) for row in rows]
+        widest: list[Any] = list(rows_[0]) if rows_ else []
+        for row in rows_:
+            for column, cell in enumerate(row):
+                if len(str(cell)) > len(str(widest[column])):
+                    widest[column] = cell
+        first, stride = _row_lines(self.headers, self.table_format)
+        layout: tuple[int, ...] = (len(rows_), *(len(str(cell)) for cell in widest))
+        if layout != self._layout:
+            self._layout = layout
+            self._lines = tabulate(
+                rows_, headers=self.headers, tablefmt=self.table_format
+            ).split("\n")
+            self._rows = rows_
+            self._cache = {
+                row: self._lines[first + i * stride] for i, row in enumerate(rows_)
+            }
+            return "\n".join(self._lines)
+
+        changed: list[int] = [i for i, row in enumerate(rows_) if row != self._rows[i]]
+        missing: list[int] = [i for i in changed if rows_[i] not in self._cache]
+        if missing:
+            # The widest cell of each column, so the columns have the same widths as the full table
+            lines: list[str] = tabulate(
+                [rows_[i] for i in missing] + [tuple(widest)],
+                headers=self.headers,
+                tablefmt=self.table_format,
+            ).split("\n")
+            for j, i in enumerate(missing):
+                self._cache[rows_[i]] = lines[first + j * stride]
+        for i in changed:
+            self._lines[first + i * stride] = self._cache[rows_[i]]
+            self._rows[i] = rows_[i]
+        return "\n".join(self._lines)
@@ -0,0 +1,208 @@
+"""Binary trace files: record every step of a run in 8 bytes, and replay any step without rereading the whole file.
+
+``write_trace()`` runs a program and writes a 32-byte header (initial RAM, mapped addresses, bits, termination status)
+followed by one fixed-width record per executed instruction::
+
+    PC, byte, A, B, flags, written address, written value, reserved
+
+where ``byte`` is the executed instruction (0 if ``PC`` was unmapped) and ``flags`` is a combination of the ``FLAG_*``
+bits below. ``TraceFile`` memory-maps a trace file, so step ``n`` is a single slice (``trace[n]``), and the RAM after
+step ``n`` (``trace.RAM_at(n)``) is rebuilt from the initial RAM and the last write to each address,
+found by scanning the flags backwards in C (``bytes.rfind``) instead of replaying every step.
+
+A run that raises an exception still writes every step before the exception, and its status
+(see ``batch.STATUS_NAMES``) is stored in the header, so failing runs can be inspected later.
+"""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+import mmap
+import struct
+from pathlib import Path
+from typing import Iterator, Union
+import SAPsim.utils.execute as execute
+import SAPsim.utils.global_vars as global_vars
+import SAPsim.utils.helpers as helpers
+from SAPsim.utils.batch import EXCEPTION_TO_STATUS, RUNNING, HALTED
+from SAPsim.utils.execute import TraceRecord
+from SAPsim.utils.machine import Machine
+
+MAGIC: bytes = b"SAPT"
+VERSION: int = 1
+
+HEADER: struct.Struct = struct.Struct("<4sBBBxH16s6x")
+"""Magic, version, bits, status, mapped addresses, initial RAM"""
+RECORD: struct.Struct = struct.Struct("<8B")
+"""PC, byte, A, B, flags, written address, written value, reserved"""
+_STATUS_OFFSET: int = 6
+
+FLAG_C: int = 1
+FLAG_Z: int = 2
+FLAG_MAPPED: int = 4
+"""``PC`` was mapped, so ``byte`` was executed"""
+FLAG_WRITTEN: int = 8
+"""The instruction (``STA``) wrote to RAM"""
+
+# bytes.translate table mapping a flags byte to 1 if it has FLAG_WRITTEN, else 0
+_WRITTEN_TABLE: bytes = bytes(1 if flags & FLAG_WRITTEN else 0 for flags in range(256))
+_FLUSH_EVERY: int = 4096
+"""Number of records buffered before writing to the file"""
+
+
+def write_trace(prog_path: str, trace_path: Union[Path, str], **kwargs) -> int:
+    r"""Run given .csv program in SAPsim format and write every executed instruction to a binary trace file.
+
+    :param prog_path: Path to .csv program in SAPsim format
+    :type prog_path: str
+    :param trace_path: Trace file to write
+    :type trace_path: Union[Path, str]
+    :param \**kwargs: Same as ``iter_trace()``
+    :raises Exception: Any exception raised during execution, after the steps before it are written
+    :return: Number of steps written
+    :rtype: int"""
+    execute._check_kwargs(prog_path, kwargs)
+    machine: Machine = execute._load_machine(prog_path, kwargs)
+    steps: int = 0
+    with open(trace_path, "wb") as f:
+        f.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                machine.NUM_BITS_IN_REGISTERS,
+                RUNNING,
+                machine.mapped,
+                bytes(machine.memory),
+            )
+        )
+        buffer: bytearray = bytearray()
+        status: int = RUNNING
+        try:
+            for record in execute.trace_machine(machine, kwargs.get("max_steps")):
+                flags: int = record.FLAG_C * FLAG_C | record.FLAG_Z * FLAG_Z
+                byte: int = 0
+                written: int = 0
+                value: int = 0
+                if record.opcode is not None:
+                    flags |= FLAG_MAPPED
+                    byte = record.opcode << 4 | record.arg
+                if record.written is not None:
+                    flags |= FLAG_WRITTEN
+                    written, value = record.written, machine.memory[record.written]
+                buffer += RECORD.pack(
+                    record.PC, byte, record.A, record.B, flags, written, value, 0
+                )
+                steps += 1
+                if steps % _FLUSH_EVERY == 0:
+                    f.write(buffer)
+                    buffer.clear()
+            status = HALTED
+        except tuple(EXCEPTION_TO_STATUS) as e:
+            status = EXCEPTION_TO_STATUS[type(e)]
+            raise
+        finally:
+            f.write(buffer)
+            f.seek(_STATUS_OFFSET)
+            f.write(bytes((status,)))
+    return steps
+
+
+class TraceFile:
+    """Read-only, memory-mapped view of a trace file written by ``write_trace()``.
+
+    ``len(trace)`` is the number of steps and ``trace[n]`` is the ``TraceRecord`` of step ``n``.
+    Use as a context manager, or call ``close()``, to unmap the file.
+
+    :param path: Trace file
+    :type path: Union[Path, str]
+    :raises ValueError: If ``path`` isn't a trace file"""
+
+    def __init__(self, path: Union[Path, str]):
+        with open(path, "rb") as f:
+            self._mm: mmap.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < HEADER.size or self._mm[:4] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a SAPsim trace file.")
+        magic, version, bits, status, mapped, memory = HEADER.unpack_from(self._mm)
+        if version != VERSION:
+            self._mm.close()
+            raise ValueError(f"{path} has unsupported trace file version {version}.")
+        self.bits: int = bits
+        """Number of bits in registers"""
+        self.status: int = status
+        """Termination status, see ``batch.STATUS_NAMES``"""
+        self.mapped: int = mapped
+        """Mapped addresses before the first step, see ``Machine.mapped``"""
+        self.memory: bytes = memory
+        """RAM before the first step, see ``Machine.memory``"""
+
+    def __len__(self) -> int:
+        return (len(self._mm) - HEADER.size) // RECORD.size
+
+    def __getitem__(self, step: int) -> TraceRecord:
+        if step < 0:
+            step += len(self)
+        if not 0 <= step < len(self):
+            raise IndexError(step)
+        PC, byte, A, B, flags, written, _, _ = RECORD.unpack_from(
+            self._mm, HEADER.size + step * RECORD.size
+        )
+        mapped: bool = bool(flags & FLAG_MAPPED)
+        return TraceRecord(
+            step,
+            PC,
+            helpers.parse_opcode(byte) if mapped else None,
+            helpers.parse_arg(byte) if mapped else None,
+            A,
+            B,
+            bool(flags & FLAG_C),
+            bool(flags & FLAG_Z),
+            written if flags & FLAG_WRITTEN else None,
+        )
+
+    def __iter__(self) -> Iterator[TraceRecord]:
+        return (self[step] for step in range(len(self)))
+
+    def RAM_at(self, step: int) -> dict[int, int]:
+        """Return RAM after step ``step``, mapping ``PC``:``byte`` like ``get_state()``. ``RAM_at(-1)`` is the initial RAM.
+
+        :param step: Step, -1 to ``len(self) - 1``
+        :type step: int
+        :raises IndexError: If ``step`` is out of range
+        :return: RAM
+        :rtype: dict[int, int]"""
+        if not -1 <= step < len(self):
+            raise IndexError(step)
+        memory: bytearray = bytearray(self.memory)
+        mapped: int = self.mapped
+        # written[i] is 1 if step i wrote to RAM
+        written: bytes = self._mm[
+            HEADER.size + 4 : HEADER.size + 4 + (step + 1) * RECORD.size : RECORD.size
+        ].translate(_WRITTEN_TABLE)
+        # Only the last write to each address matters, so scan backwards until every address is seen
+        seen: int = 0
+        i: int = written.rfind(1)
+        while i != -1 and seen != (1 << global_vars.MAX_PC + 1) - 1:
+            offset: int = HEADER.size + i * RECORD.size
+            addr: int = self._mm[offset + 5]
+            if not seen >> addr & 1:
+                seen |= 1 << addr
+                memory[addr] = self._mm[offset + 6]
+                mapped |= 1 << addr
+            i = written.rfind(1, 0, i)
+        return {
+            addr: memory[addr]
+            for addr in range(mapped.bit_length())
+            if mapped >> addr & 1
+        }
+
+    def close(self) -> None:
+        """Unmap the file.
+
+        :return: None"""
+        self._mm.close()
+
+    def __enter__(self) -> "TraceFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,234 @@
+"""Benchmarks of the hot paths of SAPsim: parsing, executing, printing in debug mode, and sweeping all 256 inputs.
+
+Run from the root of the repo, which benchmarks the working tree (not the installed SAPsim)::
+
+    python benchmarks/bench.py -o benchmarks/results/before.json
+    python benchmarks/bench.py -o benchmarks/results/after.json --compare benchmarks/results/before.json
+
+Each benchmark is timed with ``timeit`` (``--repeat`` runs of ``number`` calls each), and the min and median time
+per call are saved as JSON. ``--compare`` prints the ratio of each median to a previous results file.
+
+Besides ``tests/public_prog/ex1.csv`` and ``ex2.csv``, two worst-case programs are generated: a loop that never halts
+(stopped by ``max_steps``) and a loop that rewrites one of its own instructions every iteration.
+"""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+ROOT: Path = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import SAPsim.utils.exceptions as exceptions  # noqa: E402
+import SAPsim.utils.parser as parser  # noqa: E402
+from SAPsim import run, run_and_return_state, evaluate_all  # noqa: E402
+from SAPsim.utils.execute import execute_compiled, execute_full_speed  # noqa: E402
+from SAPsim.utils.machine import Machine  # noqa: E402
+
+EX1: str = str(ROOT / "tests" / "public_prog" / "ex1.csv")
+EX2: str = str(ROOT / "tests" / "public_prog" / "ex2.csv")
+
+LOOP_STEPS: int = 100_000
+"""Number of instructions executed by the generated loops"""
+
+GENERATED: dict[str, list[tuple[int, str, str]]] = {
+    # A = A + 1 forever
+    "long_loop": [
+        (0, "LDA", "14"),
+        (1, "ADD", "15"),
+        (2, "STA", "14"),
+        (3, "JMP", "1"),
+        (14, "0", "0"),
+        (15, "0", "1"),
+    ],
+    # Writes NOP over address 2 every iteration
+    "self_modifying": [
+        (0, "LDA", "13"),
+        (1, "STA", "2"),
+        (2, "NOP", "0"),
+        (3, "ADD", "14"),
+        (4, "JMP", "0"),
+        (13, "0", "0"),
+        (14, "0", "1"),
+    ],
+}
+"""Worst-case programs, as ``(Address, First Hexit, Second Hexit)`` rows"""
+
+
+def write_programs(directory: Path) -> dict[str, str]:
+    """Write each program in ``GENERATED`` to a .csv in ``directory``, returning their paths by name."""
+    paths: dict[str, str] = {}
+    for name, rows in GENERATED.items():
+        path: Path = directory / f"{name}.csv"
+        with open(path, "w") as f:
+            f.write("Address,First Hexit,Second Hexit,Comments\n")
+            for addr, first, second in rows:
+                f.write(f"{addr},{first},{second},\n")
+        paths[name] = str(path)
+    return paths
+
+
+def run_until_limit(
+    executor: Callable[[Machine, Optional[int]], None], template: Machine
+) -> None:
+    """Execute a copy of ``template`` for ``LOOP_STEPS`` instructions."""
+    try:
+        executor(template.copy(), LOOP_STEPS)
+    except exceptions.StepLimitExceeded:
+        pass
+
+
+def sweep_run(prog_path: str) -> None:
+    """Run ``prog_path`` on every input at address 15 with ``run_and_return_state()``, like ``tests/test_example_progs.py``."""
+    for num in range(256):
+        run_and_return_state(prog_path, change={15: num}, no_print=True)
+
+
+def benchmarks(programs: dict[str, str]) -> dict[str, tuple[Callable[[], Any], int]]:
+    """Return every benchmark as ``name: (function, number of calls per run)``."""
+    ex2: Machine = Machine(parser.parse_csv_cached(EX2), no_print=True)
+    long_loop: Machine = Machine(
+        parser.parse_csv_cached(programs["long_loop"]), no_print=True
+    )
+    self_modifying: Machine = Machine(
+        parser.parse_csv_cached(programs["self_modifying"]), no_print=True
+    )
+    suite: dict[str, tuple[Callable[[], Any], int]] = {
+        "parse/ex1": (lambda: parser.parse_csv(EX1), 200),
+        "parse/ex2": (lambda: parser.parse_csv(EX2), 200),
+        "execute/ex2": (lambda: execute_full_speed(ex2.copy()), 1000),
+        "execute/long_loop": (
+            lambda: run_until_limit(execute_full_speed, long_loop),
+            1,
+        ),
+        "execute/long_loop_compiled": (
+            lambda: run_until_limit(execute_compiled, long_loop),
+            1,
+        ),
+        "execute/self_modifying": (
+            lambda: run_until_limit(execute_full_speed, self_modifying),
+            1,
+        ),
+        "print/full_speed_ex2": (lambda: run(EX2), 20),
+        "print/debug_ex2": (
+            lambda: run(EX2, non_blocking=True, change={15: 255}),
+            2,
+        ),
+        "sweep/run_ex2": (lambda: sweep_run(EX2), 1),
+        "sweep/evaluate_all_ex2": (
+            lambda: evaluate_all(EX2, {15: range(256)}, ["A"]),
+            1,
+        ),
+    }
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        from SAPsim import run_batch
+
+        suite["sweep/run_batch_ex2"] = (
+            lambda: run_batch(EX2, changes=[{15: num} for num in range(256)]),
+            1,
+        )
+    return suite
+
+
+def measure(function: Callable[[], Any], number: int, repeat: int) -> dict[str, float]:
+    """Time ``repeat`` runs of ``number`` calls of ``function``, with stdout discarded."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        times: list[float] = timeit.Timer(function).repeat(repeat=repeat, number=number)
+    per_call: list[float] = [time / number for time in times]
+    return {
+        "number": number,
+        "repeat": repeat,
+        "min": min(per_call),
+        "median": statistics.median(per_call),
+    }
+
+
+def metadata() -> dict[str, Any]:
+    """Return where and when the benchmarks were run."""
+    try:
+        commit: Optional[str] = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+    }
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any]) -> None:
+    """Print the median of each benchmark in ``results`` relative to ``baseline``."""
+    print(f"\n{'benchmark':32} {'baseline':>12} {'current':>12} {'ratio':>8}")
+    for name, result in results["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before: float = baseline["results"][name]["median"]
+        after: float = result["median"]
+        print(f"{name:32} {before:12.6f} {after:12.6f} {after / before:8.2f}")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    arg_parser.add_argument("-o", "--output", help="JSON file to save results to")
+    arg_parser.add_argument("--compare", help="JSON results file to compare to")
+    arg_parser.add_argument(
+        "-k",
+        "--filter",
+        default="",
+        help="Only run benchmarks whose name contains this",
+    )
+    arg_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Number of runs per benchmark (default: 5)",
+    )
+    args = arg_parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        suite = benchmarks(write_programs(Path(directory)))
+        results: dict[str, Any] = {"meta": metadata(), "results": {}}
+        for name, (function, number) in suite.items():
+            if args.filter not in name:
+                continue
+            result: dict[str, float] = measure(function, number, args.repeat)
+            results["results"][name] = result
+            print(f"{name:32} {result['median'] * 1000:10.3f} ms", flush=True)
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,12 +6,24 @@ except ImportError:
 install_requires: list[str] = [
     "setuptools",
     "tabulate",
-    "bidict",
 ]
 """All required functional dependencies that are installed when running `pip install SAPsim`.
 
 Non-functional (e.g., testing, formatting, documentation) dependencies are listed in requirements.txt."""
 
+extras_require: dict[str, list[str]] = {
+    "batch": ["numpy"],
+}
+"""Optional dependencies, e.g., `pip install SAPsim[batch]` for `run_batch()`."""
+
+entry_points: dict[str, list[str]] = {
+    "console_scripts": [
+        "sapsim = SAPsim.cli:main",
+        "sapsim-grade = SAPsim.grade:main",
+    ],
+}
+"""Console scripts installed with SAPsim: `sapsim` (see SAPsim/cli.py) and `sapsim-grade` (see SAPsim/grade.py)."""
+
 setup(
     name="SAPsim",
     # Check https://pypi.org/project/SAPsim/ for latest version number
@@ -29,6 +41,8 @@ setup(
         "COMP311",
     ],
     install_requires=install_requires,
+    extras_require=extras_require,
+    entry_points=entry_points,
     tests_require=install_requires + ["tox", "pytest", "pytest-cov"],
     # See https://setuptools.pypa.io/en/latest/userguide/package_discovery.html
     packages=find_packages(),
@@ -13,7 +13,7 @@ import subprocess
 from typing import Any, Union
 import pytest
 
-from SAPsim import run, create_template
+from SAPsim import run, iter_trace, create_template
 import SAPsim.utils.parser as parser
 import SAPsim.utils.exceptions as exceptions
 
@@ -88,6 +88,207 @@ def test_run_change_input_validation() -> None:
         run("tests/public_prog/ex1.csv", change={0: 256})
 
 
+def test_run_detect_loops() -> None:
+    """Replace the HLT of ex2.csv with JMP 0, so an input < 31 loops forever.
+    The first repeated state is at address 2 since B is still 0 during the first iteration.
+    """
+    with pytest.raises(exceptions.InfiniteLoop) as e:
+        run(
+            "tests/public_prog/ex2.csv",
+            detect_loops=True,
+            no_print=True,
+            change={4: 0x60, 15: 0},
+        )
+    assert e.value.entry_pc == 2
+    assert e.value.length == 5
+    state: dict[str, Any] = run(
+        "tests/public_prog/ex2.csv", detect_loops=True, no_print=True, return_state=True
+    )
+    assert state["A"] == 28
+
+
+def test_run_max_steps() -> None:
+    """Same infinite loop as ``test_run_detect_loops()``, stopped by ``max_steps`` in every mode.
+    The loop is 5 instructions long starting at address 0, so the 101st instruction is at address 0.
+    """
+    for mode in ({}, {"compiled": True}, {"non_blocking": True}):
+        with pytest.raises(exceptions.StepLimitExceeded) as e:
+            write_run_stdout_stderr(
+                "tests/public_prog/ex2.csv",
+                max_steps=100,
+                no_print=True,
+                change={4: 0x60, 15: 0},
+                debug=bool(mode.get("non_blocking")),
+                **mode,
+            )
+        sys.stdout = ORIG_STDOUT
+        sys.stderr = ORIG_STDERR
+        assert e.value.steps == 100
+        assert e.value.last_pc == 0
+    with pytest.raises(exceptions.StepLimitExceeded):
+        run(
+            "tests/public_prog/ex2.csv",
+            detect_loops=True,
+            max_steps=3,
+            no_print=True,
+            change={4: 0x60, 15: 0},
+        )
+    state: dict[str, Any] = run(
+        "tests/public_prog/ex2.csv", max_steps=100, no_print=True, return_state=True
+    )
+    assert state["steps"] == 23
+    with pytest.raises(exceptions.StepLimitExceeded):
+        run("tests/public_prog/ex2.csv", max_steps=22, no_print=True)
+    with pytest.raises(TypeError):
+        run("tests/public_prog/ex2.csv", max_steps="100")
+
+
+def test_run_output(tmp_path, capsys: pytest.CaptureFixture) -> None:
+    """``OUT`` is collected and printed once in the chosen format, and returned in the state."""
+    prog_path: str = str(tmp_path / "out.csv")
+    with open(prog_path, "w") as f:
+        f.write("Address,First Hexit,Second Hexit,Comments\n")
+        f.write("0,LDI,1,\n1,OUT,0,\n2,LDI,2,\n3,OUT,0,\n4,HLT,0,\n")
+
+    state: dict[str, Any] = run(
+        prog_path, output="raw", no_print=True, return_state=True
+    )
+    assert state["OUT"] == [1, 2]
+    assert capsys.readouterr().out == "1\n2\n"
+    run(prog_path, output="none", no_print=True)
+    assert capsys.readouterr().out == ""
+    run(prog_path, table_format="plain", no_print=True)
+    assert capsys.readouterr().out.split("\n") == [
+        "  PC    Dec  Hex",
+        "   1      1  0x01",
+        "   3      2  0x02",
+        "",
+    ]
+    run(prog_path, non_blocking=True, output="raw", no_print=True)
+    assert capsys.readouterr().out == "1\n2\nProgram halted.\n"
+    output_file: str = str(tmp_path / "out.txt")
+    run(prog_path, output="raw", output_file=output_file, no_print=True)
+    assert capsys.readouterr().out == ""
+    with open(output_file) as f:
+        assert f.read() == "1\n2\n"
+    with pytest.raises(TypeError):
+        run(prog_path, output="json")
+
+
+def test_run_profile() -> None:
+    """With input 255, ex2's loop subtracts 3 until X < 31, which takes 75 iterations."""
+    state: dict[str, Any] = run(
+        "tests/public_prog/ex2.csv",
+        change={15: 255},
+        profile=True,
+        no_print=True,
+        return_state=True,
+    )
+    unprofiled: dict[str, Any] = run(
+        "tests/public_prog/ex2.csv", change={15: 255}, no_print=True, return_state=True
+    )
+    assert unprofiled["profile"] is None
+    assert {**state, "profile": None} == unprofiled
+    profile: dict[str, Any] = state["profile"]
+    assert profile["instructions"] == state["steps"]
+    assert sum(profile["addresses"].values()) == state["steps"]
+    assert profile["opcodes"]["HLT"] == 1
+    assert profile["opcodes"]["JMP"] == 75
+    assert profile["branches"] == {3: {"taken": 75, "not_taken": 1}}
+    assert profile["writes"] == {15: 75}
+    assert profile["reads"] == {13: 75, 14: 76, 15: 77}
+    with pytest.raises(exceptions.StepLimitExceeded):
+        run(
+            "tests/public_prog/ex2.csv",
+            change={4: 0x60},
+            profile=True,
+            max_steps=50,
+            no_print=True,
+        )
+    with pytest.raises(TypeError):
+        run("tests/public_prog/ex2.csv", profile="yes")
+
+
+def test_iter_trace() -> None:
+    """The last record of ``iter_trace()`` matches the final state of ``run()``, and the trace can be stopped early."""
+    import itertools
+
+    trace: list = list(iter_trace("tests/public_prog/ex2.csv", no_print=True))
+    state: dict[str, Any] = run(
+        "tests/public_prog/ex2.csv", no_print=True, return_state=True
+    )
+    assert len(trace) == state["steps"] == 23
+    assert [record.step for record in trace] == list(range(23))
+    last = trace[-1]
+    assert (last.A, last.B, last.FLAG_C, last.FLAG_Z) == (
+        state["A"],
+        state["B"],
+        state["FLAG_C"],
+        state["FLAG_Z"],
+    )
+    assert last.opcode == 0xF
+    assert trace[0].PC == 0 and trace[0].opcode == 0x1 and trace[0].arg == 15
+    assert all(
+        record.written == record.arg if record.opcode == 0x4 else record.written is None
+        for record in trace
+    )
+    assert any(record.written is not None for record in trace)
+
+    # Infinite loop, stopped early by the caller or by max_steps
+    looping: dict[str, Any] = {"no_print": True, "change": {4: 0x60, 15: 0}}
+    first: list = list(
+        itertools.islice(iter_trace("tests/public_prog/ex2.csv", **looping), 1000)
+    )
+    assert len(first) == 1000
+    with pytest.raises(exceptions.StepLimitExceeded):
+        for _ in iter_trace("tests/public_prog/ex2.csv", max_steps=10, **looping):
+            pass
+
+
+def test_iter_trace_out(tmp_path, capsys: pytest.CaptureFixture) -> None:
+    """``OUT`` prints nothing while tracing, and its value is ``A`` of its record."""
+    prog_path: str = str(tmp_path / "out.csv")
+    with open(prog_path, "w") as f:
+        f.write("Address,First Hexit,Second Hexit,Comments\n")
+        f.write("0,LDI,1,\n1,OUT,0,\n2,LDI,2,\n3,OUT,0,\n4,HLT,0,\n")
+    trace: list = list(iter_trace(prog_path, no_print=True))
+    assert [record.A for record in trace if record.opcode == 0xE] == [1, 2]
+    assert capsys.readouterr().out == ""
+
+
+def test_run_threads() -> None:
+    """Test that ``run()`` calls in different threads don't share state."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def ex1_output(num: int) -> int:
+        return run(
+            "tests/public_prog/ex1.csv",
+            return_state=True,
+            no_print=True,
+            change={14: num},
+        )["RAM"][15]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        outputs: list[int] = list(executor.map(ex1_output, range(256)))
+    assert outputs == [int(num == 3) for num in range(256)]
+
+
+def test_run_sapbin(tmp_path) -> None:
+    """A ``.sapbin`` image runs exactly like the ``.csv`` it was converted from."""
+    image_path: str = str(
+        parser.convert_csv("tests/public_prog/ex2.csv", tmp_path / "ex2.sapbin")
+    )
+    for num in (0, 7, 255):
+        assert run(
+            image_path, change={15: num}, no_print=True, return_state=True
+        ) == run(
+            "tests/public_prog/ex2.csv",
+            change={15: num},
+            no_print=True,
+            return_state=True,
+        )
+
+
 def test_create_template() -> None:
     create_template(STDOUT_FILE)
     assert file_match(STDOUT_FILE, "docs/_static/template.csv")
@@ -0,0 +1,80 @@
+"""Test archives of many programs and running them with run_images()."""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+import shutil
+from pathlib import Path
+from typing import Any
+import pytest
+import SAPsim.utils.parser as parser
+from SAPsim.grade import grade
+from SAPsim.utils.archive import HEADER, RECORD, Archive, pack_directory, write_archive
+from SAPsim.utils.batch import run_batch, run_images
+from tests.test_example_progs import ex2_rv
+
+np = pytest.importorskip("numpy")
+
+
+def test_pack_and_read_archive(tmp_path: Path) -> None:
+    path: Path = tmp_path / "public.sapar"
+    report: parser.ParseReport = pack_directory("tests/public_prog", path)
+    assert not report.errors
+    assert path.stat().st_size == HEADER.size + 2 * RECORD.size + len("ex1\0ex2")
+
+    with Archive(path) as archive:
+        assert len(archive) == 2
+        assert list(archive) == ["ex1", "ex2"]
+        assert "ex2" in archive and "ex3" not in archive
+        for name in archive:
+            image: parser.ProgramImage = report.images[f"tests/public_prog/{name}.csv"]
+            assert archive[name] == image
+            record: memoryview = archive.record(name)
+            assert bytes(record) == RECORD.pack(image.memory, image.mapped)
+            del record
+        assert archive.offset("ex2") == HEADER.size + RECORD.size
+        with pytest.raises(KeyError):
+            archive["ex3"]
+
+        memory, mapped = archive.arrays()
+        assert memory.shape == (2, 16) and mapped.shape == (2,)
+        assert bytes(memory[1]) == archive["ex2"].memory
+        assert int(mapped[1]) == archive["ex2"].mapped
+        assert not memory.flags.writeable
+        del memory, mapped
+
+    write_archive(tmp_path / "empty.sapar", {})
+    with Archive(tmp_path / "empty.sapar") as archive:
+        assert len(archive) == 0
+    with pytest.raises(ValueError):
+        Archive("tests/public_prog/ex1.csv")
+    with pytest.raises(ValueError):
+        write_archive(
+            tmp_path / "bad.sapar", {"a\0b": parser.ProgramImage(bytes(16), 0)}
+        )
+
+
+def test_run_images_matches_run_batch(tmp_path: Path) -> None:
+    """Running every program of an archive at once gives the same results as run_batch() on each program."""
+    path: Path = tmp_path / "public.sapar"
+    pack_directory("tests/public_prog", path)
+    with Archive(path) as archive:
+        memory, mapped = archive.arrays()
+        results: dict[str, Any] = run_images(memory, mapped, change={15: 31})
+        del memory, mapped
+        for lane, name in enumerate(archive):
+            expected: dict[str, Any] = run_batch(
+                f"tests/public_prog/{name}.csv", changes=[{15: 31}]
+            )
+            for key, value in expected.items():
+                assert np.array_equal(results[key][lane], value[0]), (name, key)
+
+
+def test_grade_archive(tmp_path: Path) -> None:
+    shutil.copy("tests/public_prog/ex2.csv", tmp_path / "correct.csv")
+    pack_directory(tmp_path, tmp_path / "submissions.sapar")
+    results: list[dict[str, Any]] = list(
+        grade(str(tmp_path / "submissions.sapar"), {15: range(256)}, ex2_rv, "A")
+    )
+    assert len(results) == 256
+    assert all(result["passed"] for result in results)
+    assert {result["submission"] for result in results} == {"correct"}
@@ -0,0 +1,52 @@
+"""Test batch.py."""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+from typing import Any
+import pytest
+from SAPsim import run_and_return_state, run_batch
+from SAPsim.utils import batch
+import SAPsim.utils.exceptions as exceptions
+
+np = pytest.importorskip("numpy")
+
+
+def test_run_batch_matches_run() -> None:
+    for prog_path, addr in (
+        ("tests/public_prog/ex1.csv", 14),
+        ("tests/public_prog/ex2.csv", 15),
+    ):
+        changes: list[dict[int, int]] = [{addr: num} for num in range(256)]
+        result: dict[str, Any] = run_batch(prog_path, changes=changes)
+        assert (result["status"] == batch.HALTED).all()
+        for lane, change in enumerate(changes):
+            state: dict[str, Any] = run_and_return_state(
+                prog_path, change=change, no_print=True
+            )
+            assert result["PC"][lane] == state["PC"]
+            assert result["A"][lane] == state["A"]
+            assert result["B"][lane] == state["B"]
+            assert result["FLAG_C"][lane] == state["FLAG_C"]
+            assert result["FLAG_Z"][lane] == state["FLAG_Z"]
+            for ram_addr, byte in state["RAM"].items():
+                assert result["RAM"][lane][ram_addr] == byte
+                assert result["mapped"][lane][ram_addr]
+
+
+def test_run_batch_retires_lanes_with_status() -> None:
+    result: dict[str, Any] = run_batch(
+        "tests/public_prog/ex1.csv",
+        # Unchanged, LDA 10 (unmapped), invalid opcode, NOP instead of HLT, JMP 0
+        changes=[{}, {0: 0x1A}, {0: 0x90}, {8: 0x00}, {2: 0x60}],
+        max_steps=100,
+    )
+    assert list(result["status"]) == [
+        batch.HALTED,
+        batch.LOAD_FROM_UNMAPPED_ADDRESS,
+        batch.INVALID_OPCODE,
+        batch.DROPPED_OFF_BOTTOM,
+        batch.RUNNING,
+    ]
+    assert list(result["steps"]) == [6, 0, 0, 13, 100]
+    with pytest.raises(exceptions.ChangeValueInvalid):
+        run_batch("tests/public_prog/ex1.csv", changes=[{14: 256}])
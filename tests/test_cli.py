@@ -0,0 +1,71 @@
+"""Test cli.py."""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+import json
+from pathlib import Path
+from typing import Any
+import pytest
+from SAPsim import run_and_return_state
+from SAPsim.cli import main, parse_change_spec
+import SAPsim.utils.parser as parser
+
+
+def test_main_json(capsys: pytest.CaptureFixture) -> None:
+    programs: list[str] = ["tests/public_prog/ex1.csv", "tests/public_prog/ex2.csv"]
+    assert main([*programs, "--change", "15=31", "--format", "json", "-j", "2"]) == 0
+    results: list[dict[str, Any]] = [
+        json.loads(line) for line in capsys.readouterr().out.splitlines()
+    ]
+    # Results are printed as they finish, so they can be in any order
+    assert sorted(result["program"] for result in results) == programs
+    for result in results:
+        assert result["error"] is None
+        expected: dict[str, Any] = run_and_return_state(
+            result["program"], change={15: 31}, no_print=True
+        )
+        # JSON object keys are strings
+        expected["RAM"] = {str(addr): byte for addr, byte in expected["RAM"].items()}
+        assert result["state"] == expected
+
+
+def test_main_table_and_errors(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    image: str = str(
+        parser.convert_csv("tests/public_prog/ex2.csv", tmp_path / "ex2.sapbin")
+    )
+    assert main([image, "--change", "15=0x1f"]) == 0
+    out: str = capsys.readouterr().out
+    assert "│ Reg A │ 28 │" in out
+    assert "==>" not in out
+
+    # Never halts
+    assert (
+        main([image, "--change", "5=0x60", "--max-steps", "100", "--format", "none"])
+        == 1
+    )
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert captured.err.startswith(f"{image}: StepLimitExceeded: ")
+
+    assert main(["tests/public_prog/ex1.csv", "missing.csv", "--format", "json"]) == 1
+    results: list[dict[str, Any]] = [
+        json.loads(line) for line in capsys.readouterr().out.splitlines()
+    ]
+    assert results[1] == {
+        "program": "missing.csv",
+        "state": None,
+        "error": "FileNotFoundError",
+        "message": results[1]["message"],
+    }
+
+    assert main([image, "--change", "15=300", "--format", "none"]) == 1
+    assert capsys.readouterr().err == (
+        f"{image}: ChangeValueInvalid: Changed value must fit in NUM_BITS_IN_REGISTERS (0 to 255). You provided 300.\n"
+    )
+
+
+def test_parse_change_spec() -> None:
+    assert parse_change_spec("15=7") == (15, 7)
+    assert parse_change_spec("0xF=0xff") == (15, 255)
+    with pytest.raises(ValueError):
+        parse_change_spec("15")
@@ -0,0 +1,106 @@
+"""Test compiler.py."""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+from typing import Any
+import pytest
+from SAPsim import run
+from SAPsim.utils.compiler import compile_program, reachable_addresses
+from SAPsim.utils.execute import execute_compiled, execute_full_speed
+from SAPsim.utils.helpers import get_state
+from SAPsim.utils.machine import Machine
+from SAPsim.utils.parser import parse_csv
+import SAPsim.utils.exceptions as exceptions
+
+
+def test_compiled_matches_interpreter_ex1_ex2() -> None:
+    for prog_path, addr in (
+        ("tests/public_prog/ex1.csv", 14),
+        ("tests/public_prog/ex2.csv", 15),
+    ):
+        for num in range(256):
+            interpreted: dict[str, Any] = run(
+                prog_path, return_state=True, no_print=True, change={addr: num}
+            )
+            compiled: dict[str, Any] = run(
+                prog_path,
+                return_state=True,
+                no_print=True,
+                change={addr: num},
+                compiled=True,
+            )
+            assert compiled == interpreted
+
+
+def test_compile_program_cached_across_data() -> None:
+    RAM: dict[int, int] = parse_csv("tests/public_prog/ex2.csv")
+    program = compile_program(RAM)
+    assert program is not None
+    RAM[15] = 200
+    assert compile_program(RAM) is program
+
+
+def test_reachable_addresses() -> None:
+    RAM: dict[int, int] = parse_csv("tests/public_prog/ex1.csv")
+    assert reachable_addresses(RAM) == [0, 1, 2, 3, 4, 5, 6, 7, 8]
+
+
+def test_self_modifying_program_not_compiled() -> None:
+    RAM: dict[int, int] = {
+        0: 0x1D,
+        1: 0x44,
+        2: 0x1E,
+        3: 0x4D,
+        4: 0x60,
+        13: 0x60,
+        14: 0xF0,
+    }
+    assert compile_program(RAM) is None
+    machine = Machine(RAM)
+    execute_compiled(machine)
+    assert machine.PC == 4 and not machine.EXECUTING
+
+
+def test_compiled_raises_same_exception() -> None:
+    # LDA 14 from an unmapped address
+    machine = Machine({0: 0x1E, 1: 0xF0}, no_print=True)
+    with pytest.raises(exceptions.LoadFromUnmappedAddress):
+        execute_compiled(machine)
+    assert machine.PC == 0
+    # LDI 0, then drop off the bottom
+    interpreted = Machine({0: 0x50, 2: 0x00}, no_print=True)
+    compiled = Machine({0: 0x50, 2: 0x00}, no_print=True)
+    with pytest.raises(exceptions.DroppedOffBottom):
+        execute_full_speed(interpreted)
+    with pytest.raises(exceptions.DroppedOffBottom):
+        execute_compiled(compiled)
+    assert get_state(compiled) == get_state(interpreted)
+
+
+def test_compiled_bits() -> None:
+    # ADD 15 twice with 4 bits sets FLAG_C
+    RAM: dict[int, int] = {0: 0x2F, 1: 0x2F, 2: 0xF0, 15: 0xF}
+    interpreted = Machine(RAM, bits=4)
+    compiled = Machine(RAM, bits=4)
+    execute_full_speed(interpreted)
+    execute_compiled(compiled)
+    assert get_state(compiled) == get_state(interpreted)
+    assert compiled.A == 14 and compiled.FLAG_C
+
+
+def test_compiled_max_steps() -> None:
+    # The compiled function stops before a block that would exceed max_steps
+    RAM: dict[int, int] = parse_csv("tests/public_prog/ex2.csv")
+    for max_steps in range(24):
+        interpreted = Machine(RAM, no_print=True)
+        compiled = Machine(RAM, no_print=True)
+        if max_steps < 23:
+            with pytest.raises(exceptions.StepLimitExceeded):
+                execute_full_speed(interpreted, max_steps)
+            with pytest.raises(exceptions.StepLimitExceeded):
+                execute_compiled(compiled, max_steps)
+        else:
+            execute_full_speed(interpreted, max_steps)
+            execute_compiled(compiled, max_steps)
+        assert get_state(compiled) == get_state(interpreted)
+        assert compiled.steps == min(max_steps, 23)
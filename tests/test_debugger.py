@@ -0,0 +1,96 @@
+"""Test the time-travel debugger of debug mode."""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+import random
+from typing import Any
+import pytest
+from SAPsim import run_and_return_state
+from SAPsim.utils.debugger import History, debug_loop, step
+from SAPsim.utils.execute import _load_machine
+from SAPsim.utils.helpers import get_state
+from SAPsim.utils.machine import Machine
+from SAPsim.utils.output import OutputSink
+import SAPsim.utils.exceptions as exceptions
+
+
+def test_history_restore() -> None:
+    """Restoring any step, in any order, gives the same state as when it was executed."""
+    machine: Machine = _load_machine(
+        "tests/public_prog/ex2.csv", {"no_print": True, "change": {15: 255}}
+    )
+    history: History = History(machine, interval=4)
+    states: list[dict[str, Any]] = [get_state(machine)]
+    while machine.EXECUTING:
+        step(machine, history)
+        states.append(get_state(machine))
+    assert len(history) == len(states) - 1
+    assert len(history.checkpoints) == len(history) // 4 + 1
+    steps: list[int] = list(range(len(states)))
+    random.Random(0).shuffle(steps)
+    for n in steps:
+        history.restore(machine, n)
+        assert get_state(machine) == states[n]
+    with pytest.raises(IndexError):
+        history.restore(machine, len(states))
+
+    # Executing from an earlier step forgets the later steps
+    history.restore(machine, 5)
+    step(machine, history)
+    assert len(history) == 6
+    assert get_state(machine) == states[6]
+
+
+def test_debug_loop_commands() -> None:
+    """Step forward, step back, jump, and continue to a breakpoint, then run to completion."""
+    machine: Machine = _load_machine("tests/public_prog/ex2.csv", {"no_print": True})
+    commands: list[str] = ["", "b", "b 3", "j 6", "c 1", "h", "j x", "b x", "q", "c 15"]
+    steps_at_prompt: list[int] = []
+
+    def read_command() -> str:
+        steps_at_prompt.append(machine.steps)
+        return commands[len(steps_at_prompt) - 1]
+
+    debug_loop(machine, no_print=True, interval=2, read_command=read_command)
+    # JMP 1 at address 7 is the 7th instruction
+    assert steps_at_prompt == [0, 1, 0, 0, 6, 7, 7, 7, 7, 7]
+    state: dict[str, Any] = run_and_return_state(
+        "tests/public_prog/ex2.csv", no_print=True
+    )
+    assert get_state(machine) == state
+
+
+def test_debug_loop_out(capsys: pytest.CaptureFixture) -> None:
+    """Stepping back forgets the output of ``OUT``, and executing it again outputs it again."""
+    # LDI 7, OUT, HLT
+    machine: Machine = Machine({0: 0x57, 1: 0xE0, 2: 0xF0}, no_print=True)
+    machine.out_log = []
+    commands: list[str] = ["j 2", "b", ""]
+    debug_loop(
+        machine,
+        no_print=True,
+        read_command=lambda: commands.pop(0) if commands else "",
+        sink=OutputSink("raw"),
+    )
+    assert machine.out_log == [(1, 7)]
+    assert capsys.readouterr().out == "7\n7\n"
+
+
+def test_debug_loop_max_steps() -> None:
+    machine: Machine = _load_machine(
+        "tests/public_prog/ex2.csv", {"no_print": True, "change": {4: 0x60, 15: 0}}
+    )
+    with pytest.raises(exceptions.StepLimitExceeded):
+        debug_loop(machine, no_print=True, max_steps=100, read_command=lambda: "c 15")
+
+
+def test_debug_loop_raises_errors_of_commands(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Only invalid commands print the help, an exception raised while executing a command isn't swallowed."""
+    machine: Machine = _load_machine("tests/public_prog/ex2.csv", {"no_print": True})
+
+    def fail(*args) -> None:
+        raise ValueError("step failed")
+
+    monkeypatch.setattr("SAPsim.utils.debugger.step", fail)
+    with pytest.raises(ValueError, match="step failed"):
+        debug_loop(machine, no_print=True, read_command=lambda: "")
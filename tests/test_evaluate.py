@@ -0,0 +1,115 @@
+"""Test evaluate.py."""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+from pathlib import Path
+import pytest
+from SAPsim import evaluate_all, run_and_return_state
+from SAPsim.utils.batch import (
+    HALTED,
+    INVALID_OPCODE,
+    RUNNING,
+    LOAD_FROM_UNMAPPED_ADDRESS,
+)
+from SAPsim.utils.evaluate import TruthTable
+import SAPsim.utils.exceptions as exceptions
+from tests.test_example_progs import ex2_rv
+
+
+def test_evaluate_all_ex1() -> None:
+    table: TruthTable = evaluate_all(
+        "tests/public_prog/ex1.csv", {14: range(256)}, [15, "A", "FLAG_Z"]
+    )
+    assert len(table) == 256
+    assert list(table.status) == [HALTED] * 256
+    for num in range(256):
+        state = run_and_return_state(
+            "tests/public_prog/ex1.csv", change={14: num}, no_print=True
+        )
+        assert table[(num,)] == (
+            (state["RAM"][15], state["A"], int(state["FLAG_Z"])),
+            HALTED,
+        )
+
+
+def test_evaluate_all_ex2() -> None:
+    table: TruthTable = evaluate_all(
+        "tests/public_prog/ex2.csv", {15: range(256)}, ["A"]
+    )
+    assert list(table.values) == [ex2_rv(num) for num in range(256)]
+    assert table == evaluate_all(
+        "tests/public_prog/ex2.csv", {15: range(256)}, ["A"], compiled=True
+    )
+
+
+def test_evaluate_all_equivalence(tmp_path: Path) -> None:
+    """Compare X to 4 instead of 3 in ex1.csv, and replace the HLT of ex2.csv with JMP 0 so it never halts."""
+    ex1: Path = tmp_path / "ex1.csv"
+    ex1.write_text(
+        Path("tests/public_prog/ex1.csv").read_text().replace("13,0,3", "13,0,4")
+    )
+    reference: TruthTable = evaluate_all(
+        "tests/public_prog/ex1.csv", {14: range(256)}, [15]
+    )
+    assert evaluate_all(str(ex1), {14: range(256)}, [15]).mismatches(reference) == [
+        (3,),
+        (4,),
+    ]
+    loops: Path = tmp_path / "loops.csv"
+    loops.write_text(
+        Path("tests/public_prog/ex2.csv").read_text().replace("4,HLT,0", "4,JMP,0")
+    )
+    reference = evaluate_all("tests/public_prog/ex2.csv", {15: range(256)}, ["A"])
+    table: TruthTable = evaluate_all(
+        str(loops), {15: range(256)}, ["A"], max_steps=1000
+    )
+    assert table != reference
+    assert len(table.mismatches(reference)) == 256
+    assert set(table.status) == {RUNNING}
+
+
+def test_evaluate_all_multiple_inputs() -> None:
+    # ex1.csv stores 1 at 15 if Mem(14) == Mem(13)
+    table: TruthTable = evaluate_all(
+        "tests/public_prog/ex1.csv", {13: range(4), 14: range(2, 6)}, [15]
+    )
+    assert len(table) == 16
+    assert table[(3, 3)] == ((1,), HALTED)
+    assert table[(2, 3)] == ((0,), HALTED)
+
+
+def test_evaluate_all_status(tmp_path: Path) -> None:
+    prog: Path = tmp_path / "lda.csv"
+    prog.write_text("Address,First Hexit,Second Hexit,Comments\n0,LDA,14,\n1,HLT,0,\n")
+    table: TruthTable = evaluate_all(str(prog), {15: range(2)}, ["A"])
+    assert list(table.status) == [LOAD_FROM_UNMAPPED_ADDRESS] * 2
+    table = evaluate_all(str(prog), {14: range(2)}, ["A"])
+    assert list(table.status) == [HALTED] * 2
+    with pytest.raises(ValueError):
+        evaluate_all(str(prog), {14: range(2)}, ["C"])
+
+    # Only an invalid opcode is INVALID_OPCODE, not any KeyError
+    prog.write_text("Address,First Hexit,Second Hexit,Comments\n0,9,0,\n")
+    table = evaluate_all(str(prog), {15: range(2)}, ["A"])
+    assert list(table.status) == [INVALID_OPCODE] * 2
+
+
+def test_evaluate_all_validation_and_output(
+    tmp_path: Path, capsys: pytest.CaptureFixture
+) -> None:
+    # Every value is checked, not just the first and last
+    with pytest.raises(exceptions.ChangeValueInvalid):
+        evaluate_all("tests/public_prog/ex2.csv", {15: [0, 300, 5]}, ["A"])
+    # OUT is collected, so nothing is printed
+    prog: Path = tmp_path / "out.csv"
+    prog.write_text(
+        "Address,First Hexit,Second Hexit,Comments\n0,LDA,15,\n1,OUT,0,\n2,HLT,0,\n15,0,0,\n"
+    )
+    table: TruthTable = evaluate_all(str(prog), {15: range(4)}, ["A"])
+    assert [values for values, _ in (table[(num,)] for num in range(4))] == [
+        (0,),
+        (1,),
+        (2,),
+        (3,),
+    ]
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,84 @@
+"""Test grade.py."""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+import json
+import shutil
+from pathlib import Path
+from typing import Any
+import pytest
+from SAPsim.grade import grade, main, parse_input_spec
+import SAPsim.utils.exceptions as exceptions
+from tests.test_example_progs import ex2_rv
+
+
+def ex1_rv(X: int) -> int:
+    return int(X == 3)
+
+
+def test_grade(tmp_path: Path) -> None:
+    shutil.copy("tests/public_prog/ex2.csv", tmp_path / "correct.csv")
+    # HLT replaced with JMP 0, so inputs < 31 never halt
+    with open("tests/public_prog/ex2.csv") as f:
+        lines: list[str] = f.read().splitlines()
+    lines[5] = lines[5].replace("HLT", "JMP")
+    (tmp_path / "loops.csv").write_text("\n".join(lines) + "\n")
+    (tmp_path / "malformed.csv").write_text("Address,Comments\n")
+    results: list[dict[str, Any]] = list(
+        grade(str(tmp_path), {15: range(256)}, ex2_rv, "A", workers=2, max_steps=1000)
+    )
+    assert len(results) == 3 * 256
+    correct, loops, malformed = results[:256], results[256:512], results[512:]
+    assert all(result["passed"] for result in correct)
+    assert [result["inputs"] for result in correct] == [
+        {"15": num} for num in range(256)
+    ]
+    assert {result["error"] for result in loops[:31]} == {"StepLimitExceeded"}
+    assert not any(result["passed"] for result in loops[:31])
+    assert not any(result["passed"] for result in malformed)
+
+
+def test_grade_main(capsys: pytest.CaptureFixture) -> None:
+    assert (
+        main(
+            [
+                "tests/public_prog",
+                "--input",
+                "14=0-9",
+                "--reference",
+                "tests.test_grade:ex1_rv",
+                "--return-value",
+                "15",
+                "-j",
+                "2",
+                "--chunksize",
+                "4",
+            ]
+        )
+        == 0
+    )
+    results: list[dict[str, Any]] = [
+        json.loads(line) for line in capsys.readouterr().out.splitlines()
+    ]
+    # ex1.csv is graded correctly, ex2.csv isn't
+    assert [result["passed"] for result in results[:10]] == [True] * 10
+    assert results[3] == {
+        "submission": "tests/public_prog/ex1.csv",
+        "inputs": {"14": 3},
+        "expected": 1,
+        "actual": 1,
+        "passed": True,
+        "error": None,
+    }
+    assert len(results) == 20
+
+
+def test_parse_input_spec() -> None:
+    assert parse_input_spec("14=0-255") == (14, range(256))
+    assert parse_input_spec("13=7") == (13, range(7, 8))
+    with pytest.raises(ValueError):
+        parse_input_spec("14")
+    with pytest.raises(exceptions.ChangeAddressGreaterThan15):
+        parse_input_spec("16=0-255")
+    with pytest.raises(exceptions.ChangeValueInvalid):
+        parse_input_spec("14=0-256")
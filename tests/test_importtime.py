@@ -0,0 +1,40 @@
+"""Test that ``import SAPsim`` stays fast, since every autograding worker process pays for it.
+
+Instead of timing the import (flaky on CI), check that it doesn't load the slow modules that are only needed later.
+"""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+import json
+import subprocess
+import sys
+
+LAZY_MODULES: tuple[str, ...] = (
+    "tabulate",
+    "concurrent.futures",
+    "logging",
+    "pickle",
+    "numpy",
+)
+"""Modules that ``import SAPsim`` must not load. Each is imported on first use by the code that needs it."""
+
+
+def test_import_loads_no_lazy_modules() -> None:
+    code: str = "import sys, json, SAPsim; print(json.dumps(sorted(sys.modules)))"
+    proc = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    loaded: set[str] = set(json.loads(proc.stdout))
+    assert "SAPsim.utils.execute" in loaded
+    assert not loaded & set(LAZY_MODULES)
+
+
+def test_printing_dependencies_lazy() -> None:
+    code: str = (
+        "import sys; from SAPsim import run; "
+        "run('tests/public_prog/ex2.csv', no_print=True, change={15: 40}); "
+        "assert 'tabulate' not in sys.modules and 'bidict' not in sys.modules; "
+        "run('tests/public_prog/ex1.csv'); "
+        "assert 'tabulate' in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True, capture_output=True)
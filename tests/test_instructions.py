@@ -2,117 +2,123 @@
 
 __author__ = "Jesse Wei <jesse@cs.unc.edu>"
 
-import SAPsim.utils.global_vars as global_vars
-from SAPsim.utils.execute import execute_full_speed, execute_next
-from SAPsim.utils.helpers import check_state, check_state_all
+import pytest
+from SAPsim.utils.machine import Machine
+from SAPsim.utils.execute import (
+    execute_full_speed,
+    execute_next,
+    execute_detect_loops,
+    fuse_blocks,
+)
+from SAPsim.utils.helpers import check_state, check_state_all, get_state
+from SAPsim.utils.parser import parse_csv
 from SAPsim.utils.exceptions import (
     DroppedOffBottom,
     ARegisterNotEnoughBits,
     LoadFromUnmappedAddress,
+    InfiniteLoop,
+    StepLimitExceeded,
 )
-from SAPsim.utils.helpers import setup_state
 
 
 def test_nop():
-    setup_state(4)
-    global_vars.RAM[0] = 0x00
-    global_vars.RAM[1] = 0x01
-    global_vars.RAM[2] = 0x02
-    global_vars.RAM[4] = 0x0F
+    machine = Machine({0: 0x00, 1: 0x01, 2: 0x02, 4: 0x0F}, bits=4)
     try:
-        execute_full_speed()
+        execute_full_speed(machine)
         assert False
     except DroppedOffBottom:
         pass
-    check_state_all({0: 0x00, 1: 0x01, 2: 0x02, 4: 0x0F}, 5, 0, 0, False, False, False)
+    check_state_all(
+        machine, {0: 0x00, 1: 0x01, 2: 0x02, 4: 0x0F}, 5, 0, 0, False, False, False
+    )
 
 
 def test_lda():
-    setup_state(4)
-    global_vars.RAM[0] = 0x1F
-    global_vars.RAM[1] = 0x1E
-    global_vars.RAM[14] = 0x3
-    global_vars.RAM[15] = 0x4
-    execute_next()
-    check_state_all({0: 0x1F, 1: 0x1E, 14: 0x3, 15: 0x4}, 1, 4, 0, False, False, True)
-    execute_next()
-    check_state_all({0: 0x1F, 1: 0x1E, 14: 0x3, 15: 0x4}, 2, 3, 0, False, False, True)
+    machine = Machine({0: 0x1F, 1: 0x1E, 14: 0x3, 15: 0x4}, bits=4)
+    execute_next(machine)
+    check_state_all(
+        machine, {0: 0x1F, 1: 0x1E, 14: 0x3, 15: 0x4}, 1, 4, 0, False, False, True
+    )
+    execute_next(machine)
+    check_state_all(
+        machine, {0: 0x1F, 1: 0x1E, 14: 0x3, 15: 0x4}, 2, 3, 0, False, False, True
+    )
 
 
 def test_lda_raises_ARegisterOverflow():
-    setup_state(4)
-    global_vars.RAM[0] = 0x1F
-    global_vars.RAM[15] = 0x10
+    machine = Machine({0: 0x1F, 15: 0x10}, bits=4)
     try:
-        execute_next()
+        execute_next(machine)
         assert False
     except ARegisterNotEnoughBits:
         pass
 
 
 def test_lda_from_unmapped_addr():
-    setup_state(4)
-    global_vars.RAM[0] = 0x1F
+    machine = Machine({0: 0x1F}, bits=4)
     try:
-        execute_next()
+        execute_next(machine)
         assert False
     except LoadFromUnmappedAddress:
         pass
 
 
 def test_add():
-    setup_state(4)
-    global_vars.RAM[0] = 0x2F
-    global_vars.RAM[1] = 0x2E
-    global_vars.RAM[14] = 0xF
-    global_vars.RAM[15] = 0xF
-    execute_next()
+    machine = Machine({0: 0x2F, 1: 0x2E, 14: 0xF, 15: 0xF}, bits=4)
+    execute_next(machine)
     check_state(
-        RAM={0: 0x2F, 1: 0x2E, 14: 0xF, 15: 0xF}, A=0xF, FLAG_C=False, FLAG_Z=False
+        machine,
+        RAM={0: 0x2F, 1: 0x2E, 14: 0xF, 15: 0xF},
+        A=0xF,
+        FLAG_C=False,
+        FLAG_Z=False,
     )
-    execute_next()
+    execute_next(machine)
     check_state(
-        RAM={0: 0x2F, 1: 0x2E, 14: 0xF, 15: 0xF}, A=14, FLAG_C=True, Flag_Z=False
+        machine,
+        RAM={0: 0x2F, 1: 0x2E, 14: 0xF, 15: 0xF},
+        A=14,
+        FLAG_C=True,
+        Flag_Z=False,
     )
     try:
-        execute_full_speed()
+        execute_full_speed(machine)
         assert False
     except DroppedOffBottom:
         pass
 
 
 def test_add_from_unmapped_addr():
-    setup_state(4)
-    global_vars.RAM[0] = 0x2F
+    machine = Machine({0: 0x2F}, bits=4)
     try:
-        execute_next()
+        execute_next(machine)
         assert False
     except LoadFromUnmappedAddress:
         pass
 
 
 def test_sub():
-    setup_state(4)
-    global_vars.RAM[0] = 0x3F
-    global_vars.RAM[1] = 0x3E
-    global_vars.RAM[14] = 0x1
-    global_vars.RAM[15] = 0xF
-    execute_next()
+    machine = Machine({0: 0x3F, 1: 0x3E, 14: 0x1, 15: 0xF}, bits=4)
+    execute_next(machine)
     check_state(
-        RAM={0: 0x3F, 1: 0x3E, 14: 0x1, 15: 0xF}, A=1, FLAG_C=False, FLAG_Z=False
+        machine,
+        RAM={0: 0x3F, 1: 0x3E, 14: 0x1, 15: 0xF},
+        A=1,
+        FLAG_C=False,
+        FLAG_Z=False,
+    )
+    execute_next(machine)
+    check_state(
+        machine, RAM={0: 0x3F, 1: 0x3E, 14: 0x1, 15: 0xF}, A=0, FLAG_C=True, FLAG_Z=True
     )
-    execute_next()
-    check_state(RAM={0: 0x3F, 1: 0x3E, 14: 0x1, 15: 0xF}, A=0, FLAG_C=True, FLAG_Z=True)
 
 
 def test_sta_to_unmapped_addr():
-    setup_state(4)
-    global_vars.RAM[0] = 0x2F
-    global_vars.RAM[1] = 0x4E
-    global_vars.RAM[15] = 0xF
-    execute_next()
-    execute_next()
+    machine = Machine({0: 0x2F, 1: 0x4E, 15: 0xF}, bits=4)
+    execute_next(machine)
+    execute_next(machine)
     check_state(
+        machine,
         RAM={0: 0x2F, 1: 0x4E, 0xE: 0xF, 0xF: 0xF},
         A=0xF,
         FLAG_C=False,
@@ -123,79 +129,193 @@ def test_sta_to_unmapped_addr():
 
 
 def test_sta_overwrites_addr():
-    setup_state(4)
-    global_vars.RAM[0] = 0x2E
-    global_vars.RAM[1] = 0x4F
-    global_vars.RAM[14] = 2
-    global_vars.RAM[15] = 1
+    machine = Machine({0: 0x2E, 1: 0x4F, 14: 2, 15: 1}, bits=4)
     try:
-        execute_full_speed()
+        execute_full_speed(machine)
         assert False
     except DroppedOffBottom:
         pass
-    check_state_all({0: 0x2E, 1: 0x4F, 14: 2, 15: 2}, 16, 2, 2, False, False, False)
+    check_state_all(
+        machine, {0: 0x2E, 1: 0x4F, 14: 2, 15: 2}, 16, 2, 2, False, False, False
+    )
 
 
 def test_ldi():
-    setup_state(4)
-    global_vars.RAM[0] = 0x59
-    execute_next()
-    check_state_all({0: 0x59}, 1, 9, 0, False, False, True)
+    machine = Machine({0: 0x59}, bits=4)
+    execute_next(machine)
+    check_state_all(machine, {0: 0x59}, 1, 9, 0, False, False, True)
 
 
 def test_ldi_overwrites_A():
-    setup_state(4)
-    global_vars.A = 15
-    global_vars.RAM[0] = 0x55
-    execute_next()
-    check_state_all({0: 0x55}, 1, 5, 0, False, False, True)
+    machine = Machine({0: 0x55}, bits=4)
+    machine.A = 15
+    execute_next(machine)
+    check_state_all(machine, {0: 0x55}, 1, 5, 0, False, False, True)
 
 
 def test_ldi_doesnt_modify_flags():
-    setup_state(4)
-    global_vars.RAM[0] = 0x5A
-    global_vars.FLAG_C = True
-    global_vars.FLAG_Z = True
-    execute_next()
-    check_state_all({0: 0x5A}, 1, 0xA, 0, True, True, True)
+    machine = Machine({0: 0x5A}, bits=4)
+    machine.FLAG_C = True
+    machine.FLAG_Z = True
+    execute_next(machine)
+    check_state_all(machine, {0: 0x5A}, 1, 0xA, 0, True, True, True)
 
 
 def test_jmp():
-    setup_state(4)
-    global_vars.RAM[0] = 0x67
-    execute_next()
-    check_state_all({0: 0x67}, 7, 0, 0, False, False, True)
+    machine = Machine({0: 0x67}, bits=4)
+    execute_next(machine)
+    check_state_all(machine, {0: 0x67}, 7, 0, 0, False, False, True)
 
 
 def test_jmp_executes_instruction():
-    setup_state(4)
-    global_vars.RAM[0] = 0x64
-    global_vars.RAM[4] = 0x55
-    global_vars.RAM[5] = 0x47
-    execute_next()
-    check_state_all({0: 0x64, 4: 0x55, 5: 0x47}, 4, 0, 0, False, False, True)
-    execute_next()
-    check_state_all({0: 0x64, 4: 0x55, 5: 0x47}, 5, 5, 0, False, False, True)
-    execute_next()
-    check_state_all({0: 0x64, 4: 0x55, 5: 0x47, 7: 5}, 6, 5, 0, False, False, True)
-    execute_next()
-    execute_next()
+    machine = Machine({0: 0x64, 4: 0x55, 5: 0x47}, bits=4)
+    execute_next(machine)
+    check_state_all(machine, {0: 0x64, 4: 0x55, 5: 0x47}, 4, 0, 0, False, False, True)
+    execute_next(machine)
+    check_state_all(machine, {0: 0x64, 4: 0x55, 5: 0x47}, 5, 5, 0, False, False, True)
+    execute_next(machine)
+    check_state_all(
+        machine, {0: 0x64, 4: 0x55, 5: 0x47, 7: 5}, 6, 5, 0, False, False, True
+    )
+    execute_next(machine)
+    execute_next(machine)
     try:
-        execute_next()
+        execute_next(machine)
         assert False
     except DroppedOffBottom:
         pass
 
 
 def test_hlt():
-    setup_state(4)
-    global_vars.RAM[0] = 0xFF
-    global_vars.RAM[15] = 0x10
-    execute_next()
-    check_state_all({0: 0xFF, 15: 0x10}, 0, 0, 0, False, False, False)
+    machine = Machine({0: 0xFF, 15: 0x10}, bits=4)
+    execute_next(machine)
+    check_state_all(machine, {0: 0xFF, 15: 0x10}, 0, 0, 0, False, False, False)
     for i in range(100):
-        execute_next()
-    check_state_all({0: 0xFF, 15: 0x10}, 0, 0, 0, False, False, False)
+        execute_next(machine)
+    check_state_all(machine, {0: 0xFF, 15: 0x10}, 0, 0, 0, False, False, False)
     for i in range(1000):
-        execute_full_speed()
-    check_state_all({0: 0xFF, 15: 0x10}, 0, 0, 0, False, False, False)
+        execute_full_speed(machine)
+    check_state_all(machine, {0: 0xFF, 15: 0x10}, 0, 0, 0, False, False, False)
+
+
+def test_sta_invalidates_decoded_instruction():
+    """Self-modifying code: the second pass executes the HLT stored over the JMP at address 4."""
+    machine = Machine({0: 0x1D, 1: 0x44, 2: 0x1E, 3: 0x4D, 4: 0x60, 13: 0x60, 14: 0xF0})
+    execute_full_speed(machine)
+    check_state(machine, PC=4, A=0xF0, EXECUTING=False)
+    assert machine.RAM[4] == 0xF0
+
+
+def test_sta_past_max_addr_maps_executable_addr():
+    machine = Machine({0: 0x14, 1: 0x46, 2: 0x66, 4: 0xF0})
+    execute_full_speed(machine)
+    check_state_all(
+        machine,
+        {0: 0x14, 1: 0x46, 2: 0x66, 4: 0xF0, 6: 0xF0},
+        6,
+        0xF0,
+        0,
+        False,
+        False,
+        False,
+    )
+
+
+def test_detect_loops_jmp():
+    machine = Machine({0: 0x00, 1: 0x00, 2: 0x61}, no_print=True)
+    with pytest.raises(InfiniteLoop) as e:
+        execute_detect_loops(machine)
+    assert e.value.entry_pc == 1
+    assert e.value.length == 2
+    assert not machine.EXECUTING
+
+
+def test_detect_loops_counter():
+    # Mem(15) = Mem(15) + 1 forever. The state after ADD repeats every 256 iterations.
+    machine = Machine({0: 0x1F, 1: 0x2E, 2: 0x4F, 3: 0x60, 14: 1, 15: 0}, no_print=True)
+    with pytest.raises(InfiniteLoop) as e:
+        execute_detect_loops(machine)
+    assert e.value.entry_pc == 2
+    assert e.value.length == 4 * 256
+
+
+def test_detect_loops_halts():
+    machine = Machine({0: 0x2F, 1: 0x2E, 2: 0xF0, 14: 0xF, 15: 0xF})
+    execute_detect_loops(machine)
+    check_state_all(
+        machine,
+        {0: 0x2F, 1: 0x2E, 2: 0xF0, 14: 0xF, 15: 0xF},
+        2,
+        30,
+        15,
+        0,
+        False,
+        False,
+    )
+
+
+def execute_one_at_a_time(machine: Machine, max_steps: int) -> None:
+    while machine.EXECUTING and machine.steps < max_steps:
+        execute_next(machine)
+
+
+def test_fuse_blocks():
+    # LDA 5, SUB 4, JMP 0, HLT | data executed as NOP
+    machine = Machine({0: 0x15, 1: 0x34, 2: 0x60, 3: 0xF0, 4: 1, 5: 9})
+    blocks: list = fuse_blocks(machine)
+    assert [addr for addr, block in enumerate(blocks) if block] == [0, 4]
+    assert blocks[0][1] == 2 and blocks[4][1] == 2
+    assert machine.fused == 0b11_0011
+    # Address 15 isn't mapped, so LDA 15 can't be fused
+    machine = Machine({0: 0x1F, 1: 0x34, 2: 0x50, 3: 0xF0, 4: 1})
+    assert [addr for addr, block in enumerate(fuse_blocks(machine)) if block] == [1]
+
+
+def test_superinstructions_match_single_steps():
+    for prog_path, addr in (
+        ("tests/public_prog/ex1.csv", 14),
+        ("tests/public_prog/ex2.csv", 15),
+    ):
+        for num in range(256):
+            RAM: dict[int, int] = parse_csv(prog_path)
+            RAM[addr] = num
+            for max_steps in (7, 10_000):
+                fused = Machine(RAM, no_print=True)
+                single = Machine(RAM, no_print=True)
+                try:
+                    execute_full_speed(fused, max_steps)
+                except StepLimitExceeded:
+                    pass
+                execute_one_at_a_time(single, max_steps)
+                assert get_state(fused) == get_state(single)
+
+
+def test_sta_invalidates_block():
+    """Self-modifying code: STA 2 overwrites LDI 1 (in the block at 0 to 3) with A. On the third pass it's HLT (0xFA)."""
+    # LDI 7, NOP, LDI 1, NOP, STA 2, JZ 8, SUB 15, JMP 1 | HLT
+    RAM: dict[int, int] = {
+        0: 0x57,
+        1: 0x00,
+        2: 0x51,
+        3: 0x00,
+        4: 0x42,
+        5: 0x88,
+        6: 0x3F,
+        7: 0x61,
+        8: 0xF0,
+        15: 0x07,
+    }
+    fused = Machine(RAM)
+    single = Machine(RAM)
+    execute_full_speed(fused)
+    execute_one_at_a_time(single, 100)
+    assert get_state(fused) == get_state(single)
+    assert fused.PC == 2 and fused.blocks[1] is None
+
+
+def test_superinstruction_not_enough_bits():
+    # NOP, LDA 15, HLT with 4 bits: the block falls back to raising at address 1
+    machine = Machine({0: 0x00, 1: 0x1F, 2: 0xF0, 15: 0x10}, bits=4, no_print=True)
+    with pytest.raises(ARegisterNotEnoughBits):
+        execute_full_speed(machine)
+    assert machine.PC == 1 and machine.steps == 1
@@ -0,0 +1,56 @@
+"""Test machine.py."""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+import pytest
+from SAPsim.utils.machine import Machine
+from SAPsim.utils.helpers import get_state
+import SAPsim.utils.exceptions as exceptions
+
+
+def test_ram_view() -> None:
+    machine = Machine({15: 0x01, 0: 0x1E, 14: 0x03})
+    assert machine.memory == bytearray([0x1E] + [0] * 13 + [0x03, 0x01])
+    assert machine.mapped == 0b1100_0000_0000_0001
+    assert machine.max_addr() == 15
+    assert machine.RAM == {0: 0x1E, 14: 0x03, 15: 0x01}
+    assert list(machine.RAM) == [0, 14, 15]
+    assert len(machine.RAM) == 3
+    assert 1 not in machine.RAM and 16 not in machine.RAM and -1 not in machine.RAM
+    with pytest.raises(KeyError):
+        machine.RAM[1]
+    assert machine.RAM.get(1) is None
+
+    machine.RAM[1] = 0xF0
+    assert machine.mapped >> 1 & 1 and machine.memory[1] == 0xF0
+    del machine.RAM[15]
+    assert machine.RAM == {0: 0x1E, 1: 0xF0, 14: 0x03}
+    assert machine.max_addr() == 14
+    assert get_state(machine)["RAM"] == {0: 0x1E, 1: 0xF0, 14: 0x03}
+    assert type(get_state(machine)["RAM"]) is dict
+
+
+def test_empty_machine() -> None:
+    machine = Machine()
+    assert machine.RAM == {}
+    assert machine.max_addr() == -1
+
+
+def test_address_greater_than_15() -> None:
+    with pytest.raises(exceptions.AddressGreaterThan15):
+        Machine({16: 0x00})
+    with pytest.raises(ValueError):
+        Machine({-1: 0x00})
+    with pytest.raises(ValueError):
+        Machine({0: 256})
+
+
+def test_copy() -> None:
+    machine = Machine({0: 0x1E, 1: 0x4F, 2: 0xF0, 14: 0x03})
+    machine.PC, machine.A, machine.steps = 1, 3, 1
+    clone: Machine = machine.copy()
+    assert get_state(clone) == get_state(machine)
+    clone.RAM[15] = 0x03
+    assert 15 not in machine.RAM
+    assert clone.memory is not machine.memory
+    assert clone.decoded is None
@@ -0,0 +1,106 @@
+"""Test memo.py."""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+from pathlib import Path
+import pytest
+from SAPsim import run_and_return_state
+from SAPsim.utils.execute import execute_full_speed
+from SAPsim.utils.helpers import get_state
+from SAPsim.utils.machine import Machine
+from SAPsim.utils.memo import TransitionCache, pack_state, transition_cache
+import SAPsim.utils.exceptions as exceptions
+
+
+def test_run_memoize() -> None:
+    transition_cache.clear()
+    for _ in range(2):
+        for num in range(256):
+            assert run_and_return_state(
+                "tests/public_prog/ex2.csv",
+                change={15: num},
+                no_print=True,
+                memoize=True,
+            ) == run_and_return_state(
+                "tests/public_prog/ex2.csv", change={15: num}, no_print=True
+            )
+    info = transition_cache.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (256, 256, 256)
+    with pytest.raises(TypeError):
+        run_and_return_state("tests/public_prog/ex2.csv", memoize=1)
+
+
+def test_memoize_replays_out(capsys: pytest.CaptureFixture) -> None:
+    # LDI 7, OUT, HLT
+    cache = TransitionCache()
+    outputs: list[str] = []
+    for _ in range(2):
+        machine = Machine({0: 0x57, 1: 0xE0, 2: 0xF0})
+        cache.execute(machine, execute_full_speed)
+        outputs.append(capsys.readouterr().out)
+        assert machine.PC == 2 and not machine.EXECUTING and machine.steps == 3
+    assert outputs[0] == outputs[1] and "7" in outputs[0]
+    assert cache.cache_info().hits == 1
+
+
+def test_memoize_exceptions() -> None:
+    cache = TransitionCache()
+    # LDA 14 from an unmapped address
+    for _ in range(2):
+        machine = Machine({0: 0x1E, 1: 0xF0}, no_print=True)
+        with pytest.raises(exceptions.LoadFromUnmappedAddress):
+            cache.execute(machine, execute_full_speed)
+    assert cache.cache_info().hits == 1
+    # JMP 0 with different step budgets
+    for max_steps in (10, 10, 20):
+        machine = Machine({0: 0x60}, no_print=True)
+        with pytest.raises(exceptions.StepLimitExceeded):
+            cache.execute(machine, execute_full_speed, max_steps)
+        assert machine.steps == max_steps
+    assert cache.cache_info().hits == 2
+    # Exceptions that print aren't cached
+    machine = Machine({0: 0x1E, 1: 0xF0}, table_format="plain")
+    with pytest.raises(exceptions.LoadFromUnmappedAddress):
+        cache.execute(machine, execute_full_speed)
+    assert cache.cache_info().currsize == 3
+
+
+def test_memoize_raises_new_exception_per_hit() -> None:
+    """Each hit raises its own exception, so tracebacks don't pile up on a shared cached instance."""
+    cache = TransitionCache()
+    errors: list[Exception] = []
+    for _ in range(50):
+        machine = Machine({0: 0x60}, no_print=True)
+        with pytest.raises(exceptions.StepLimitExceeded) as info:
+            cache.execute(machine, execute_full_speed, 10)
+        errors.append(info.value)
+    assert cache.cache_info().hits == 49
+    assert len({id(e) for e in errors}) == 50
+    depths: set[int] = set()
+    for e in errors[1:]:
+        assert (e.args, e.steps, e.last_pc) == (errors[0].args, 10, 0)
+        tb, depth = e.__traceback__, 0
+        while tb is not None:
+            tb, depth = tb.tb_next, depth + 1
+        depths.add(depth)
+    assert len(depths) == 1
+
+
+def test_memoize_lru_and_persistence(tmp_path: Path) -> None:
+    cache = TransitionCache(maxsize=2)
+    machines: list[Machine] = [Machine({0: 0x50 + num, 1: 0xF0}) for num in range(3)]
+    for machine in machines:
+        cache.execute(machine.copy(), execute_full_speed)
+    assert cache.cache_info().currsize == 2
+    cache.save(tmp_path / "cache.pickle")
+
+    loaded = TransitionCache()
+    loaded.load(tmp_path / "cache.pickle")
+    machine: Machine = machines[2].copy()
+    loaded.execute(machine, execute_full_speed)
+    assert loaded.cache_info().hits == 1
+    expected: Machine = machines[2].copy()
+    execute_full_speed(expected)
+    assert get_state(machine) == get_state(expected)
+    # The least recently used machine was evicted
+    assert pack_state(machines[0], None) not in loaded._entries
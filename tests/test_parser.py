@@ -0,0 +1,154 @@
+"""Test the parsed-program cache and bulk parsing in parser.py."""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+import os
+import shutil
+from pathlib import Path
+import pytest
+import SAPsim.utils.exceptions as exceptions
+import SAPsim.utils.parser as parser
+
+
+def test_parse_csv_cached(tmp_path: Path) -> None:
+    prog: Path = tmp_path / "ex1.csv"
+    shutil.copy("tests/public_prog/ex1.csv", prog)
+    RAM: dict[int, int] = parser.parse_csv_cached(prog)
+    assert RAM == parser.parse_csv(prog)
+    # Returns a copy, so modifying it doesn't modify the cache
+    RAM[14] = 3
+    assert parser.parse_csv_cached(prog)[14] == 0x03
+    assert parser.parse_csv_cached(str(prog)) is not parser.parse_csv_cached(prog)
+
+    # Editing the file invalidates its entry
+    text: str = prog.read_text().replace("14,0,3", "14,0,4")
+    prog.write_text(text)
+    stat: os.stat_result = os.stat(prog)
+    os.utime(prog, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert parser.parse_csv_cached(prog)[14] == 0x04
+
+
+def test_parse_csv_cache_invalidation(tmp_path: Path) -> None:
+    prog: Path = tmp_path / "ex2.csv"
+    shutil.copy("tests/public_prog/ex2.csv", prog)
+    parser.parse_csv_cached(prog)
+    assert str(prog) in parser._cache
+    parser.clear_cache(prog)
+    assert str(prog) not in parser._cache
+    parser.parse_csv_cached(prog)
+    parser.clear_cache()
+    assert not parser._cache
+
+
+def test_parse_csv_cache_size(tmp_path: Path) -> None:
+    parser.clear_cache()
+    try:
+        parser.set_cache_size(2)
+        progs: list[Path] = []
+        for i in range(3):
+            progs.append(tmp_path / f"ex1_{i}.csv")
+            shutil.copy("tests/public_prog/ex1.csv", progs[-1])
+            parser.parse_csv_cached(progs[-1])
+        # The least recently used program is evicted
+        assert list(parser._cache) == [str(progs[1]), str(progs[2])]
+        parser.parse_csv_cached(progs[1])
+        assert list(parser._cache) == [str(progs[2]), str(progs[1])]
+        parser.set_cache_size(0)
+        assert not parser._cache
+        parser.parse_csv_cached(progs[0])
+        assert not parser._cache
+    finally:
+        parser.set_cache_size(128)
+
+
+def test_parse_directory() -> None:
+    report: parser.ParseReport = parser.parse_directory("tests/public_prog")
+    assert not report.errors
+    assert list(report.images) == [
+        "tests/public_prog/ex1.csv",
+        "tests/public_prog/ex2.csv",
+    ]
+    for path, image in report.images.items():
+        assert image.to_RAM() == parser.parse_csv(path)
+        assert parser.ProgramImage.from_RAM(image.to_RAM()) == image
+    with pytest.raises(TypeError):
+        image.memory[0] = 1
+
+
+def test_parse_many_reports_every_error(tmp_path: Path) -> None:
+    """Each bad row is reported, in order, with the exception ``parse_csv()`` raises for the first."""
+    malformed: str = "tests/malformed_csv/no_second_hexit_addr_1.csv"
+    missing: str = str(tmp_path / "missing.csv")
+    report: parser.ParseReport = parser.parse_many(
+        [malformed, "tests/public_prog/ex1.csv", missing, "README.md"], workers=2
+    )
+    assert list(report.images) == ["tests/public_prog/ex1.csv"]
+    assert list(report.errors) == [malformed, missing, "README.md"]
+    errors: list[parser.ParseError] = report.errors[malformed]
+    with pytest.raises(exceptions.NoSecondHexit) as e:
+        parser.parse_csv(malformed)
+    assert errors[0] == parser.ParseError("NoSecondHexit", str(e.value))
+    assert [error.error for error in errors] == ["NoSecondHexit", "NoFirstHexit"]
+    assert [error.error for error in report.errors[missing]] == ["FileNotFoundError"]
+    assert [error.error for error in report.errors["README.md"]] == ["FileNotCSV"]
+
+
+def test_token_tables_match_int_parsing() -> None:
+    # Every token looked up in a table has the value it had when it was parsed with int()
+    for token, value in parser.FIRST_HEXIT_TOKENS.items():
+        assert parser._classify_first_hexit(token, 0) == value
+    for token, value in parser.HEXIT_TOKENS.items():
+        assert parser._classify_second_hexit(token, 0) == value
+        assert parser._classify_address(token, 1) == value
+
+
+@pytest.mark.parametrize(
+    "first, second, result",
+    [
+        ("lda", "f", 0x1F),
+        (" 7 ", "+3", 0x73),
+        ("007", " a", 0x7A),
+        (" out ", "1_0", 0xEA),
+        ("-1", "0", exceptions.FirstHexitNegative),
+        ("16", "0", exceptions.FirstHexitGreaterThan15),
+        ("G", "0", exceptions.InvalidFirstHexit),
+        ("LDAX", "0", exceptions.InvalidFirstHexit),
+        ("0", "-2", exceptions.SecondHexitNegative),
+        ("0", "99", exceptions.SecondHexitGreaterThan15),
+        ("0", "AB", exceptions.InvalidSecondHexit),
+        ("0", "z", exceptions.InvalidSecondHexit),
+        ("LDA", "", exceptions.NoSecondHexit),
+        ("", "1", exceptions.NoFirstHexit),
+        ("", "", 0x00),
+    ],
+)
+def test_parse_byte_unusual_fields(first: str, second: str, result) -> None:
+    row: dict[str, str] = {"First Hexit": first, "Second Hexit": second}
+    if isinstance(result, int):
+        assert parser._parse_byte(row, 0) == result
+    else:
+        with pytest.raises(result):
+            parser._parse_byte(row, 0)
+
+
+def test_sapbin_image(tmp_path: Path) -> None:
+    prog: Path = tmp_path / "ex1.csv"
+    shutil.copy("tests/public_prog/ex1.csv", prog)
+    image_path: Path = parser.convert_csv(prog)
+    assert image_path == tmp_path / "ex1.sapbin"
+    assert image_path.stat().st_size > parser.IMAGE_HEADER.size
+    image: parser.ProgramImage = parser.load_image(image_path)
+    assert image == parser.ProgramImage.from_RAM(parser.parse_csv(prog))
+    assert parser.load_comments(image_path)[0] == "Load input"
+    assert parser.load_RAM(image_path) == parser.parse_csv(prog)
+
+    # Without comments, the image is just the header
+    bare: Path = parser.convert_csv(prog, tmp_path / "bare.sapbin", comments=False)
+    assert bare.stat().st_size == parser.IMAGE_HEADER.size
+    assert parser.load_comments(bare) == {}
+    assert parser.load_image(bare) == image
+
+    with pytest.raises(ValueError):
+        parser.load_image(prog)
+    with pytest.raises(exceptions.FileNotCSV):
+        parser.load_RAM(tmp_path / "ex1.txt")
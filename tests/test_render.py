@@ -0,0 +1,34 @@
+"""Test that ``TableRenderer`` prints exactly what ``tabulate()`` would."""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+import random
+import pytest
+from tabulate import tabulate
+from SAPsim.utils.helpers import RAM_HEADERS, RAM_table
+from SAPsim.utils.machine import Machine
+from SAPsim.utils.render import TableRenderer
+
+
+@pytest.mark.parametrize(
+    "table_format", ["simple_outline", "plain", "simple", "grid", "github", "rst"]
+)
+def test_table_renderer_matches_tabulate(table_format: str) -> None:
+    """Random writes (some widening or narrowing a column), mapped addresses, and PC values."""
+    rng = random.Random(0)
+    machine = Machine({addr: rng.randrange(256) for addr in range(0, 16, 2)})
+    RAM_renderer = TableRenderer(RAM_HEADERS, table_format)
+    info_renderer = TableRenderer((), table_format)
+    for _ in range(100):
+        if rng.random() < 0.3:
+            machine.RAM[rng.randrange(16)] = rng.choice(
+                (rng.randrange(256), rng.randrange(10))
+            )
+        machine.PC = rng.randrange(17)
+        machine.A = rng.randrange(256)
+        table = RAM_table(machine)
+        assert RAM_renderer.render(table) == tabulate(
+            table, headers=RAM_HEADERS, tablefmt=table_format
+        )
+        info = [["PC", machine.PC], ["Reg A", machine.A], ["FlagC", 0]]
+        assert info_renderer.render(info) == tabulate(info, tablefmt=table_format)
@@ -0,0 +1,68 @@
+"""Test writing and replaying binary trace files."""
+
+__author__ = "Jesse Wei <jesse@cs.unc.edu>"
+
+from pathlib import Path
+import pytest
+from SAPsim.utils.batch import HALTED, RUNNING, LOAD_FROM_UNMAPPED_ADDRESS
+from SAPsim.utils.execute import _load_machine, trace_machine
+from SAPsim.utils.machine import Machine
+from SAPsim.utils.tracefile import RECORD, HEADER, TraceFile, write_trace
+import SAPsim.utils.exceptions as exceptions
+
+
+def test_write_and_read_trace(tmp_path: Path) -> None:
+    """Every record and the RAM after every step match executing one step at a time."""
+    path: Path = tmp_path / "ex2.trace"
+    steps: int = write_trace("tests/public_prog/ex2.csv", path, no_print=True)
+    assert path.stat().st_size == HEADER.size + steps * RECORD.size
+
+    machine: Machine = _load_machine("tests/public_prog/ex2.csv", {"no_print": True})
+    initial_RAM: dict[int, int] = dict(machine.RAM)
+    records: list = []
+    RAMs: list[dict[int, int]] = []
+    for record in trace_machine(machine):
+        records.append(record)
+        RAMs.append(dict(machine.RAM))
+
+    with TraceFile(path) as trace:
+        assert trace.status == HALTED
+        assert trace.bits == 8
+        assert len(trace) == steps == len(records)
+        assert list(trace) == records
+        assert trace[-1] == records[-1]
+        assert trace.RAM_at(-1) == initial_RAM
+        for step, RAM in enumerate(RAMs):
+            assert trace.RAM_at(step) == RAM
+        with pytest.raises(IndexError):
+            trace[steps]
+        with pytest.raises(IndexError):
+            trace.RAM_at(steps)
+
+
+def test_trace_failing_runs(tmp_path: Path) -> None:
+    """Steps before an exception are written, and the status records why the run stopped."""
+    path: Path = tmp_path / "loop.trace"
+    with pytest.raises(exceptions.StepLimitExceeded):
+        write_trace(
+            "tests/public_prog/ex2.csv",
+            path,
+            no_print=True,
+            change={4: 0x60, 15: 0},
+            max_steps=10_000,
+        )
+    with TraceFile(path) as trace:
+        assert trace.status == RUNNING
+        assert len(trace) == 10_000
+        # The loop is 5 instructions long starting at address 0
+        assert trace[9_999].PC == 4
+
+    with pytest.raises(exceptions.LoadFromUnmappedAddress):
+        write_trace("tests/public_prog/ex2.csv", path, no_print=True, change={2: 0x1C})
+    with TraceFile(path) as trace:
+        assert trace.status == LOAD_FROM_UNMAPPED_ADDRESS
+        assert len(trace) == 2
+
+    path.write_bytes(b"not a trace file")
+    with pytest.raises(ValueError):
+        TraceFile(path)